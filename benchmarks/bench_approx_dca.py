@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+bench_approx_dca.py
+
+Compares approximate (low-rank shrinkage) mfdca against pydca's
+exact mfdca (run_pydca_mfdca, as run by the workflow) on one joint
+alignment: runtime of both and agreement of the top scoring pairs.
+
+Without an alignment file, a random alignment with planted
+covarying column pairs is generated.
+"""
+
+import sys
+import time
+import json
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+from io_utils import fa_todict, writeout_fasta
+from run_dca import run_pydca_mfdca
+from approx_dca import run_lowrank_mfdca, get_alignment_length, top_pair_agreement
+from synthetic_data import planted_alignment
+
+
+def bench_exact(alnpath, pseudocount, seqid):
+    """Returns (seconds, sorted pairs) of pydca mfdca"""
+    start = time.perf_counter()
+    scores = run_pydca_mfdca(alnpath, False, pseudocount, seqid)
+    return time.perf_counter() - start, scores
+
+
+def bench_lowrank(alnpath, shrinkage, seqid):
+    """Returns (seconds, sorted pairs) of low-rank mfdca"""
+    start = time.perf_counter()
+    scores = run_lowrank_mfdca(alnpath, shrinkage, seqid)
+    return time.perf_counter() - start, scores
+
+
+def bench_approx_dca(alnpath, pseudocount=0.5, shrinkage=0.5, seqid=0.8, topks=(10, 50, 100)):
+    """Runs both methods on a joint alignment file.
+
+    :returns: dict of runtimes and top-K agreement fractions
+    """
+    exact_s, exact = bench_exact(alnpath, pseudocount, seqid)
+    lowrank_s, lowrank = bench_lowrank(alnpath, shrinkage, seqid)
+    result = {'numseqs': len(fa_todict(alnpath)),
+              'seqlen': get_alignment_length(alnpath),
+              'exact_s': round(exact_s, 4),
+              'lowrank_s': round(lowrank_s, 4)}
+    for topk in topks:
+        result[f'top{topk}_agreement'] = top_pair_agreement(exact, lowrank, topk)
+    return result
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] [--alnfile ALN] [--numseqs N] [--seqlen L] [--out JSON]")
+    parser.add_argument("--alnfile", help="joint alignment fasta, synthetic if not given")
+    parser.add_argument("--numseqs", type=int, default=400, help="synthetic alignment depth")
+    parser.add_argument("--seqlen", nargs='+', type=int, default=[100, 200, 400], help="synthetic alignment length(s)")
+    parser.add_argument("--shrinkage", type=float, default=0.5, help="shrinkage for low-rank mfdca")
+    parser.add_argument("--out", help="append results as json lines to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.alnfile:
+            runs = [Path(args.alnfile)]
+        else:
+            runs = []
+            for seqlen in args.seqlen:
+                alnpath = Path(tmpdir) / f'planted_{args.numseqs}x{seqlen}_aln.fasta'
+                seqs = planted_alignment(args.numseqs, seqlen, seqlen // 10)
+                writeout_fasta(alnpath, {f'seq{idx}': seq for idx, seq in enumerate(seqs)}, overwrite=True)
+                runs.append(alnpath)
+
+        for alnpath in runs:
+            result = bench_approx_dca(alnpath, shrinkage=args.shrinkage)
+            print(json.dumps(result))
+            if args.out:
+                with open(args.out, 'a') as outf:
+                    outf.write(json.dumps(result) + '\n')
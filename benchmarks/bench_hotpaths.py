@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+bench_hotpaths.py
+
+Micro-benchmarks of the pure-Python hot paths of the workflow
+on synthetic data at several scales.
+
+Each benchmark is timed with timeit (best and mean of repeats).
+Results are saved as json and can be compared against a
+previous results file to spot regressions:
+
+    python3 bench_hotpaths.py --out before.json
+    ... change code ...
+    python3 bench_hotpaths.py --out after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import contextlib
+import timeit
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import io_utils
+import synthetic_data as synth
+
+# scale name: (number of sequences, sequence/alignment length, DCA alignment length)
+SCALES = {'small': (100, 200, 40),
+          'medium': (600, 500, 80),
+          'large': (2000, 1000, 160)}
+
+# fraction of organisms shared by the two chains of a benchmark
+ORG_OVERLAP = 0.7
+
+
+def bench_parse_fasta(tmpdir, numseqs, seqlen, dcalen):
+    """parse_fasta on wrapped fasta lines"""
+    lines = synth.fasta_lines(synth.make_seqdict(numseqs, seqlen))
+    return lambda: io_utils.parse_fasta(lines)
+
+
+def bench_fa_todict(tmpdir, numseqs, seqlen, dcalen):
+    """fa_todict on a fasta file"""
+    fastafile = tmpdir / 'fa_todict.fasta'
+    synth.write_fasta(fastafile, synth.make_seqdict(numseqs, seqlen))
+    return lambda: io_utils.fa_todict(fastafile)
+
+
+def bench_writeout_fasta(tmpdir, numseqs, seqlen, dcalen):
+    """writeout_fasta overwriting a fasta file"""
+    seqdict = synth.make_seqdict(numseqs, seqlen)
+    fastafile = tmpdir / 'writeout_fasta.fasta'
+    return lambda: io_utils.writeout_fasta(fastafile, seqdict, overwrite=True)
+
+
+def bench_get_orgs_from_hitlist(tmpdir, numseqs, seqlen, dcalen):
+    """get_orgs_from_hitlist, ~3 hits per organism"""
+    from process_phmmerhits import get_orgs_from_hitlist
+    hitlist = synth.make_hitlist(numseqs, max(numseqs // 3, 1))
+    return lambda: get_orgs_from_hitlist(hitlist)
+
+
+def bench_select_seqheader_from_org(tmpdir, numseqs, seqlen, dcalen):
+    """select_seqheader_from_org, ~3 hits per organism"""
+    from process_phmmerhits import get_orgs_from_hitlist, select_seqheader_from_org
+    orgset, orgdict = get_orgs_from_hitlist(synth.make_hitlist(numseqs, max(numseqs // 3, 1)))
+    return lambda: select_seqheader_from_org(orgset, orgdict)
+
+
+def bench_match_orgtags(tmpdir, numseqs, seqlen, dcalen):
+    """match_orgtags of two orgsets sharing ORG_OVERLAP of their organisms"""
+    from process_phmmerhits import get_orgs_from_hitlist, match_orgtags
+    orgtags1, orgtags2 = synth.make_orgtag_pair(numseqs, ORG_OVERLAP)
+    orgset1, _ = get_orgs_from_hitlist(synth.make_hitlist(numseqs, numseqs, seed=1, orgtags=orgtags1))
+    orgset2, _ = get_orgs_from_hitlist(synth.make_hitlist(numseqs, numseqs, seed=2, orgtags=orgtags2))
+    return lambda: match_orgtags(orgset1, orgset2)
+
+
+def bench_reduce_seq_set(tmpdir, numseqs, seqlen, dcalen):
+    """reduce_seq_set incl. rewriting the two fasta files
+    (different seqs of the same, matched organisms)"""
+    from reduce_seq_set import reduce_seq_set
+    orgtags = synth.make_orgtags(numseqs)
+    seqdict1 = synth.make_seqdict(numseqs, seqlen, seed=1, orgtags=orgtags)
+    seqdict2 = synth.make_seqdict(numseqs, seqlen, seed=2, orgtags=orgtags)
+    fastafile1, fastafile2 = tmpdir / 'reduce1.fasta', tmpdir / 'reduce2.fasta'
+
+    def run():
+        synth.write_fasta(fastafile1, seqdict1)
+        synth.write_fasta(fastafile2, seqdict2)
+        reduce_seq_set(fastafile1, fastafile2, seqlen)
+    return run
+
+
+def bench_join_two_orgdicts(tmpdir, numseqs, seqlen, dcalen):
+    """join_two_orgdicts of two aligned orgdicts of the same,
+    matched organisms"""
+    from process_alnseqs import get_orgdict_from_fadict, join_two_orgdicts
+    orgtags = synth.make_orgtags(numseqs)
+    orgdict1 = get_orgdict_from_fadict(synth.make_alignment(numseqs, seqlen, seed=1, orgtags=orgtags))
+    orgdict2 = get_orgdict_from_fadict(synth.make_alignment(numseqs, seqlen, seed=2, orgtags=orgtags))
+    return lambda: join_two_orgdicts(orgdict1, orgdict2)
+
+
+def bench_pydca_mfdca(tmpdir, numseqs, seqlen, dcalen):
+    """pydca mfdca as run by the workflow (run_pydca_mfdca), at most 500 seqs"""
+    from pydca.meanfield_dca import meanfield_dca # skipped without pydca
+    from run_dca import run_pydca_mfdca
+    seqs = synth.planted_alignment(min(numseqs, 500), dcalen, dcalen // 10)
+    alnfile = tmpdir / 'pydca_mfdca.fasta'
+    synth.write_fasta(alnfile, {f'seq{idx}': seq for idx, seq in enumerate(seqs)})
+    return lambda: run_pydca_mfdca(alnfile, False)
+
+
+def bench_dca_cache_mfdca(tmpdir, numseqs, seqlen, dcalen):
+    """exact numpy mfdca (dca_cache.py), at most 500 seqs"""
+    from dca_cache import (encode_alignment, compute_weights, compute_raw_frequencies,
+                           apply_pseudocount, compute_couplings, couplings_to_fn_apc, sorted_pairs)
+    seqs = synth.planted_alignment(min(numseqs, 500), dcalen, dcalen // 10)
+
+    def run():
+        msa = encode_alignment(seqs)
+        weights = compute_weights(msa, 0.8)
+        fi, fij = apply_pseudocount(*compute_raw_frequencies(msa, weights), dcalen, 0.5)
+        sorted_pairs(couplings_to_fn_apc(compute_couplings(fi, fij), dcalen))
+    return run
+
+
+BENCHMARKS = {'parse_fasta': bench_parse_fasta,
+              'fa_todict': bench_fa_todict,
+              'writeout_fasta': bench_writeout_fasta,
+              'get_orgs_from_hitlist': bench_get_orgs_from_hitlist,
+              'select_seqheader_from_org': bench_select_seqheader_from_org,
+              'match_orgtags': bench_match_orgtags,
+              'reduce_seq_set': bench_reduce_seq_set,
+              'join_two_orgdicts': bench_join_two_orgdicts,
+              'pydca_mfdca': bench_pydca_mfdca,
+              'dca_cache_mfdca': bench_dca_cache_mfdca}
+
+
+def get_git_commit():
+    """Returns current git commit of the repo, or None"""
+    try:
+        proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=Path(__file__).resolve().parent)
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def time_benchmark(func, repeat):
+    """Times func with timeit: picks number of loops so one
+    repeat takes at least 0.2 seconds.
+
+    :returns: dict with best and mean time per call in seconds
+    """
+    timer = timeit.Timer(func)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        number, _ = timer.autorange()
+        times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {'best_s': min(times), 'mean_s': sum(times) / len(times), 'loops': number, 'repeats': repeat}
+
+
+def run_benchmarks(names, scales, repeat=5):
+    """Runs the selected benchmarks at the selected scales.
+
+    :returns: dict {'meta': {...}, 'results': {'name[scale]': {...}}}
+    """
+    results = {}
+    tmpdir = Path(tempfile.mkdtemp(prefix='eukdca_bench_'))
+    try:
+        for name in names:
+            for scale in scales:
+                key = f'{name}[{scale}]'
+                try:
+                    func = BENCHMARKS[name](tmpdir, *SCALES[scale])
+                except ImportError as imperr:
+                    print(f'{key:40s} skipped: {imperr}')
+                    continue
+                results[key] = time_benchmark(func, repeat)
+                print(f"{key:40s} best {results[key]['best_s'] * 1e3:10.3f} ms")
+    finally:
+        shutil.rmtree(tmpdir)
+    meta = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': get_git_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()}
+    return {'meta': meta, 'results': results}
+
+
+def compare_results(current, baseline, threshold=1.10):
+    """Prints ratio of best times current/baseline for shared
+    benchmarks. Returns list of keys slower than threshold."""
+    regressions = []
+    for key, res in current['results'].items():
+        if key not in baseline['results']:
+            continue
+        ratio = res['best_s'] / baseline['results'][key]['best_s']
+        flag = ''
+        if ratio > threshold:
+            regressions.append(key)
+            flag = '  <-- REGRESSION'
+        print(f'{key:40s} {ratio:6.2f}x{flag}')
+    return regressions
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] [--bench NAME ...] [--scale SCALE ...] [--out JSON] [--compare JSON]")
+    parser.add_argument("--bench", nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--scale", nargs='+', default=list(SCALES), choices=list(SCALES), help="data scales")
+    parser.add_argument("--repeat", type=int, default=5, help="timeit repeats")
+    parser.add_argument("--out", help="write results to this json file")
+    parser.add_argument("--compare", help="baseline results json to compare against")
+    parser.add_argument("--threshold", type=float, default=1.10, help="slowdown ratio counted as regression")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.bench, args.scale, args.repeat)
+    if args.out:
+        with open(args.out, 'w') as outf:
+            json.dump(current, outf, indent=2)
+        print(f'Results written into {args.out}')
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare_results(current, baseline, args.threshold):
+            sys.exit(1)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+bench_workflow.py
+
+End-to-end benchmark of run_workflow.py without HMMER, Easel,
+muscle or a UniProt database.
+
+Generates a synthetic database with homologs of N synthetic PDB
+entries (two chains each), puts the fake phmmer, esl-sfetch and
+muscle from fakebin/ first on PATH, runs the workflow tasks for
+every entry and reports per-task and total throughput from the
+workflow's metrics files.
+
+Latency of the fake tools is set with --latency (seconds per call).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import subprocess
+from pathlib import Path
+
+BENCHDIR = Path(__file__).resolve().parent
+SCRIPTSDIR = BENCHDIR.parent / 'scripts'
+FAKEBIN = BENCHDIR / 'fakebin'
+
+sys.path.append(str(SCRIPTSDIR))
+
+import synthetic_data as synth
+from config_file_from_pdbid import writeout_config_file
+from stage_metrics import readin_metrics
+
+DIRS = ('db', 'fastafiles', 'phmmerlogs', 'keyfiles', 'alignments', 'dca', 'configs', 'metrics')
+
+
+def make_benchmark_data(workdir, numentries, numorgs=150, seqlen=250, numnoise=500,
+                        presence=0.9, seed=0):
+    """Generates refseqs, configs, a paths file and a database
+    of homologs for numentries synthetic PDB entries.
+
+    :param workdir: pathlib.PosixPath
+    :param numentries: int
+    :param numorgs: int, organisms in the database
+    :param presence: float, fraction of organisms with a homolog of a chain
+
+    :returns pathsfile: pathlib.PosixPath
+    :returns configfiles: list of pathlib.PosixPath
+    """
+    rng = random.Random(seed)
+    for dirname in DIRS:
+        (workdir / dirname).mkdir(parents=True, exist_ok=True)
+    orgtags = synth.make_orgtags(numorgs, seed)
+
+    database = {}
+    configfiles = []
+    for n in range(numentries):
+        pdbid = f's{n:03d}'
+        for chain in ('A', 'B'):
+            refseq = synth.random_seq(rng, int(seqlen * rng.uniform(0.7, 1.3)))
+            synth.write_fasta(workdir / 'fastafiles' / f'{pdbid}_{chain}_refseq.fasta',
+                              {f'{pdbid}_{chain} synthetic refseq': refseq})
+            for orgtag in orgtags:
+                if rng.random() < presence:
+                    homolog = synth.mutate_seq(rng, refseq, rng.uniform(0.5, 0.9))
+                    database[synth.make_header(rng, orgtag, rng.random() < 0.1)] = homolog
+        writeout_config_file(workdir / 'configs', pdbid)
+        configfiles.append(workdir / 'configs' / f'config_{pdbid}.txt')
+    for _ in range(numnoise):
+        database[synth.make_header(rng, rng.choice(orgtags))] = synth.random_seq(rng, seqlen)
+
+    headers = list(database)
+    rng.shuffle(headers)
+    dbpath = workdir / 'db' / 'synthdb.fasta'
+    synth.write_fasta(dbpath, {header: database[header] for header in headers})
+    subprocess.run([str(FAKEBIN / 'esl-sfetch'), '--index', str(dbpath)], check=True, stdout=subprocess.DEVNULL)
+
+    pathsfile = workdir / 'paths.txt'
+    with open(pathsfile, 'w') as f:
+        f.write(f"dbpath={dbpath}\n")
+        f.write("easelpath=\n")
+        f.write(f"fastapath={workdir / 'fastafiles'}\n")
+        f.write(f"phmmerpath={workdir / 'phmmerlogs'}\n")
+        f.write(f"keyfilepath={workdir / 'keyfiles'}\n")
+        f.write(f"alnpath={workdir / 'alignments'}\n")
+        f.write(f"dcapath={workdir / 'dca'}\n")
+        f.write(f"metricspath={workdir / 'metrics'}\n")
+    return pathsfile, configfiles
+
+
+def run_entries(configfiles, pathsfile, tasks, latency, workdir):
+    """Runs run_workflow.py once per entry with the fake tools.
+
+    :returns: float, total wall time in seconds
+    """
+    env = dict(os.environ)
+    env['PATH'] = f"{FAKEBIN}{os.pathsep}{env.get('PATH', '')}"
+    env['FAKE_TOOL_LATENCY'] = str(latency)
+    start = time.perf_counter()
+    for configfile in configfiles:
+        subprocess.run([sys.executable, str(SCRIPTSDIR / 'run_workflow.py'), str(configfile), str(pathsfile),
+                        *tasks, '--redo', 'True'],
+                       env=env, cwd=workdir / 'fastafiles', stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def summarize_metrics(metricsdir, numentries, totalwall):
+    """Aggregates task records of all metrics files.
+
+    :returns: dict with per-task and total throughput
+    """
+    records = []
+    for metricsfile in sorted(metricsdir.glob('*_metrics.jsonl')):
+        records += readin_metrics(metricsfile)
+    tasks = {}
+    for record in records:
+        task = tasks.setdefault(record['task'], {'runs': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'child_cpu_s': 0.0})
+        task['runs'] += 1
+        task['wall_s'] += record['wall_s']
+        task['cpu_s'] += record['cpu_s']
+        task['child_cpu_s'] += record['child_cpu_s']
+    for task in tasks.values():
+        task['entries_per_s'] = task['runs'] / task['wall_s'] if task['wall_s'] else None
+    return {'entries': numentries,
+            'total_wall_s': round(totalwall, 3),
+            'entries_per_s': numentries / totalwall,
+            'tasks': tasks}
+
+
+def print_summary(summary):
+    """Prints per-task and total throughput table"""
+    tasktotal = sum(task['wall_s'] for task in summary['tasks'].values())
+    print(f"{'task':20s} {'runs':>5s} {'wall_s':>9s} {'share':>6s} {'entries/s':>10s}")
+    for name, task in summary['tasks'].items():
+        share = task['wall_s'] / tasktotal if tasktotal else 0.0
+        rate = f"{task['entries_per_s']:10.2f}" if task['entries_per_s'] else f"{'-':>10s}"
+        print(f"{name:20s} {task['runs']:5d} {task['wall_s']:9.3f} {share:6.1%} {rate}")
+    print(f"total: {summary['entries']} entries in {summary['total_wall_s']} s "
+          f"({summary['entries_per_s']:.2f} entries/s, {tasktotal:.3f} s inside tasks)")
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] [--entries N] [--latency S] [--workdir DIR] [--tasks TASK ...] [--out JSON]")
+    parser.add_argument("--entries", type=int, default=5, help="number of synthetic PDB entries")
+    parser.add_argument("--numorgs", type=int, default=150, help="organisms in synthetic database")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency per fake tool call")
+    parser.add_argument("--workdir", help="working dir, temporary if not given")
+    parser.add_argument("--tasks", nargs='+', default=['all'], help="workflow tasks to run")
+    parser.add_argument("--out", help="write summary to this json file")
+    args = parser.parse_args()
+
+    import tempfile
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix='eukdca_e2e_'))
+    try:
+        pathsfile, configfiles = make_benchmark_data(workdir, args.entries, args.numorgs)
+        totalwall = run_entries(configfiles, pathsfile, args.tasks, args.latency, workdir)
+        summary = summarize_metrics(workdir / 'metrics', args.entries, totalwall)
+        print_summary(summary)
+        if args.out:
+            with open(args.out, 'w') as outf:
+                json.dump(summary, outf, indent=2)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+fake_tools.py
+
+Deterministic stand-ins for phmmer, esl-sfetch and muscle,
+used by bench_workflow.py. The executables in this directory
+are thin wrappers around the functions here.
+
+They accept the command lines used by the workflow and write
+output in the formats the workflow parses. Each invocation sleeps
+for a configurable latency first, set in seconds via
+FAKE_<TOOL>_LATENCY (e.g. FAKE_PHMMER_LATENCY) or FAKE_TOOL_LATENCY.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+
+KMER = 3
+
+
+def sleep_latency(tool):
+    """Sleeps for the configured latency of tool"""
+    latency = os.environ.get(f'FAKE_{tool.upper()}_LATENCY', os.environ.get('FAKE_TOOL_LATENCY', '0'))
+    time.sleep(float(latency))
+
+
+def read_fasta(filepath):
+    """Returns list of (header, seq) from a fasta file"""
+    records = []
+    with open(filepath, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('>'):
+                records.append([line[1:], []])
+            else:
+                records[-1][1].append(line)
+    return [(header, ''.join(seq)) for header, seq in records]
+
+
+def kmers(seq):
+    """Returns set of k-mers of seq"""
+    return {seq[k:k + KMER] for k in range(len(seq) - KMER + 1)}
+
+
+def phmmer(argv):
+    """phmmer -o OUT [--noali] [--cpu N] [-Z N] SEQFILE DBFILE
+
+    Scores database sequences by the fraction of shared 3-mers with
+    the query and writes a phmmer-style hit table."""
+    sleep_latency('phmmer')
+    args = list(argv)
+    outpath, dbsize = None, None
+    positional = []
+    while args:
+        arg = args.pop(0)
+        if arg == '-o':
+            outpath = args.pop(0)
+        elif arg in ('--cpu', '--incE', '-E'):
+            args.pop(0)
+        elif arg == '-Z':
+            dbsize = float(args.pop(0))
+        elif arg.startswith('-'):
+            continue
+        else:
+            positional.append(arg)
+    seqfile, dbfile = positional
+    if not os.path.isfile(dbfile):
+        sys.stderr.write(f'Error: Failed to open sequence file {dbfile} for reading\n')
+        return 1
+
+    queryname, queryseq = read_fasta(seqfile)[0]
+    querykmers = kmers(queryseq)
+    database = read_fasta(dbfile)
+    dbsize = dbsize or len(database)
+
+    hits = []
+    for header, seq in database:
+        similarity = len(querykmers & kmers(seq)) / max(len(querykmers), 1)
+        bits = 300.0 * similarity - 15.0
+        evalue = dbsize * math.pow(2.0, -bits)
+        if evalue <= 10.0:
+            name, _, desc = header.partition(' ')
+            hits.append((evalue, bits, name, desc))
+    hits.sort(key=lambda hit: (hit[0], hit[2]))
+
+    lines = ['# phmmer :: search a protein sequence against a protein database',
+             '# fake phmmer for benchmarking',
+             f'Query:       {queryname.split()[0]}  [L={len(queryseq)}]',
+             'Scores for complete sequences (score includes all domains):',
+             '   --- full sequence ---   --- best 1 domain ---    -#dom-',
+             '    E-value  score  bias    E-value  score  bias    exp  N  Sequence   Description',
+             '    ------- ------ -----    ------- ------ -----   ---- --  --------   -----------']
+    inclusion = True
+    for evalue, bits, name, desc in hits:
+        if inclusion and evalue > 0.01:
+            lines.append('  ------ inclusion threshold ------')
+            inclusion = False
+        lines.append(f'    {evalue:7.2g} {bits:6.1f}   0.0    {evalue:7.2g} {bits:6.1f}   0.0    1.0  1  {name}  {desc}')
+    lines.append('')
+    lines.append('//')
+    lines.append('[ok]')
+    with open(outpath, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return 0
+
+
+def ssi_path(dbfile):
+    """Returns path of the fake SSI index of dbfile"""
+    return f'{dbfile}.ssi'
+
+
+def sfetch_index(dbfile):
+    """Writes a json index {name: (offset, length)} of dbfile"""
+    index = {}
+    offset = 0
+    name, start = None, 0
+    with open(dbfile, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if name is not None:
+                    index[name] = (start, offset - start)
+                name, start = line[1:].split()[0].decode(), offset
+            offset += len(line)
+    if name is not None:
+        index[name] = (start, offset - start)
+    with open(ssi_path(dbfile), 'w') as f:
+        json.dump(index, f)
+    print(f'SSI index written to file {ssi_path(dbfile)}')
+    return 0
+
+
+def esl_sfetch(argv):
+    """esl-sfetch --index DBFILE
+       esl-sfetch DBFILE NAME
+       esl-sfetch -f DBFILE KEYFILE"""
+    sleep_latency('esl_sfetch')
+    if argv[0] == '--index':
+        return sfetch_index(argv[1])
+    if argv[0] == '-f':
+        dbfile, keyfile = argv[1], argv[2]
+        with open(keyfile, 'r') as k:
+            names = [line.strip() for line in k if line.strip()]
+    else:
+        dbfile, names = argv[0], [argv[1]]
+    if not os.path.isfile(ssi_path(dbfile)):
+        sys.stderr.write(f'Failed to open SSI index for {dbfile}\n')
+        return 1
+    with open(ssi_path(dbfile), 'r') as f:
+        index = json.load(f)
+    with open(dbfile, 'rb') as db:
+        for name in names:
+            if name not in index:
+                sys.stderr.write(f'seq {name} not found in SSI index for file {dbfile}\n')
+                return 1
+            offset, length = index[name]
+            db.seek(offset)
+            sys.stdout.write(db.read(length).decode())
+    return 0
+
+
+def muscle(argv):
+    """muscle -in IN -out OUT
+
+    "Aligns" by padding every sequence with trailing gaps to the
+    length of the longest one."""
+    sleep_latency('muscle')
+    inpath = argv[argv.index('-in') + 1]
+    outpath = argv[argv.index('-out') + 1]
+    records = read_fasta(inpath)
+    alnlength = max(len(seq) for _, seq in records)
+    with open(outpath, 'w') as f:
+        for header, seq in records:
+            f.write(f'>{header}\n{seq.ljust(alnlength, "-")}\n')
+    return 0
+
+
+TOOLS = {'phmmer': phmmer, 'esl-sfetch': esl_sfetch, 'muscle': muscle}
+
+
+def main(toolname):
+    """Runs tool with the command line arguments"""
+    return TOOLS[toolname](sys.argv[1:])
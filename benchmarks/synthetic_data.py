@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+synthetic_data.py
+
+Deterministic synthetic data for benchmarks:
+UniProt-style fasta headers, random protein sequences,
+phmmer-like hit lists and alignments of configurable size.
+
+Headers follow the form the workflow expects:
+
+' >db|UniqueIdentifier|EntryName ProteinName OS=... '
+
+with EntryName = ACCESSION_ORGTAG (exactly one underscore).
+"""
+
+import random
+import string
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def make_orgtags(numorgs, seed=0):
+    """Returns numorgs distinct 5-letter organism tags"""
+    rng = random.Random(seed)
+    tags = set()
+    while len(tags) < numorgs:
+        tags.add(''.join(rng.choice(string.ascii_uppercase) for _ in range(5)))
+    return sorted(tags)
+
+
+def make_orgtag_pair(numorgs, overlap, seed=0):
+    """Returns two lists of numorgs organism tags sharing
+    round(overlap * numorgs) tags, e.g. organisms of two chains"""
+    numshared = round(numorgs * overlap)
+    tags = make_orgtags(2 * numorgs - numshared, seed)
+    random.Random(seed).shuffle(tags)
+    shared = tags[:numshared]
+    return sorted(shared + tags[numshared:numorgs]), sorted(shared + tags[numorgs:])
+
+
+def make_accession(rng):
+    """Returns a UniProt-like accession, e.g. A0A1B2C3D4"""
+    return 'A0A' + ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(7))
+
+
+def make_header(rng, orgtag, swissprot=False):
+    """Returns a UniProt-style fasta header (without '>')"""
+    accession = make_accession(rng)
+    db = 'sp' if swissprot else 'tr'
+    return f'{db}|{accession}|{accession}_{orgtag} Synthetic protein OS=Synthetic {orgtag} OX=1'
+
+
+def random_seq(rng, seqlen):
+    """Returns random protein sequence"""
+    return ''.join(rng.choice(AMINO_ACIDS) for _ in range(seqlen))
+
+
+def mutate_seq(rng, seq, identity):
+    """Returns copy of seq with roughly (1-identity) of residues substituted"""
+    return ''.join(aa if rng.random() < identity else rng.choice(AMINO_ACIDS) for aa in seq)
+
+
+def make_seqdict(numseqs, seqlen, numorgs=None, seed=0, lengthspread=0.3, swissprotfrac=0.1, orgtags=None):
+    """Returns fasta dict {header: seq} with numseqs sequences
+    from numorgs organisms (default: one per sequence), or from
+    the given orgtags. Sequence lengths vary by +-lengthspread
+    around seqlen.
+    """
+    rng = random.Random(seed)
+    orgtags = orgtags or make_orgtags(numorgs or numseqs, seed)
+    seqdict = {}
+    for n in range(numseqs):
+        header = make_header(rng, orgtags[n % len(orgtags)], rng.random() < swissprotfrac)
+        length = max(1, int(seqlen * (1 + rng.uniform(-lengthspread, lengthspread))))
+        seqdict[header] = random_seq(rng, length)
+    return seqdict
+
+
+def make_hitlist(numhits, numorgs, seed=0, swissprotfrac=0.1, orgtags=None):
+    """Returns a list of keyfile-style seq ids (db|acc|acc_ORG)
+    of numorgs organisms, or of the given orgtags"""
+    rng = random.Random(seed)
+    orgtags = orgtags or make_orgtags(numorgs, seed)
+    hits = []
+    for _ in range(numhits):
+        header = make_header(rng, rng.choice(orgtags), rng.random() < swissprotfrac)
+        hits.append(header.split()[0])
+    return hits
+
+
+def make_alignment(numseqs, seqlen, numorgs=None, seed=0, gapfrac=0.1, identity=0.5, orgtags=None):
+    """Returns aligned fasta dict {header: seq} of equal-length
+    sequences derived from one ancestor, from numorgs organisms
+    or the given orgtags."""
+    rng = random.Random(seed)
+    orgtags = orgtags or make_orgtags(numorgs or numseqs, seed)
+    ancestor = random_seq(rng, seqlen)
+    alndict = {}
+    for n in range(numseqs):
+        seq = mutate_seq(rng, ancestor, identity)
+        seq = ''.join('-' if rng.random() < gapfrac else aa for aa in seq)
+        alndict[make_header(rng, orgtags[n % len(orgtags)])] = seq
+    return alndict
+
+
+def planted_alignment(numseqs, seqlen, numcoupled, seed=0):
+    """Returns list of random aligned seqs in which numcoupled
+    disjoint column pairs covary."""
+    rng = random.Random(seed)
+    columns = rng.sample(range(seqlen), 2 * numcoupled)
+    coupled = list(zip(columns[::2], columns[1::2]))
+    seqs = []
+    for _ in range(numseqs):
+        seq = [rng.choice(AMINO_ACIDS + '-') for _ in range(seqlen)]
+        for i, j in coupled:
+            seq[i] = rng.choice('ACDEFGHIKL')
+            seq[j] = 'MNPQRSTVWY'['ACDEFGHIKL'.index(seq[i])]
+        seqs.append(''.join(seq))
+    return seqs
+
+
+def fasta_lines(seqdict, linewidth=60):
+    """Returns fasta dict as list of lines, wrapped at linewidth"""
+    lines = []
+    for header, seq in seqdict.items():
+        lines.append(f'>{header}\n')
+        lines.extend(f'{seq[k:k + linewidth]}\n' for k in range(0, len(seq), linewidth))
+    return lines
+
+
+def write_fasta(filepath, seqdict, linewidth=60):
+    """Writes fasta dict to file, wrapped at linewidth"""
+    with open(filepath, 'w') as f:
+        f.writelines(fasta_lines(seqdict, linewidth))
@@ -5,13 +5,22 @@ align_seqs.py
 Runs muscle alignment for a given set of sequences.
 
 Appends refseq back into seq file before alignment.
+Identical seqs are aligned once and expanded afterwards
+(collapse_seqs.py).
+
+Muscle is killed once its resident memory reaches a limit;
+align_guarded then drops the organisms with the longest seqs
+(from copies of the fasta files of both chains) and realigns. The limit is the
+musclememorymb setting in paths.txt (in MB, default: the memory
+budget, see resource_scheduler.py).
 """
 
-import time
-import subprocess
+import shutil
 from pathlib import Path
 
 from io_utils import does_target_exist, fa_todict, writeout_fasta
+from resource_scheduler import reserve, get_budget
+from async_tools import run_tool
 
 
 def add_refseq(fastafile_path, refseqfile_path):
@@ -29,12 +38,38 @@ def add_refseq(fastafile_path, refseqfile_path):
     writeout_fasta(fastafile_path, fadict, overwrite=True, addict=newrefseqdict)
 
 
-def run_muscle(fastafile_path, refseqfile_path, alignmentspath, redo):
+def estimate_muscle_memory_mb(fastafile_path):
+    """Rough estimate of muscle peak memory in MB:
+    distance matrices grow with numseqs^2, profiles
+    with numseqs * seqlength.
+
+    :param fastafile_path: pathlib.PosixPath
+
+    :returns: int
+    """
+    fadict = fa_todict(fastafile_path)
+    numseqs = len(fadict)
+    maxlength = max((len(seq) for seq in fadict.values()), default=0)
+    return 100 + (16 * numseqs**2 + 200 * numseqs * maxlength) // 2**20
+
+
+def get_muscle_memlimit_mb(musclememorymb=None):
+    """Returns resident memory in MB at which muscle is killed:
+    musclememorymb if given, else the memory budget"""
+    if musclememorymb is not None:
+        return musclememorymb
+    return get_budget()[1]
+
+
+def run_muscle(fastafile_path, refseqfile_path, alignmentspath, redo, timeout=None, memlimit_mb=None):
     """
     Spawns subprocess to run muscle.
 
     :param fastafile_path: pathlib.PosixPath
     :param alignmentspath: pathlib.PosixPath
+    :param timeout: float or None, seconds until muscle is killed
+    :param memlimit_mb: float or None, muscle is killed at this
+    resident memory and MemoryError raised
 
     :returns alnfile_path: pathlib.PosixPath, aligned fasta
     """
@@ -56,11 +91,170 @@ def run_muscle(fastafile_path, refseqfile_path, alignmentspath, redo):
                "-out",
                f"{outpath}"]
 
-    start = time.perf_counter()
-    proc = subprocess.run(cmdargs)
-    stop = time.perf_counter()
-    if proc.returncode != 0:
+    with reserve(1, estimate_muscle_memory_mb(fastafile_path)):
+        result = run_tool(cmdargs, timeout=timeout, echo=True, memlimit_mb=memlimit_mb)
+    if result.timedout:
+        outpath.unlink(missing_ok=True)
+        raise ValueError(f'Muscle timed out after {timeout} seconds on {fastafile_path}.')
+    elif result.memkilled:
+        outpath.unlink(missing_ok=True)
+        raise MemoryError(f'MUSCLE MEMORY: Muscle killed at {result.peakrss_mb:0.0f} MB (limit {memlimit_mb} MB) on {fastafile_path}.')
+    elif result.returncode != 0:
         raise ValueError(f'Muscle could not align {fastafile_path}.')
-    print(f'Muscle ran in {stop-start:0.4f} seconds')
+    print(f'Muscle ran in {result.runtime:0.4f} seconds')
     print(f'Alignment stored in {outpath}')
     return outpath
+
+
+def align_collapsed(fastafile_path, refseqfile_path, alignmentspath, redo, timeout=None, memlimit_mb=None):
+    """
+    Aligns one seq per group of identical seqs with muscle
+    and expands the alignment to all seqs (see collapse_seqs).
+
+    :param fastafile_path: pathlib.PosixPath
+    :param alignmentspath: pathlib.PosixPath
+    :param timeout: float or None, seconds until muscle is killed
+    :param memlimit_mb: float or None, see run_muscle
+
+    :returns alnfile_path: pathlib.PosixPath, aligned fasta of all seqs
+    """
+    from collapse_seqs import get_collapsed_paths, collapse_duplicates, expand_alignment
+
+    outpath = alignmentspath / Path(f'{fastafile_path.stem}.aln')
+
+    if not does_target_exist(fastafile_path, 'file'):
+        raise FileNotFoundError(f'Fasta file with seqs to align not found: {fastafile_path}.')
+    elif fastafile_path.stat().st_size == 0:
+        raise ValueError(f'EMPTY FILE: {fastafile_path}.')
+    elif does_target_exist(outpath, 'file') and redo==False:
+        print(f'Alignment file {outpath} already exists. Give --redo True to realign.')
+        return outpath
+
+    uniquepath, dupmappath = get_collapsed_paths(fastafile_path)
+    numdups = collapse_duplicates(fastafile_path, uniquepath, dupmappath)
+    print(f'{numdups} identical seqs collapsed, aligning {uniquepath}')
+    uniquealn = run_muscle(uniquepath, refseqfile_path, alignmentspath, True, timeout, memlimit_mb)
+    expand_alignment(uniquealn, dupmappath, outpath)
+    print(f'Expanded alignment stored in {outpath}')
+    return outpath
+
+
+def get_reduced_path(fastafile_path):
+    """Returns path of the reduced copy of a fasta file, see align_guarded"""
+    return fastafile_path.parent / f'{fastafile_path.stem}_reduced.fasta'
+
+
+def get_aln_path(fastafile_path, alignmentspath):
+    """Returns path of the muscle alignment of a fasta file"""
+    return alignmentspath / f'{fastafile_path.stem}.aln'
+
+
+def align_guarded(fastafile_paths, refseqfile_paths, alignmentspath, redo, timeout=None, memlimit_mb=None,
+                  maxretries=3, dropfraction=0.1, droppedpaths=None):
+    """
+    Runs align_collapsed for the seqs of one chain, or of both
+    chains of a pair whose organisms have to agree. If muscle hits
+    the memory limit on any chain, the organisms with the longest
+    seqs are dropped from all chains and all chains are aligned
+    again, also those aligned before the drop.
+
+    Organisms are dropped from {fasta stem}_reduced.fasta copies,
+    the fasta files (cached easel outputs) are not changed, so a
+    run with a higher limit aligns all organisms again. Alignments
+    of the reduced seqs are reused without redo.
+
+    :param fastafile_paths: list of pathlib.PosixPath, seqs of each chain
+    :param refseqfile_paths: list of pathlib.PosixPath, in order of fastafile_paths
+    :param alignmentspath: pathlib.PosixPath
+    :param memlimit_mb: float or None, see run_muscle
+    :param maxretries: int
+    :param dropfraction: float, fraction of organisms dropped per retry
+    :param droppedpaths: list of pathlib.PosixPath or None, records of
+    the dropped organisms, default {fasta stem}.dropped of each chain
+
+    :returns alnfile_paths: list of pathlib.PosixPath, in order of fastafile_paths
+    """
+    from reduce_seq_set import drop_longest_orgs, writeout_dropped_orgs, get_dropped_path
+
+    if droppedpaths is None:
+        droppedpaths = [get_dropped_path(fastafile_path) for fastafile_path in fastafile_paths]
+    reducedpaths = [get_reduced_path(fastafile_path) for fastafile_path in fastafile_paths]
+    reducedalns = [get_aln_path(reducedpath, alignmentspath) for reducedpath in reducedpaths]
+    if redo == False and \
+            not all(does_target_exist(get_aln_path(fastafile_path, alignmentspath), 'file') for fastafile_path in fastafile_paths) and \
+            all(does_target_exist(alnpath, 'file') and alnpath.stat().st_mtime >= fastafile_path.stat().st_mtime
+                for alnpath, fastafile_path in zip(reducedalns, fastafile_paths)):
+        print(f'Alignments of reduced seqs {", ".join(map(str, reducedalns))} already exist. Give --redo True to realign.')
+        return reducedalns
+
+    inputpaths = fastafile_paths
+    for attempt in range(maxretries + 1):
+        try:
+            return [align_collapsed(inputpath, refseqfile_path, alignmentspath, redo or attempt > 0, timeout, memlimit_mb)
+                    for inputpath, refseqfile_path in zip(inputpaths, refseqfile_paths)]
+        except MemoryError as memerr:
+            print(memerr)
+            if attempt == maxretries:
+                raise
+            if attempt == 0:
+                for fastafile_path, reducedpath, droppedpath in zip(fastafile_paths, reducedpaths, droppedpaths):
+                    shutil.copyfile(fastafile_path, reducedpath)
+                    droppedpath.unlink(missing_ok=True)
+                inputpaths = reducedpaths
+            dropped = drop_longest_orgs(reducedpaths[0], reducedpaths[1] if len(reducedpaths) > 1 else None,
+                                        dropfraction)
+            if not dropped:
+                raise
+            for droppedpath in droppedpaths:
+                writeout_dropped_orgs(dropped, droppedpath, f'muscle memory limit {memlimit_mb} MB')
+            print(f'Dropped {len(dropped)} organisms with the longest seqs from {len(reducedpaths)} chain(s), '
+                  f'realigning (see {droppedpaths[0]})')
+
+
+def align_fullset(keyfile_path, refseqfile_path, easelpath, databasepath, fastapath, alignmentspath, redo,
+                  minhits=0, maxseqs=2000, maxlength=1600, timeout=None, memlimit_mb=None):
+    """
+    Aligns the best hit per organism of all phmmer hits of a
+    chain, independent of the partner chain. The alignment is
+    cached as {keyfile stem}_best.aln and realigned only with
+    redo or if the keyfile is newer. Rows of matched organisms
+    are extracted from it in process_alnseqs.
+
+    There is no partner fasta to drop organisms from when muscle
+    hits the memory limit; dropped organisms are recorded next to
+    the alignment ({keyfile stem}_best_reduced.dropped) instead,
+    and process_alnseqs.extract_matched_rows removes them from
+    both chains.
+
+    :param keyfile_path: pathlib.PosixPath, keyfile with all hits of the chain
+    :param refseqfile_path: pathlib.PosixPath
+    :param alignmentspath: pathlib.PosixPath
+    :param maxseqs: int, max number of organisms (in phmmer order)
+    :param maxlength: int, longer seqs are not aligned
+    :param memlimit_mb: float or None, see align_guarded
+
+    :returns alnfile_path: pathlib.PosixPath
+    """
+    from process_phmmerhits import select_best_hits
+    from run_easel_getseqs import run_easel_iterate
+    from reduce_seq_set import drop_long_seqs, get_dropped_path
+
+    if not does_target_exist(keyfile_path, 'file'):
+        raise FileNotFoundError(f'KEYFILE MISSING: Could not find {keyfile_path}!')
+    bestkeyfile_path = keyfile_path.parent / f'{keyfile_path.stem}_best.keyfile'
+    outpath = alignmentspath / f'{bestkeyfile_path.stem}.aln'
+    reducedaln = alignmentspath / f'{bestkeyfile_path.stem}_reduced.aln'
+    for alnpath in (outpath, reducedaln):
+        if redo == False and does_target_exist(alnpath, 'file') and alnpath.stat().st_mtime >= keyfile_path.stat().st_mtime:
+            print(f'Full set alignment {alnpath} already exists. Give --redo True to realign.')
+            return alnpath
+
+    select_best_hits(keyfile_path, bestkeyfile_path, minhits, maxseqs)
+    fastafile_path = run_easel_iterate(easelpath, databasepath, fastapath, bestkeyfile_path, True)
+    numlong = drop_long_seqs(fastafile_path, maxlength)
+    if numlong:
+        print(f'{numlong} seqs of length {maxlength} or longer not aligned.')
+    droppedpath = get_dropped_path(reducedaln)
+    droppedpath.unlink(missing_ok=True)
+    return align_guarded([fastafile_path], [refseqfile_path], alignmentspath, True, timeout, memlimit_mb,
+                         droppedpaths=[droppedpath])[0]
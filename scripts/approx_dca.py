@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+approx_dca.py
+
+Approximate mean-field DCA for very long joint alignments.
+
+Exact mfDCA inverts the full (L*(q-1))^2 correlation matrix, which
+takes several GB and cubic time for joint lengths above ~1000.
+Here the correlation matrix is replaced by a shrinkage estimate
+
+    C_s = lambda * D + (1 - lambda) * X^T X
+
+with D the diagonal of single-site variances and X the N x L*(q-1)
+weighted, centred one-hot matrix. C_s is diagonal plus rank N, so
+its inverse follows from the Woodbury identity with an N x N solve.
+Coupling blocks are then formed a few positions at a time, keeping
+memory at O(N*L*q) plus the (L, L) score matrix.
+"""
+
+import numpy as np
+
+from io_utils import fa_todict
+from dca_cache import (NUM_STATES, encode_alignment, remove_duplicate_seqs, onehot_nogap,
+                       compute_weights, zero_sum_frobenius_norms, apc_correct, sorted_pairs)
+
+
+def get_alignment_length(aln_path):
+    """Returns the length of the first sequence in an
+    alignment file without reading the whole file.
+
+    :param aln_path: pathlib.PosixPath
+
+    :returns: int
+    """
+    seqlen = 0
+    with open(aln_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if seqlen:
+                    break
+            else:
+                seqlen += len(line)
+    return seqlen
+
+
+def lowrank_factors(msa, weights, shrinkage):
+    """Returns the factors of the Woodbury form of the inverse
+    shrinkage correlation matrix, C_s^-1 = D^-1 - V M V^T.
+
+    :param msa: numpy.ndarray (N, L) of states
+    :param weights: numpy.ndarray (N,)
+    :param shrinkage: float, lambda between 0 and 1
+
+    :returns dinv: numpy.ndarray (L*(q-1),), inverse of lambda * D
+    :returns vmat: numpy.ndarray (L*(q-1), N)
+    :returns mmat: numpy.ndarray (N, N)
+    """
+    if not 0.0 < shrinkage < 1.0:
+        raise ValueError(f'Shrinkage must be between 0 and 1, got {shrinkage}')
+    onehot = onehot_nogap(msa)
+    meff = weights.sum()
+    fi = weights @ onehot / meff
+    # pseudocount-smoothed variances keep the diagonal positive for conserved states
+    fi_smooth = (1.0 - shrinkage) * fi + shrinkage / NUM_STATES
+    dinv = 1.0 / (shrinkage * fi_smooth * (1.0 - fi_smooth))
+
+    umat = (onehot - fi) * np.sqrt((1.0 - shrinkage) * weights / meff)[:, None]
+    vmat = (umat * dinv).T
+    mmat = np.linalg.inv(np.eye(len(weights)) + umat @ vmat)
+    return dinv, vmat, mmat
+
+
+def lowrank_fn_apc(msa, weights, shrinkage=0.5, chunksize=32):
+    """Computes APC-corrected Frobenius norms from the low-rank
+    couplings. The off-diagonal blocks of -C_s^-1 are V M V^T,
+    formed chunksize positions at a time.
+
+    :param msa: numpy.ndarray (N, L) of states
+    :param weights: numpy.ndarray (N,)
+    :param shrinkage: float
+    :param chunksize: int, positions per block row
+
+    :returns: numpy.ndarray (L, L)
+    """
+    seqlen = msa.shape[1]
+    blocksize = NUM_STATES - 1
+    _, vmat, mmat = lowrank_factors(msa, weights, shrinkage)
+    wmat = mmat @ vmat.T
+
+    fn = np.zeros((seqlen, seqlen))
+    for start in range(0, seqlen, chunksize):
+        stop = min(start + chunksize, seqlen)
+        rows = vmat[start * blocksize:stop * blocksize] @ wmat
+        blocks = rows.reshape(stop - start, blocksize, seqlen, blocksize)
+        fn[start:stop] = zero_sum_frobenius_norms(blocks)
+    np.fill_diagonal(fn, 0.0)
+    return apc_correct(fn)
+
+
+def run_lowrank_mfdca(jointaln_path, shrinkage=0.5, seqid=0.8):
+    """Runs approximate mfdca on a joint alignment.
+
+    :param jointaln_path: pathlib.PosixPath
+    :param shrinkage: float
+    :param seqid: float
+
+    :returns: list of tuples [((i,j),score),...], highest score first
+    """
+    msa = remove_duplicate_seqs(encode_alignment(list(fa_todict(jointaln_path).values())))
+    weights = compute_weights(msa, seqid)
+    return sorted_pairs(lowrank_fn_apc(msa, weights, shrinkage))
+
+
+def top_pair_agreement(dcalist1, dcalist2, numpairs):
+    """Fraction of the top numpairs pairs shared by two
+    sorted score lists.
+
+    :param dcalist: list of tuples [((i,j),score),...], sorted
+
+    :returns: float
+    """
+    top1 = {pair[0] for pair in dcalist1[:numpairs]}
+    top2 = {pair[0] for pair in dcalist2[:numpairs]}
+    return len(top1 & top2) / numpairs
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+async_tools.py
+
+Runs external tools (phmmer, esl-sfetch, muscle) as asyncio
+subprocesses:
+
+- stdout is streamed straight into an output file, or captured
+- stderr is read incrementally, optionally echoed as it arrives,
+  and only its last stderrlimit bytes are kept
+- a tool running longer than its timeout is killed
+- with memlimit_mb, the tool's resident memory (VmRSS) is sampled
+  and the tool is killed once it reaches the limit
+- run_tool_batch runs many invocations concurrently from one
+  process and writes their stdout to one file in input order,
+  holding at most maxjobs outputs at a time
+"""
+
+import sys
+import time
+import asyncio
+from collections import namedtuple, deque
+
+ToolResult = namedtuple('ToolResult', ['returncode', 'stdout', 'stderr', 'timedout', 'runtime', 'memkilled', 'peakrss_mb'],
+                        defaults=(False, None))
+
+CHUNKSIZE = 2**16
+
+
+async def read_stream(stream, chunks, limit=None, echo=False):
+    """Reads a stream in chunks until EOF into list chunks.
+    With limit, only about the last limit bytes are kept."""
+    kept = 0
+    while True:
+        chunk = await stream.read(CHUNKSIZE)
+        if not chunk:
+            break
+        if echo:
+            sys.stderr.write(chunk.decode('utf-8', 'replace'))
+            sys.stderr.flush()
+        chunks.append(chunk)
+        kept += len(chunk)
+        while limit is not None and kept - len(chunks[0]) >= limit:
+            kept -= len(chunks.pop(0))
+
+
+def read_rss_mb(pid):
+    """Returns resident memory (VmRSS) of a process in MB,
+    None if the process is gone"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def watch_memory(proc, limit_mb, state, poll=0.2):
+    """Samples the resident memory of proc until it exits,
+    kills it once it reaches limit_mb. Keeps the peak and
+    whether it was killed in dict state."""
+    while proc.returncode is None:
+        rss = read_rss_mb(proc.pid)
+        if rss is not None:
+            state['peakrss_mb'] = max(state['peakrss_mb'] or 0, rss)
+            if rss >= limit_mb:
+                state['memkilled'] = True
+                proc.kill()
+                return
+        await asyncio.sleep(poll)
+
+
+async def run_tool_async(cmdargs, stdoutpath=None, capture=False, timeout=None,
+                         echo=False, stderrlimit=2**20, memlimit_mb=None):
+    """Runs a tool as asyncio subprocess.
+
+    :param cmdargs: list of str
+    :param stdoutpath: pathlib.PosixPath or None, file for stdout
+    :param capture: bool, capture stdout as bytes (if no stdoutpath)
+    :param timeout: float or None, seconds until the tool is killed
+    :param echo: bool, write stderr to sys.stderr as it arrives
+    :param stderrlimit: int, bytes of stderr to keep
+    :param memlimit_mb: float or None, resident memory at which the tool is killed
+
+    :returns: ToolResult, stdout is None unless captured
+    """
+    outf = open(stdoutpath, 'wb') if stdoutpath is not None else None
+    if outf is not None:
+        stdout = outf
+    else:
+        stdout = asyncio.subprocess.PIPE if capture else asyncio.subprocess.DEVNULL
+    start = time.perf_counter()
+    memstate = {'memkilled': False, 'peakrss_mb': None}
+    watcher = None
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmdargs, stdout=stdout, stderr=asyncio.subprocess.PIPE)
+        outchunks, errchunks = [], []
+        readers = [read_stream(proc.stderr, errchunks, stderrlimit, echo)]
+        if stdout is asyncio.subprocess.PIPE:
+            readers.append(read_stream(proc.stdout, outchunks))
+        if memlimit_mb is not None:
+            watcher = asyncio.ensure_future(watch_memory(proc, memlimit_mb, memstate))
+        timedout = False
+        try:
+            await asyncio.wait_for(asyncio.gather(proc.wait(), *readers), timeout)
+        except asyncio.TimeoutError:
+            timedout = True
+            proc.kill()
+            await proc.wait()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if outf is not None:
+            outf.close()
+    return ToolResult(proc.returncode,
+                      b''.join(outchunks) if capture and outf is None else None,
+                      b''.join(errchunks).decode('utf-8', 'replace'),
+                      timedout,
+                      time.perf_counter() - start,
+                      memstate['memkilled'],
+                      memstate['peakrss_mb'])
+
+
+async def run_tool_batch_async(cmdlist, stdoutpath, maxjobs=8, timeout=None):
+    """Runs tools concurrently and writes their stdout to stdoutpath
+    in the order of cmdlist. Tools are started in a window of at most
+    maxjobs commands from the first one not yet written, so at most
+    maxjobs tools run and at most maxjobs-1 captured stdouts (of
+    tools finished ahead of an earlier one) are held in memory.
+
+    :returns: list of ToolResult (stdout None)
+    """
+    cmds = iter(cmdlist)
+    window = deque()
+
+    def fill_window():
+        while len(window) < maxjobs:
+            cmdargs = next(cmds, None)
+            if cmdargs is None:
+                return
+            window.append(asyncio.ensure_future(run_tool_async(cmdargs, capture=True, timeout=timeout)))
+
+    results = []
+    with open(stdoutpath, 'wb') as outf:
+        try:
+            fill_window()
+            while window:
+                result = await window.popleft()
+                outf.write(result.stdout)
+                results.append(result._replace(stdout=None))
+                fill_window()
+        finally:
+            for job in window:
+                job.cancel()
+    return results
+
+
+def run_tool(cmdargs, stdoutpath=None, capture=False, timeout=None, echo=False, memlimit_mb=None):
+    """Blocking wrapper of run_tool_async, returns ToolResult"""
+    return asyncio.run(run_tool_async(cmdargs, stdoutpath, capture, timeout, echo, memlimit_mb=memlimit_mb))
+
+
+def run_tool_batch(cmdlist, stdoutpath, maxjobs=8, timeout=None):
+    """Blocking wrapper of run_tool_batch_async, returns list of ToolResult"""
+    return asyncio.run(run_tool_batch_async(cmdlist, stdoutpath, maxjobs, timeout))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+build_euk_database.py
+
+Builds a eukaryote-only sequence database from a UniProt fasta
+file, so phmmer does not scan prokaryotic and viral sequences.
+
+The source fasta is streamed once. Each entry is kept if its
+taxon id (OX= in the header) or, without OX=, its UniProt
+organism code (e.g. HUMAN in sp|P12345|ABC_HUMAN) is eukaryotic.
+Eukaryotic taxon ids and organism codes are read from the UniProt
+controlled vocabulary of species (speclist.txt, kingdom code E):
+
+    HUMAN E    9606: N=Homo sapiens
+
+and/or from a file of eukaryotic taxon ids, one per line (first
+column, e.g. from an NCBI taxonomy dump). The database is then
+indexed with esl-sfetch --index ({database}.ssi); point dbpath in
+paths.txt at it.
+
+    python3 build_euk_database.py source.fasta euk.fasta easelpath --speclist speclist.txt [--taxids taxids.txt]
+"""
+
+import re
+from pathlib import Path
+
+from io_utils import does_target_exist, get_orgtag
+from shard_database import iter_entries
+from resource_scheduler import reserve
+from async_tools import run_tool
+from run_easel_getseqs import EASEL_MEMORY_MB
+
+EUKARYOTA = 'E'
+SPECLIST_REGEX = re.compile(r'^(\w{1,5})\s+([ABEVO])\s+(\d+):')
+OX_REGEX = re.compile(r'\bOX=(\d+)')
+
+
+def readin_speclist(speclistpath, kingdom=EUKARYOTA):
+    """Reads organism codes and taxon ids of a kingdom
+    from a UniProt speclist.txt file.
+
+    :param speclistpath: pathlib.PosixPath
+    :param kingdom: str, A, B, E, V or O
+
+    :returns: (set of organism codes, set of taxon ids as str)
+    """
+    orgtags = set()
+    taxids = set()
+    with open(speclistpath, 'r') as f:
+        for line in f:
+            match = SPECLIST_REGEX.match(line)
+            if match and match.group(2) == kingdom:
+                orgtags.add(match.group(1))
+                taxids.add(match.group(3))
+    return orgtags, taxids
+
+
+def readin_taxids(taxidspath):
+    """Reads taxon ids (first column), skipping blank lines and # comments"""
+    taxids = set()
+    with open(taxidspath, 'r') as f:
+        for line in f:
+            fields = line.split('#')[0].split()
+            if fields:
+                taxids.add(fields[0])
+    return taxids
+
+
+def is_eukaryotic(header, orgtags, taxids):
+    """True if a fasta header has a eukaryotic taxon id (OX=)
+    or, without OX=, a eukaryotic organism code.
+
+    :param header: str, header line without '>'
+    """
+    match = OX_REGEX.search(header)
+    if match and taxids:
+        return match.group(1) in taxids
+    return get_orgtag(header) in orgtags
+
+
+def filter_database(sourcepath, outpath, orgtags, taxids):
+    """Streams sourcepath and writes eukaryotic entries to outpath.
+
+    :param sourcepath: pathlib.PosixPath, fasta database
+    :param outpath: pathlib.PosixPath
+    :param orgtags: set of eukaryotic organism codes
+    :param taxids: set of eukaryotic taxon ids (str)
+
+    :returns: (number of seqs kept, number of seqs dropped)
+    """
+    if not does_target_exist(sourcepath, 'file'):
+        raise FileNotFoundError(f'DATABASE MISSING: {sourcepath}')
+    if not orgtags and not taxids:
+        raise ValueError('No eukaryotic organism codes or taxon ids given.')
+
+    kept = 0
+    dropped = 0
+    tmppath = outpath.with_name(f'{outpath.name}.tmp')
+    with open(tmppath, 'w') as f:
+        for lines, numres in iter_entries(sourcepath):
+            if is_eukaryotic(lines[0][1:], orgtags, taxids):
+                f.writelines(lines)
+                kept += 1
+            else:
+                dropped += 1
+    tmppath.replace(outpath)
+    return kept, dropped
+
+
+def index_database(easelpath, dbpath):
+    """Builds the SSI index of a database with esl-sfetch --index.
+
+    :returns: pathlib.PosixPath of the index
+    """
+    ssipath = dbpath.with_name(f'{dbpath.name}.ssi')
+    ssipath.unlink(missing_ok=True) # esl-sfetch does not overwrite an index
+    cmdargs = [f"{easelpath}/esl-sfetch",
+               "--index",
+               f"{dbpath}"]
+    with reserve(1, EASEL_MEMORY_MB):
+        result = run_tool(cmdargs)
+    if result.returncode != 0:
+        raise ValueError(f'Easel index unsuccessful for {dbpath}: {result.stderr.strip()}')
+    return ssipath
+
+
+def build_euk_database(sourcepath, outpath, easelpath, orgtags, taxids, redo=False):
+    """Writes and indexes the eukaryote-only database.
+
+    :param sourcepath: pathlib.PosixPath, fasta database
+    :param outpath: pathlib.PosixPath, eukaryote-only database
+    :param easelpath: pathlib.PosixPath, directory of esl-sfetch
+    :param orgtags: set of eukaryotic organism codes
+    :param taxids: set of eukaryotic taxon ids (str)
+    :param redo: bool
+
+    :returns outpath: pathlib.PosixPath
+    """
+    ssipath = outpath.with_name(f'{outpath.name}.ssi')
+    if redo == False and does_target_exist(outpath, 'file') and \
+        outpath.stat().st_mtime >= sourcepath.stat().st_mtime:
+        print(f'Eukaryote database {outpath} already exists.')
+        if does_target_exist(ssipath, 'file') and ssipath.stat().st_mtime >= outpath.stat().st_mtime:
+            return outpath
+    else:
+        kept, dropped = filter_database(sourcepath, outpath, orgtags, taxids)
+        print(f'{kept} eukaryotic seqs written into {outpath}, {dropped} seqs dropped')
+    ssipath = index_database(easelpath, outpath)
+    print(f'SSI index written into {ssipath}')
+    return outpath
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] source outfile easelpath [--speclist SPECLIST] [--taxids TAXIDS] [--redo]")
+    parser.add_argument("source", help="UniProt fasta database")
+    parser.add_argument("outfile", help="eukaryote-only fasta database to write")
+    parser.add_argument("easelpath", help="directory of esl-sfetch")
+    parser.add_argument("--speclist", help="UniProt speclist.txt (organism codes and taxon ids by kingdom)")
+    parser.add_argument("--taxids", help="file of eukaryotic taxon ids, one per line")
+    parser.add_argument("-r", "--redo", action='store_true', help="rebuild even if the database exists")
+    args = parser.parse_args()
+
+    orgtags, taxids = set(), set()
+    if args.speclist:
+        orgtags, taxids = readin_speclist(Path(args.speclist))
+    if args.taxids:
+        taxids |= readin_taxids(Path(args.taxids))
+
+    build_euk_database(Path(args.source), Path(args.outfile), Path(args.easelpath), orgtags, taxids, args.redo)
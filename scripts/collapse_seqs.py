@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+collapse_seqs.py
+
+Collapses identical sequences of a fasta file before alignment
+and re-expands the alignment afterwards, so muscle aligns each
+distinct sequence once. Closely related eukaryotes often have
+identical sequences for different organisms.
+
+    {stem}_unique.fasta  first header of each distinct seq
+    {stem}.dupmap        representative<TAB>duplicate header per line
+
+The expanded alignment has a row for every header of the input,
+so organism pairing and joining are unchanged.
+"""
+
+import hashlib
+from pathlib import Path
+
+from io_utils import does_target_exist, writeout_fasta, get_orgtag, SeqCollection
+
+
+def get_collapsed_paths(fastafile_path):
+    """Returns paths of the unique seqs fasta and of the dupmap"""
+    return (fastafile_path.parent / f'{fastafile_path.stem}_unique.fasta',
+            fastafile_path.parent / f'{fastafile_path.stem}.dupmap')
+
+
+def collapse_duplicates(fastafile_path, outpath, dupmappath):
+    """Writes the first header of each distinct seq (by hash)
+    to outpath and all other headers to dupmappath.
+    Refseq entries are dropped, they are added for alignment.
+
+    :param fastafile_path: pathlib.PosixPath
+    :param outpath: pathlib.PosixPath, unique seqs
+    :param dupmappath: pathlib.PosixPath
+
+    :returns: int, number of collapsed seqs
+    """
+    if not does_target_exist(fastafile_path, 'file'):
+        raise FileNotFoundError(f'Fasta file with seqs to collapse not found: {fastafile_path}.')
+
+    seqs = SeqCollection.from_fasta(fastafile_path)
+    reps = {}
+    duplicates = []
+    for header in seqs:
+        if get_orgtag(header) == 'RFSEQ':
+            continue
+        seqhash = hashlib.blake2b(seqs.get_bytes(header), digest_size=16).digest()
+        if seqhash in reps:
+            duplicates.append((reps[seqhash], header))
+        else:
+            reps[seqhash] = header
+
+    writeout_fasta(outpath, seqs.subset(reps.values()), overwrite=True)
+    with open(dupmappath, 'w') as f:
+        for rep, header in duplicates:
+            f.write(f'{rep}\t{header}\n')
+    return len(duplicates)
+
+
+def readin_dupmap(dupmappath):
+    """Reads dupmap into dict {representative: [duplicate headers]}"""
+    dupmap = {}
+    with open(dupmappath, 'r') as f:
+        for line in f:
+            if line.strip():
+                rep, header = line.rstrip('\n').split('\t')
+                dupmap.setdefault(rep, []).append(header)
+    return dupmap
+
+
+def expand_alignment(alnfile_path, dupmappath, outpath):
+    """Writes the alignment with the row of each representative
+    repeated for its duplicates (right after it). Rows are
+    written as they are decoded, the expanded alignment is
+    not held in memory.
+
+    :param alnfile_path: pathlib.PosixPath, alignment of unique seqs
+    :param dupmappath: pathlib.PosixPath
+    :param outpath: pathlib.PosixPath
+
+    :returns outpath: pathlib.PosixPath
+    """
+    alnseqs = SeqCollection.from_fasta(alnfile_path)
+    dupmap = readin_dupmap(dupmappath)
+    with open(outpath, 'w') as f:
+        for header, seq in alnseqs.items():
+            for rowheader in [header] + dupmap.get(header, []):
+                f.write(f'>{rowheader}\n{seq}\n')
+    return outpath
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] fastafile")
+    parser.add_argument("fastafile", help="fasta file with seqs to collapse")
+    args = parser.parse_args()
+
+    fastafile = Path(args.fastafile)
+    uniquepath, dupmappath = get_collapsed_paths(fastafile)
+    numdups = collapse_duplicates(fastafile, uniquepath, dupmappath)
+    print(f'{numdups} duplicate seqs collapsed into {uniquepath}, map in {dupmappath}')
@@ -14,7 +14,8 @@ Outputs two types of fasta files:
 
 from pathlib import Path
 
-from io_utils import get_globbed_list, parse_fasta, writeout_fasta
+from io_utils import parse_fasta, writeout_fasta
+from find_refseq_files import RefseqIndex
 
 
 def readin_pdbids(pathtofile):
@@ -38,6 +39,7 @@ def readin_pdbids(pathtofile):
 def scan_dir_for_refseq(pathtorefseqs, pdbidlist):
     """Looks through folder for refseq files for each 
     pdbid. Saves the paths to refseq files in a list.
+    The folder is listed once (RefseqIndex).
 
     :param pathtorefseqs: pathlib.PosixPath
     :param pdbidlist: list of 4-letter pdbids
@@ -47,10 +49,9 @@ def scan_dir_for_refseq(pathtorefseqs, pdbidlist):
     refseqpathlist = []
     if not pdbidlist:
         raise ValueError('No pdbids in list. Check input file.')
+    refseqindex = RefseqIndex(pathtorefseqs)
     for pdbid in pdbidlist:
-        targregex = f'{pdbid}*refseq.fasta'
-        refseqlist = get_globbed_list(pathtorefseqs, targregex)
-        refseqpathlist += refseqlist
+        refseqpathlist += refseqindex.get(pdbid)
     return refseqpathlist
 
 
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+dca_cache.py
+
+Mean-field DCA with cached intermediate state.
+
+Parameter sweeps over pseudocount and seqid on the same joint
+alignment only need to recompute what depends on the changed
+parameter:
+
+    alignment        -> encoded msa             (per alignment)
+    msa, seqid       -> weights, raw frequencies (per seqid)
+    freqs, pseudocnt -> couplings, FN-APC scores (per seqid+pseudocount)
+
+Each step is stored as a .npy file in a cache directory keyed by
+the sha256 hash of the alignment file, so reruns and sweeps pick up
+where the last run left off.
+
+Follows pydca's mfDCA conventions: duplicate sequences removed,
+20 amino acids plus gap (q=21), gap as the reference state for the
+coupling inversion, Frobenius norms of the (q-1)x(q-1) non-gap
+coupling blocks shifted to zero-sum gauge, and the average product
+correction (APC).
+"""
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from io_utils import fa_todict
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+NUM_STATES = len(AMINO_ACIDS) + 1
+GAP_STATE = NUM_STATES - 1
+
+
+def alignment_hash(aln_path, chunksize=1 << 20):
+    """Returns the sha256 hexdigest of an alignment file.
+
+    :param aln_path: pathlib.PosixPath
+
+    :returns: str
+    """
+    sha = hashlib.sha256()
+    with open(aln_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def encode_alignment(seqs):
+    """Encodes aligned sequences as a matrix of states.
+    Nonstandard residues are treated as gaps.
+
+    :param seqs: list of aligned str sequences of equal length
+
+    :returns: numpy.ndarray (N, L) of int8 states
+    """
+    lookup = np.full(256, GAP_STATE, dtype=np.int8)
+    for state, aa in enumerate(AMINO_ACIDS):
+        lookup[ord(aa)] = state
+        lookup[ord(aa.lower())] = state
+
+    lengths = {len(seq) for seq in seqs}
+    if len(lengths) != 1:
+        raise ValueError(f'Aligned sequences have unequal lengths: {sorted(lengths)}')
+    raw = np.frombuffer(''.join(seqs).encode('ascii'), dtype=np.uint8)
+    return lookup[raw].reshape(len(seqs), lengths.pop())
+
+
+def remove_duplicate_seqs(msa):
+    """Removes duplicate rows of an encoded alignment, keeping the
+    first occurrence of each, as pydca does when reading the msa.
+
+    :param msa: numpy.ndarray (N, L) of states
+
+    :returns: numpy.ndarray (N', L) of states
+    """
+    _, firstidx = np.unique(msa, axis=0, return_index=True)
+    return msa[np.sort(firstidx)]
+
+
+def onehot_nogap(msa):
+    """One-hot encodes an msa without the gap (reference) state.
+
+    :param msa: numpy.ndarray (N, L) of states
+
+    :returns: numpy.ndarray (N, L*(q-1)) of float64
+    """
+    numseqs, seqlen = msa.shape
+    onehot = np.zeros((numseqs, seqlen, NUM_STATES), dtype=np.float64)
+    onehot[np.arange(numseqs)[:, None], np.arange(seqlen)[None, :], msa] = 1.0
+    return onehot[:, :, :GAP_STATE].reshape(numseqs, seqlen * GAP_STATE)
+
+
+def compute_weights(msa, seqid):
+    """Computes sequence weights as the inverse number of sequences
+    (including itself) with identity > seqid, or uniform weights
+    for seqid >= 1 (pydca). Identities are counted with a one-hot
+    matrix product, gaps included.
+
+    :param msa: numpy.ndarray (N, L) of states
+    :param seqid: float, identity threshold
+
+    :returns: numpy.ndarray (N,) of float64
+    """
+    numseqs, seqlen = msa.shape
+    if seqid >= 1.0:
+        return np.ones(numseqs, dtype=np.float64)
+    onehot = np.zeros((numseqs, seqlen, NUM_STATES), dtype=np.float32)
+    onehot[np.arange(numseqs)[:, None], np.arange(seqlen)[None, :], msa] = 1.0
+    onehot = onehot.reshape(numseqs, seqlen * NUM_STATES)
+    identity = (onehot @ onehot.T).astype(np.float64) / seqlen
+    neighbours = (identity > seqid).sum(axis=1)
+    return 1.0 / neighbours
+
+
+def compute_raw_frequencies(msa, weights):
+    """Computes weighted single- and pair-site frequencies
+    (without pseudocount) for the non-gap states.
+
+    :param msa: numpy.ndarray (N, L) of states
+    :param weights: numpy.ndarray (N,)
+
+    :returns fi: numpy.ndarray (L*(q-1),)
+    :returns fij: numpy.ndarray (L*(q-1), L*(q-1))
+    """
+    onehot = onehot_nogap(msa)
+    meff = weights.sum()
+    fi = weights @ onehot / meff
+    fij = (onehot.T * weights) @ onehot / meff
+    return fi, fij
+
+
+def apply_pseudocount(fi, fij, seqlen, pseudocount):
+    """Mixes raw frequencies with a uniform distribution.
+
+    :param fi: numpy.ndarray (L*(q-1),)
+    :param fij: numpy.ndarray (L*(q-1), L*(q-1))
+    :param seqlen: int, L
+    :param pseudocount: float, between 0 and 1
+
+    :returns: tuple (fi, fij) with pseudocount applied
+    """
+    q = NUM_STATES
+    fi_pc = (1.0 - pseudocount) * fi + pseudocount / q
+    fij_pc = (1.0 - pseudocount) * fij + pseudocount / (q * q)
+    # same-site blocks are diagonal: f_ii(a,b) = f_i(a) * delta(a,b)
+    blocksize = q - 1
+    for i in range(seqlen):
+        block = slice(i * blocksize, (i + 1) * blocksize)
+        fij_pc[block, block] = np.diag(fi_pc[block])
+    return fi_pc, fij_pc
+
+
+def compute_couplings(fi, fij):
+    """Computes mean-field couplings as the negative inverse
+    of the connected correlation matrix.
+
+    :returns: numpy.ndarray (L*(q-1), L*(q-1))
+    """
+    corr = fij - np.outer(fi, fi)
+    return -np.linalg.inv(corr)
+
+
+def couplings_to_fn_apc(couplings, seqlen):
+    """Computes APC-corrected Frobenius norms of the couplings
+    in zero-sum gauge, gap state excluded.
+
+    :param couplings: numpy.ndarray (L*(q-1), L*(q-1))
+    :param seqlen: int, L
+
+    :returns: numpy.ndarray (L, L)
+    """
+    fn = zero_sum_frobenius_norms(couplings.reshape(seqlen, NUM_STATES - 1, seqlen, NUM_STATES - 1))
+    return apc_correct(fn)
+
+
+def zero_sum_frobenius_norms(blocks):
+    """Shifts the (q-1)x(q-1) non-gap coupling blocks to zero-sum
+    gauge (row, column and overall means over the non-gap states,
+    as pydca's shift_couplings) and returns their Frobenius norms.
+
+    :param blocks: numpy.ndarray (L1, q-1, L2, q-1)
+
+    :returns: numpy.ndarray (L1, L2)
+    """
+    shifted = blocks - blocks.mean(axis=1, keepdims=True)
+    shifted -= shifted.mean(axis=3, keepdims=True)
+    return np.sqrt(np.square(shifted).sum(axis=(1, 3)))
+
+
+def apc_correct(fn):
+    """Average product correction of a symmetric score matrix,
+    diagonal excluded.
+
+    :param fn: numpy.ndarray (L, L)
+
+    :returns: numpy.ndarray (L, L)
+    """
+    seqlen = fn.shape[0]
+    offdiag = fn.copy()
+    np.fill_diagonal(offdiag, 0.0)
+    colmeans = offdiag.sum(axis=0) / (seqlen - 1)
+    totalmean = offdiag.sum() / (seqlen * (seqlen - 1))
+    return fn - np.outer(colmeans, colmeans) / totalmean
+
+
+def sorted_pairs(scorematrix):
+    """Converts an (L, L) score matrix to a list of
+    [((i,j),score),...] for i<j, highest score first."""
+    iidx, jidx = np.triu_indices(scorematrix.shape[0], k=1)
+    scores = scorematrix[iidx, jidx]
+    order = np.argsort(-scores, kind='stable')
+    return [((int(iidx[k]), int(jidx[k])), float(scores[k])) for k in order]
+
+
+class DCAStateCache():
+    """Stores intermediate mfDCA state of one alignment on disk.
+    Keeps loaded arrays in memory for the lifetime of the object."""
+
+    def __init__(self, jointaln_path, cachedir):
+        """Initiates the cache for an alignment"""
+        self.jointaln_path = jointaln_path
+        self.alnhash = alignment_hash(jointaln_path)
+        self.cachedir = cachedir / self.alnhash[:16]
+        self.cachedir.mkdir(parents=True, exist_ok=True)
+        self._arrays = {}
+
+    def _cached(self, name, compute):
+        """Loads array from memory or disk, or computes and stores it."""
+        if name not in self._arrays:
+            filepath = self.cachedir / f'{name}.npy'
+            if filepath.is_file():
+                self._arrays[name] = np.load(filepath)
+            else:
+                self._arrays[name] = compute()
+                np.save(filepath, self._arrays[name])
+        return self._arrays[name]
+
+    def get_msa(self):
+        """Returns the encoded alignment"""
+        def compute():
+            return remove_duplicate_seqs(encode_alignment(list(fa_todict(self.jointaln_path).values())))
+        return self._cached('msa', compute)
+
+    def get_weights(self, seqid):
+        """Returns sequence weights for seqid"""
+        return self._cached(f'weights_sid{seqid}',
+                            lambda: compute_weights(self.get_msa(), seqid))
+
+    def get_frequencies(self, seqid):
+        """Returns raw single- and pair-site frequencies for seqid"""
+        finame, fijname = f'fi_sid{seqid}', f'fij_sid{seqid}'
+        isstored = lambda name: name in self._arrays or (self.cachedir / f'{name}.npy').is_file()
+        if not (isstored(finame) and isstored(fijname)):
+            fi, fij = compute_raw_frequencies(self.get_msa(), self.get_weights(seqid))
+            self._arrays[finame], self._arrays[fijname] = fi, fij
+            np.save(self.cachedir / f'{finame}.npy', fi)
+            np.save(self.cachedir / f'{fijname}.npy', fij)
+        return self._cached(finame, None), self._cached(fijname, None)
+
+    def get_fn_apc(self, seqid, pseudocount):
+        """Returns the (L, L) FN-APC score matrix"""
+        def compute():
+            seqlen = self.get_msa().shape[1]
+            fi, fij = apply_pseudocount(*self.get_frequencies(seqid), seqlen, pseudocount)
+            return couplings_to_fn_apc(compute_couplings(fi, fij), seqlen)
+        return self._cached(f'fnapc_sid{seqid}_pc{pseudocount}', compute)
+
+    def compute_sorted_FN_APC(self, seqid, pseudocount):
+        """Returns [((i,j),score),...] like pydca's compute_sorted_FN_APC"""
+        return sorted_pairs(self.get_fn_apc(seqid, pseudocount))
@@ -11,6 +11,9 @@ from pathlib import Path
 
 from io_utils import parse_fasta, writeout_fasta
 
+# deletes nonstandard residues with str.translate
+NONSTANDARD_TABLE = str.maketrans('', '', 'X')
+
 
 def remove_nonstandard_aas(fastafile):
     """Removes Xs from sequence. Done
@@ -30,7 +33,7 @@ def remove_nonstandard_aas(fastafile):
 
     if 'X' in seq:
         print(f'{fastafile.stem} contains nonstandard residues.')
-        fadict[header] = ''.join(seq.split('X'))
+        fadict[header] = seq.translate(NONSTANDARD_TABLE)
     else:
         print(f'No nonstandard residues found in {fastafile.stem}.')
     return fadict
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+estimate_meff.py
+
+Cheap estimate of the effective number of sequences (Meff) of
+the matched, not yet aligned seq sets of an entry, so entries
+too redundant for usable couplings stop before muscle and DCA.
+
+Sequences of both chains are concatenated per organism. Pairwise
+identities are estimated from MinHash sketches of their k-mer sets:
+two seqs of identity p share about p^k of their k-mers, i.e. a
+Jaccard similarity of p^k / (2 - p^k). As in mfDCA, each seq has
+weight 1 / (number of seqs with identity >= 0.8), Meff is the sum
+of weights. The gate compares Meff per joint length (length of
+both refseqs) with a threshold, minmeffperlength in paths.txt
+(default 0: gate off, ~0.2 stops entries unlikely to give usable
+couplings).
+
+With full-set alignments (alignmode=fullset), the joined rows are
+only known once the joint alignment is made, so the gate runs on
+the joint alignment instead (check_joint_meff).
+
+    python3 estimate_meff.py fastafile1 fastafile2 refseq1 refseq2 [--minmeff MIN]
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from io_utils import does_target_exist, fa_todict, get_orgtag
+from process_alnseqs import get_orgdict_from_fafile
+
+MIN_MEFF_PER_LENGTH = 0.0
+HASH_PRIME = (1 << 31) - 1
+
+
+def identity_to_jaccard(identity, k):
+    """Returns the k-mer Jaccard similarity of two seqs of given identity"""
+    shared = identity ** k
+    return shared / (2 - shared)
+
+
+def kmer_codes(seq, k):
+    """Returns numpy.ndarray of distinct k-mer codes of a seq"""
+    seqbytes = np.frombuffer(seq.replace('-', '').upper().encode(), dtype=np.uint8).astype(np.int64)
+    if len(seqbytes) < k:
+        return np.zeros(0, dtype=np.int64)
+    codes = np.zeros(len(seqbytes) - k + 1, dtype=np.int64)
+    for offset in range(k):
+        codes = codes * 256 + seqbytes[offset:len(seqbytes) - k + 1 + offset]
+    return np.unique(codes)
+
+
+def minhash_sketches(seqs, k=3, numhashes=128, seed=0):
+    """Returns MinHash sketches of the k-mer sets of seqs.
+
+    :param seqs: list of str
+    :param k: int, k-mer length (k <= 3 keeps codes below 2^24)
+    :param numhashes: int, sketch size
+
+    :returns: numpy.ndarray (N, numhashes) of int64
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, HASH_PRIME, size=numhashes, dtype=np.int64)
+    b = rng.integers(0, HASH_PRIME, size=numhashes, dtype=np.int64)
+    sketches = np.full((len(seqs), numhashes), HASH_PRIME, dtype=np.int64)
+    for idx, seq in enumerate(seqs):
+        codes = kmer_codes(seq, k)
+        if len(codes):
+            sketches[idx] = ((codes[:, None] * a[None, :] + b[None, :]) % HASH_PRIME).min(axis=0)
+    return sketches
+
+
+def compute_meff(seqs, identity=0.8, k=3, numhashes=128):
+    """Returns estimated Meff of seqs (unaligned).
+
+    :param seqs: list of str
+    :param identity: float, identity threshold of the weights
+
+    :returns: float
+    """
+    if not seqs:
+        return 0.0
+    sketches = minhash_sketches(seqs, k, numhashes)
+    threshold = identity_to_jaccard(identity, k)
+    neighbours = np.zeros(len(seqs), dtype=np.int64)
+    for idx in range(len(seqs)):
+        jaccard = (sketches == sketches[idx]).mean(axis=1)
+        neighbours[idx] = (jaccard >= threshold).sum()
+    return float((1.0 / neighbours).sum())
+
+
+def get_joint_seqs(fastafile1_path, fastafile2_path):
+    """Returns list of concatenated seqs of organisms in both fasta files"""
+    orgdict1 = get_orgdict_from_fafile(fastafile1_path)
+    orgdict2 = get_orgdict_from_fafile(fastafile2_path)
+    return [orgdict1[org][1] + orgdict2[org][1] for org in orgdict1 if org in orgdict2 and org != 'RFSEQ']
+
+
+def get_seqlength(refseqfile_path):
+    """Returns length of the (first) seq of a refseq file"""
+    return len(next(iter(fa_todict(refseqfile_path).values()), ''))
+
+
+def get_joint_aln_seqs(jointaln_path):
+    """Returns list of the rows of a joint alignment, refseq row excluded"""
+    return [seq for header, seq in fa_todict(jointaln_path).items() if get_orgtag(header) != 'RFSEQ']
+
+
+def gate_meff(seqs, seqlength, minmeffperlength):
+    """Estimates Meff of seqs and raises ValueError if Meff per
+    joint length is below minmeffperlength.
+
+    :returns: (meff, meff per joint length)
+    """
+    meff = compute_meff(seqs)
+    meffperlength = meff / seqlength if seqlength else 0.0
+    print(f'{len(seqs)} seqs, Meff {meff:0.1f}, joint length {seqlength}, Meff/L {meffperlength:0.3f}')
+    if meffperlength < minmeffperlength:
+        raise ValueError(f'LOW MEFF: Meff/L {meffperlength:0.3f} below {minmeffperlength} '
+                         f'({len(seqs)} seqs, Meff {meff:0.1f}, L {seqlength})')
+    return meff, meffperlength
+
+
+def check_joint_meff(jointaln_path, minmeffperlength):
+    """Estimates Meff of the rows of a joint alignment and
+    raises ValueError if Meff per joint length is too low.
+
+    :param jointaln_path: pathlib.PosixPath
+    :param minmeffperlength: float
+
+    :returns: (meff, meff per joint length)
+    """
+    if not does_target_exist(Path(jointaln_path), 'file'):
+        raise FileNotFoundError(f'JOINT ALN FILE MISSING: {jointaln_path}')
+    seqs = get_joint_aln_seqs(jointaln_path)
+    seqlength = len(seqs[0]) if seqs else 0
+    return gate_meff(seqs, seqlength, minmeffperlength)
+
+
+def check_meff(fastafile1_path, fastafile2_path, refseq1_path, refseq2_path, minmeffperlength):
+    """Estimates Meff of the matched seqs of two fasta files and
+    raises ValueError if Meff per joint length is too low.
+
+    :param fastafile_path: pathlib.PosixPath, 1 or 2 being either chain
+    :param refseq_path: pathlib.PosixPath
+    :param minmeffperlength: float
+
+    :returns: (meff, meff per joint length)
+    """
+    for path in (fastafile1_path, fastafile2_path, refseq1_path, refseq2_path):
+        if not does_target_exist(Path(path), 'file'):
+            raise FileNotFoundError(f'FILE MISSING: {path}')
+    seqs = get_joint_seqs(fastafile1_path, fastafile2_path)
+    seqlength = get_seqlength(refseq1_path) + get_seqlength(refseq2_path)
+    return gate_meff(seqs, seqlength, minmeffperlength)
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] fastafile1 fastafile2 refseq1 refseq2 [--minmeff MIN]")
+    parser.add_argument("fastafile1", help="matched seqs of chain 1")
+    parser.add_argument("fastafile2", help="matched seqs of chain 2")
+    parser.add_argument("refseq1", help="refseq of chain 1")
+    parser.add_argument("refseq2", help="refseq of chain 2")
+    parser.add_argument("--minmeff", type=float, default=MIN_MEFF_PER_LENGTH, help="minimum Meff per joint length")
+    args = parser.parse_args()
+
+    try:
+        check_meff(Path(args.fastafile1), Path(args.fastafile2), Path(args.refseq1), Path(args.refseq2), args.minmeff)
+    except ValueError as valerr:
+        print(valerr)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+filter_columns.py
+
+Removes columns of a joint alignment that are mostly gaps or
+(nearly) fully conserved before DCA. Such columns add O(L^2) cost
+to DCA without contributing couplings.
+
+A column is kept if its gap fraction is at most the gap threshold
+and the Shannon entropy (nats) of its residues is above the
+entropy threshold, set in paths.txt (see run_workflow.py):
+
+    maxgapfraction    (default 0.8)
+    mincolumnentropy  (default 0.0, i.e. drop fully conserved)
+
+The filtered alignment ({stem}_filtered.fasta) is written next to
+the joint alignment with an index map ({stem}_colidx.npy) holding
+the joint alignment column of each kept column, and the thresholds
+it was made with ({stem}_colfilter.json). The alignment is filtered
+again if it is missing, older than the joint alignment or was made
+with other thresholds (see get_dca_alignment). run_dca runs DCA
+on the filtered alignment and maps scores back, so scores files
+keep joint alignment coordinates (and the column map, see
+scores_io.py, still applies).
+
+    python3 filter_columns.py jointalnfile [--maxgap MAXGAP] [--minentropy MINENTROPY]
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from io_utils import does_target_exist, fa_todict, writeout_fasta
+
+MAX_GAP_FRACTION = 0.8
+MIN_COLUMN_ENTROPY = 0.0
+GAP_SYMBOLS = b'-.'
+
+
+def get_filtered_paths(jointaln_path):
+    """Returns paths of the filtered alignment and of its index map"""
+    return (jointaln_path.with_name(f'{jointaln_path.stem}_filtered.fasta'),
+            jointaln_path.with_name(f'{jointaln_path.stem}_colidx.npy'))
+
+
+def get_thresholds_path(jointaln_path):
+    """Returns path of the thresholds record of the filtered alignment"""
+    return jointaln_path.with_name(f'{jointaln_path.stem}_colfilter.json')
+
+
+def is_filter_current(jointaln_path, maxgapfrac, minentropy):
+    """True if the filtered alignment and its index map exist, are
+    not older than the joint alignment and were made with the given
+    thresholds"""
+    filteredpath, colidxpath = get_filtered_paths(jointaln_path)
+    thresholdspath = get_thresholds_path(jointaln_path)
+    if not all(does_target_exist(path, 'file') for path in (filteredpath, colidxpath, thresholdspath)):
+        return False
+    if min(filteredpath.stat().st_mtime, colidxpath.stat().st_mtime) < jointaln_path.stat().st_mtime:
+        return False
+    with open(thresholdspath, 'r') as f:
+        thresholds = json.load(f)
+    return thresholds == {'maxgapfrac': float(maxgapfrac), 'minentropy': float(minentropy)}
+
+
+def alignment_to_array(seqs):
+    """Returns uppercase alignment rows as numpy.ndarray (N, L) of uint8"""
+    seqs = list(seqs)
+    if len({len(seq) for seq in seqs}) > 1:
+        raise ValueError('Alignment rows differ in length.')
+    msa = np.frombuffer(''.join(seqs).upper().encode(), dtype=np.uint8)
+    return msa.reshape(len(seqs), -1)
+
+
+def compute_column_stats(msa):
+    """Returns gap fraction and residue entropy (nats) of each column.
+
+    :param msa: numpy.ndarray (N, L) of uint8
+
+    :returns: (numpy.ndarray (L,), numpy.ndarray (L,))
+    """
+    isgap = np.isin(msa, np.frombuffer(GAP_SYMBOLS, dtype=np.uint8))
+    numgaps = isgap.sum(axis=0)
+    numres = msa.shape[0] - numgaps
+    entropy = np.zeros(msa.shape[1])
+    for symbol in np.unique(msa[~isgap]):
+        counts = (msa == symbol).sum(axis=0)
+        freqs = np.divide(counts, numres, out=np.zeros(msa.shape[1]), where=numres > 0)
+        entropy -= np.where(freqs > 0, freqs * np.log(np.where(freqs > 0, freqs, 1)), 0)
+    gapfrac = numgaps / msa.shape[0] if msa.shape[0] else np.ones(msa.shape[1])
+    return gapfrac, entropy
+
+
+def select_columns(msa, maxgapfrac=MAX_GAP_FRACTION, minentropy=MIN_COLUMN_ENTROPY):
+    """Returns indices of the columns passing the gap and entropy thresholds"""
+    gapfrac, entropy = compute_column_stats(msa)
+    return np.flatnonzero((gapfrac <= maxgapfrac) & (entropy > minentropy))
+
+
+def filter_joint_alignment(jointaln_path, maxgapfrac=MAX_GAP_FRACTION, minentropy=MIN_COLUMN_ENTROPY):
+    """Writes the filtered joint alignment, its index map and the
+    thresholds record, unless they are current (is_filter_current).
+
+    :param jointaln_path: pathlib.PosixPath
+    :param maxgapfrac: float
+    :param minentropy: float
+
+    :returns filteredpath: pathlib.PosixPath, or None if no column
+    passes (DCA then runs on the joint alignment)
+    """
+    if not does_target_exist(jointaln_path, 'file'):
+        raise FileNotFoundError(f'JOINT ALN FILE MISSING: Could not find {jointaln_path}')
+    filteredpath, colidxpath = get_filtered_paths(jointaln_path)
+    thresholdspath = get_thresholds_path(jointaln_path)
+    if is_filter_current(jointaln_path, maxgapfrac, minentropy):
+        print(f'Filtered alignment {filteredpath} is current.')
+        return filteredpath
+
+    jointdict = fa_todict(jointaln_path)
+    msa = alignment_to_array(jointdict.values())
+    colidx = select_columns(msa, maxgapfrac, minentropy)
+    if len(colidx) == 0:
+        filteredpath.unlink(missing_ok=True)
+        colidxpath.unlink(missing_ok=True)
+        thresholdspath.unlink(missing_ok=True)
+        print(f'WARNING: no columns of {jointaln_path} pass the column filter, not filtered.')
+        return None
+
+    filtered = msa[:, colidx]
+    writeout_fasta(filteredpath, {header: row.tobytes().decode() for header, row in zip(jointdict, filtered)},
+                   overwrite=True)
+    np.save(colidxpath, colidx.astype(np.int32), allow_pickle=False)
+    with open(thresholdspath, 'w') as f:
+        json.dump({'maxgapfrac': float(maxgapfrac), 'minentropy': float(minentropy)}, f)
+    print(f'{len(colidx)} of {msa.shape[1]} columns kept in {filteredpath}')
+    return filteredpath
+
+
+def get_dca_alignment(jointaln_path, maxgapfrac=MAX_GAP_FRACTION, minentropy=MIN_COLUMN_ENTROPY):
+    """Returns the alignment to run DCA on and its index map:
+    the filtered alignment, (re)filtered first if it is not
+    current for the thresholds, or the joint alignment and None
+    if no column passes the filter.
+
+    :param jointaln_path: pathlib.PosixPath
+    :param maxgapfrac: float
+    :param minentropy: float
+
+    :returns: (pathlib.PosixPath, numpy.ndarray or None)
+    """
+    filteredpath = filter_joint_alignment(jointaln_path, maxgapfrac, minentropy)
+    if filteredpath is None:
+        return jointaln_path, None
+    return filteredpath, np.load(get_filtered_paths(jointaln_path)[1], allow_pickle=False)
+
+
+def remap_scores(dcalist, colidx):
+    """Maps indices of scored pairs of the filtered alignment
+    to joint alignment columns.
+
+    :param dcalist: list of tuples [((i,j),score),...]
+    :param colidx: numpy.ndarray, joint column of each filtered column
+
+    :returns: list of tuples [((i,j),score),...]
+    """
+    if not dcalist:
+        return []
+    idx = colidx[np.array([pair[0] for pair in dcalist], dtype=np.int64)].tolist()
+    return [((i, j), pair[1]) for (i, j), pair in zip(idx, dcalist)]
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] jointalnfile [--maxgap MAXGAP] [--minentropy MINENTROPY]")
+    parser.add_argument("jointalnfile", help="joint alignment fasta")
+    parser.add_argument("--maxgap", type=float, default=MAX_GAP_FRACTION, help="max gap fraction of kept columns")
+    parser.add_argument("--minentropy", type=float, default=MIN_COLUMN_ENTROPY, help="kept columns have a higher entropy (nats)")
+    args = parser.parse_args()
+
+    filter_joint_alignment(Path(args.jointalnfile), args.maxgap, args.minentropy)
@@ -4,11 +4,22 @@ find_refseq_files.py
 
 Searches in a given directory for refseq files
 corresponding to given 4-letter PDB ID
+
+The directory is listed once (os.scandir) into an index of
+{pdbid: refseq files}, kept per process and optionally saved
+as json. An index is rebuilt when the directory mtime changes,
+i.e. when files were added, removed or renamed.
 """
 
+import os
+import json
+import hashlib
+import tempfile
 from pathlib import Path
 
-from io_utils import get_globbed_list, refseq_formatter
+REFSEQ_SUFFIX = 'refseq.fasta'
+
+_indexes = {}
 
 def iscorrect_pdbid(pdbid):
     """Checks if pdbid is a 4-char string
@@ -25,9 +36,95 @@ def iscorrect_pdbid(pdbid):
     return pdbid.lower()
 
 
+def get_indexfile(dirpath):
+    """Returns default json path of the refseq index of dirpath,
+    in the tmp dir (a file in dirpath would change its mtime)"""
+    dirhash = hashlib.sha1(str(Path(dirpath).resolve()).encode()).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f'eukdca_refseqidx_{os.getuid()}_{dirhash}.json'
+
+
+def scan_refseq_dir(dirpath):
+    """Lists a directory once, returns dict of
+    {pdbid: sorted list of refseq file names}"""
+    refseqs = {}
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            if entry.name.endswith(REFSEQ_SUFFIX) and entry.is_file():
+                refseqs.setdefault(entry.name[:4], []).append(entry.name)
+    return {pdbid: sorted(names) for pdbid, names in refseqs.items()}
+
+
+class RefseqIndex():
+    """Index of the refseq files in a directory by pdbid"""
+
+    def __init__(self, dirpath, indexfile=None):
+        """Loads the index from indexfile if it matches the
+        directory mtime, else scans the directory (and saves
+        the index to indexfile, if given).
+
+        :param dirpath: pathlib.PosixPath
+        :param indexfile: pathlib.PosixPath or None
+        """
+        self.dirpath = Path(dirpath).expanduser()
+        self.indexfile = indexfile
+        self.mtime_ns = self.dirpath.stat().st_mtime_ns
+        self.refseqs = self._load()
+        if self.refseqs is None:
+            self.refseqs = scan_refseq_dir(self.dirpath)
+            self._save()
+
+    def _load(self):
+        """Returns saved {pdbid: names} if still valid, else None"""
+        if self.indexfile is None or not Path(self.indexfile).is_file():
+            return None
+        try:
+            with open(self.indexfile, 'r') as f:
+                saved = json.load(f)
+        except ValueError:
+            return None
+        if saved.get('dirpath') != str(self.dirpath.resolve()) or saved.get('mtime_ns') != self.mtime_ns:
+            return None
+        return saved['refseqs']
+
+    def _save(self):
+        """Writes the index to indexfile, if given"""
+        if self.indexfile is None:
+            return
+        tmpfile = Path(f'{self.indexfile}.{os.getpid()}.tmp')
+        with open(tmpfile, 'w') as f:
+            json.dump({'dirpath': str(self.dirpath.resolve()), 'mtime_ns': self.mtime_ns,
+                       'refseqs': self.refseqs}, f)
+        tmpfile.replace(self.indexfile)
+
+    def is_current(self):
+        """True if the directory did not change since indexing"""
+        return self.dirpath.stat().st_mtime_ns == self.mtime_ns
+
+    def get(self, pdbid):
+        """Returns sorted list of refseq file paths of pdbid"""
+        return [self.dirpath / name for name in self.refseqs.get(pdbid, [])]
+
+
+def get_refseq_index(dirpath, persist=True):
+    """Returns the current RefseqIndex of dirpath,
+    reused within the process until the directory changes.
+
+    :param dirpath: pathlib.PosixPath
+    :param persist: bool, load/save the index as json (get_indexfile)
+
+    :returns: RefseqIndex
+    """
+    key = str(Path(dirpath).expanduser())
+    index = _indexes.get(key)
+    if index is None or not index.is_current():
+        index = RefseqIndex(dirpath, get_indexfile(dirpath) if persist else None)
+        _indexes[key] = index
+    return index
+
+
 def find_refseq_files(pdbid, dirpath):
     """Takes a pdbid and directory. 
-       Searches directory for matches to the pdbid.
+       Searches directory (refseq index) for matches to the pdbid.
        Written to search for refseq files of form:
        PDBID_[chainID]_refseq.fasta
 
@@ -38,8 +135,7 @@ def find_refseq_files(pdbid, dirpath):
     """
     fourletter=iscorrect_pdbid(pdbid)
 
-    refmt_pdbid = refseq_formatter(fourletter)
-    fileslist = get_globbed_list(dirpath, refmt_pdbid)
+    fileslist = get_refseq_index(dirpath).get(fourletter)
     if len(fileslist) == 0:
         raise FileNotFoundError(f'No refseq files found for {pdbid}.')
     elif len(fileslist) != 2:
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+ingest_refseqs.py
+
+Makes refseqs for many PDB entries in one pass over a
+pdb_seqres-style fasta file, e.g. from
+https://files.wwpdb.org/pub/pdb/derived_data/pdb_seqres.txt
+
+    >1c0f_A mol:protein length:368  ACTIN
+    MDGEDVQALVIDNGSGMCKAGFAGDDAPRAV...
+
+Only the requested pdbids (all chains) or chains are kept, nonstandard
+residues (X) are removed as in edit_refseqs.py. Output is either one
+refseq file per chain ({pdbid}_{chain}_refseq.fasta, as expected by
+find_refseq_files.py) or a single refseq store: one fasta file with a
+json index of seq offsets ({store}.idx), from which chains are
+extracted on demand.
+
+Chains file: one pdbid (all chains) or pdbid_chain per line.
+
+    python3 ingest_refseqs.py pdb_seqres.txt chains.txt outdir [--store refseqs.fasta] [--redo]
+"""
+
+import json
+from pathlib import Path
+
+from io_utils import does_target_exist, writeout_fasta
+from edit_refseqs import NONSTANDARD_TABLE
+
+
+def readin_chains(chainsfile):
+    """Reads requested entries, skipping blank lines and # comments.
+
+    :param chainsfile: pathlib.PosixPath
+
+    :returns: dict {pdbid: set of chains, or None for all chains}
+    """
+    requested = {}
+    with open(chainsfile, 'r') as f:
+        for line in f:
+            fields = line.split('#')[0].split()
+            if not fields:
+                continue
+            pdbid, _, chain = fields[0].partition('_')
+            pdbid = pdbid.lower()
+            if not chain:
+                requested[pdbid] = None
+            elif requested.get(pdbid, set()) is not None:
+                requested.setdefault(pdbid, set()).add(chain)
+    return requested
+
+
+def iter_seqres(seqresfile):
+    """Streams a fasta file, yields (header, seq) per entry"""
+    header = None
+    seqlines = []
+    with open(seqresfile, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if header is not None:
+                    yield header, ''.join(seqlines)
+                header = line[1:]
+                seqlines = []
+            elif line:
+                seqlines.append(line)
+    if header is not None:
+        yield header, ''.join(seqlines)
+
+
+def iter_requested(seqresfile, requested, proteinonly=True):
+    """Yields (name, header, seq) of requested chains,
+    name being {pdbid}_{chain}, seq without nonstandard residues.
+
+    :param seqresfile: pathlib.PosixPath
+    :param requested: dict from readin_chains
+    :param proteinonly: bool, skip mol:na entries
+    """
+    for header, seq in iter_seqres(seqresfile):
+        fields = header.split()
+        pdbid, _, chain = fields[0].partition('_')
+        pdbid = pdbid.lower()
+        if pdbid not in requested:
+            continue
+        if requested[pdbid] is not None and chain not in requested[pdbid]:
+            continue
+        if proteinonly and len(fields) > 1 and fields[1] == 'mol:na':
+            continue
+        yield f'{pdbid}_{chain}', header, seq.translate(NONSTANDARD_TABLE)
+
+
+def ingest_refseq_files(seqresfile, requested, outpath, redo=False):
+    """Writes one refseq file per requested chain.
+
+    :param seqresfile: pathlib.PosixPath
+    :param requested: dict from readin_chains
+    :param outpath: pathlib.PosixPath, refseq directory
+    :param redo: bool, overwrite existing refseq files
+
+    :returns: dict {name: pathlib.PosixPath}
+    """
+    written = {}
+    for name, header, seq in iter_requested(seqresfile, requested):
+        refseqpath = outpath / f'{name}_refseq.fasta'
+        if redo == False and does_target_exist(refseqpath, 'file'):
+            written[name] = refseqpath
+            continue
+        writeout_fasta(refseqpath, {header: seq}, overwrite=True)
+        written[name] = refseqpath
+    return written
+
+
+def ingest_refseq_store(seqresfile, requested, storepath):
+    """Writes requested chains into one fasta file and
+    an index {name: [offset, size]} into {storepath}.idx
+
+    :returns: dict {name: [offset, size]}
+    """
+    index = {}
+    with open(storepath, 'wb') as f:
+        for name, header, seq in iter_requested(seqresfile, requested):
+            entry = f'>{header}\n{seq}\n'.encode()
+            index[name] = [f.tell(), len(entry)]
+            f.write(entry)
+    with open(get_store_indexpath(storepath), 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+def get_store_indexpath(storepath):
+    """Returns path of the index of a refseq store"""
+    return storepath.with_name(f'{storepath.name}.idx')
+
+
+def extract_refseq(storepath, name, outpath):
+    """Writes refseq of chain name (e.g. 1c0f_A) from a refseq
+    store into {name}_refseq.fasta in outpath.
+
+    :returns refseqpath: pathlib.PosixPath
+    """
+    with open(get_store_indexpath(storepath), 'r') as f:
+        index = json.load(f)
+    if name not in index:
+        raise FileNotFoundError(f'No refseq for {name} in {storepath}.')
+    offset, size = index[name]
+    with open(storepath, 'rb') as f:
+        f.seek(offset)
+        entry = f.read(size)
+    refseqpath = outpath / f'{name}_refseq.fasta'
+    with open(refseqpath, 'wb') as f:
+        f.write(entry)
+    return refseqpath
+
+
+def report_missing(requested, names):
+    """Returns list of requested pdbids/chains not found"""
+    found = {}
+    for name in names:
+        pdbid, _, chain = name.partition('_')
+        found.setdefault(pdbid, set()).add(chain)
+    missing = []
+    for pdbid, chains in requested.items():
+        if pdbid not in found:
+            missing.append(pdbid)
+        elif chains is not None:
+            missing += [f'{pdbid}_{chain}' for chain in sorted(chains - found[pdbid])]
+    return missing
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] seqresfile chainsfile outdir [--store STORE] [--redo]")
+    parser.add_argument("seqresfile", help="pdb_seqres-style fasta file")
+    parser.add_argument("chainsfile", help="file with one pdbid or pdbid_chain per line")
+    parser.add_argument("outdir", help="directory for refseq files (or the store)")
+    parser.add_argument("--store", help="write a single indexed refseq store with this file name instead")
+    parser.add_argument("-r", "--redo", action='store_true', help="overwrite existing refseq files")
+    args = parser.parse_args()
+
+    requested = readin_chains(Path(args.chainsfile))
+    if args.store:
+        names = ingest_refseq_store(Path(args.seqresfile), requested, Path(args.outdir) / args.store)
+    else:
+        names = ingest_refseq_files(Path(args.seqresfile), requested, Path(args.outdir), args.redo)
+    print(f'{len(names)} refseqs of {len(requested)} requested entries written into {args.outdir}')
+    missing = report_missing(requested, names)
+    if missing:
+        print(f'Not found: {" ".join(missing)}')
@@ -70,6 +70,18 @@ def easeled_seq_formatter(keyfilepath):
     return f'{keyfilepath.stem}.fasta'
 
 
+def get_orgtag(header):
+    """Returns the organism tag of a uniprot-like fasta
+    header or seq id, the part of the first word after
+    its last '_', e.g. HUMAN for 'sp|P69905|HBA_HUMAN ...'
+
+    :param header: str
+
+    :returns: str
+    """
+    return header.strip().split()[0].split('_')[-1]
+
+
 def get_globbed_list(pathtodir, target):
     """Searches directory for files matching
     a certain target pattern.
@@ -169,3 +181,131 @@ def writeout_fasta(somepath, somedict, overwrite=False, addict={}):
                 f.write(''.join(['>', k, '\n']))
                 f.write(''.join([v, '\n']))
     return
+
+
+def readin_fasta_headers(fastafile):
+    """Returns list of the headers of a fasta file (without '>'),
+    without reading its seqs into memory"""
+    with open(fastafile, 'r') as f:
+        return [line.strip()[1:] for line in f if line.lstrip().startswith('>')]
+
+
+class SeqCollection():
+    """Fasta seqs stored in one contiguous bytes buffer, with
+    numpy arrays of seq offsets and lengths and a header index.
+    Read-only, dict-like: seqs[header] returns the seq as str,
+    keys(), values(), items(), len() and in work as for
+    fa_todict, so it can be passed to e.g. writeout_fasta.
+    values() and items() are lazy, each seq is decoded to str
+    only when it is reached.
+    Subsets (subset, filter_by_org, filter_by_length) share
+    the buffer of the collection they are made from.
+    """
+
+    def __init__(self, headers, buffer, offsets, lengths):
+        """Initiates the class
+
+        :param headers: list of str
+        :param buffer: bytes or bytearray, all residues
+        :param offsets: numpy.ndarray of int64, seq starts in buffer
+        :param lengths: numpy.ndarray of int64, seq lengths
+        """
+        self.headers = list(headers)
+        self.buffer = buffer
+        self.offsets = offsets
+        self.lengths = lengths
+        self._index = {header: idx for idx, header in enumerate(self.headers)}
+
+    @classmethod
+    def from_fasta(cls, fastafile):
+        """Reads a fasta file line by line into the buffer,
+        same headers and seqs as fa_todict"""
+        records = {}
+        buffer = bytearray()
+        header = None
+        start = 0
+        with open(fastafile, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith(b'>'):
+                    if header is not None:
+                        records[header] = (start, len(buffer) - start)
+                    header = line[1:].decode()
+                    start = len(buffer)
+                else:
+                    buffer += line
+        if header is not None:
+            records[header] = (start, len(buffer) - start)
+        return cls._from_records(records, buffer)
+
+    @classmethod
+    def from_dict(cls, fadict):
+        """Makes a collection from a fasta dict {header: seq}"""
+        records = {}
+        buffer = bytearray()
+        for header, seq in fadict.items():
+            records[header] = (len(buffer), len(seq))
+            buffer += seq.encode()
+        return cls._from_records(records, buffer)
+
+    @classmethod
+    def _from_records(cls, records, buffer):
+        """Makes a collection from {header: (offset, length)}"""
+        import numpy as np
+        positions = np.array(list(records.values()), dtype=np.int64).reshape(-1, 2)
+        return cls(records.keys(), buffer, positions[:, 0].copy(), positions[:, 1].copy())
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __iter__(self):
+        return iter(self.headers)
+
+    def __contains__(self, header):
+        return header in self._index
+
+    def __getitem__(self, header):
+        return self.get_bytes(header).tobytes().decode()
+
+    def get(self, header, default=None):
+        """Returns seq of header, default if not in collection"""
+        return self[header] if header in self._index else default
+
+    def get_bytes(self, header):
+        """Returns seq of header as memoryview of the buffer (no copy)"""
+        idx = self._index[header]
+        start = int(self.offsets[idx])
+        return memoryview(self.buffer)[start:start + int(self.lengths[idx])]
+
+    def keys(self):
+        return list(self.headers)
+
+    def values(self):
+        return (self[header] for header in self.headers)
+
+    def items(self):
+        return ((header, self[header]) for header in self.headers)
+
+    def to_dict(self):
+        """Returns fasta dict {header: seq}"""
+        return dict(self.items())
+
+    def subset(self, headers):
+        """Returns collection of given headers, sharing the buffer"""
+        idxs = [self._index[header] for header in headers]
+        return SeqCollection([self.headers[idx] for idx in idxs], self.buffer,
+                             self.offsets[idxs], self.lengths[idxs])
+
+    def filter_by_org(self, orgs, keep=True):
+        """Returns collection of seqs of (keep=False: not of) organisms orgs"""
+        orgs = set(orgs)
+        return self.subset([header for header in self.headers if (get_orgtag(header) in orgs) == keep])
+
+    def filter_by_length(self, minlength=0, maxlength=None):
+        """Returns collection of seqs with minlength <= length <= maxlength"""
+        mask = self.lengths >= minlength
+        if maxlength is not None:
+            mask &= self.lengths <= maxlength
+        return self.subset([self.headers[idx] for idx in mask.nonzero()[0]])
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+job_queue.py
+
+Work queue for run_workflow jobs in a SQLite database on storage
+shared by several nodes. Any number of worker processes on any
+number of nodes can drain the queue without duplicating work.
+
+A job is a config file (PDB entry), a paths file and a list of
+tasks. Jobs can hold all tasks of an entry, or a single task that
+depends on the job of the previous task.
+
+- claiming is atomic (BEGIN IMMEDIATE transaction)
+- a claimed job is leased to its worker until lease_expires;
+  running workers extend the lease with heartbeats
+- jobs with expired leases are handed out again, until
+  max_attempts is reached
+
+Requires a filesystem with working POSIX locks (e.g. NFSv4).
+
+    python3 job_queue.py queue.db enqueue paths.txt config_*.txt [--tasks ...] [--perstage]
+    python3 job_queue.py queue.db work [--statedb state.db]
+    python3 job_queue.py queue.db status
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdbid TEXT NOT NULL,
+    config TEXT NOT NULL,
+    paths TEXT NOT NULL,
+    tasks TEXT NOT NULL,
+    depends_on INTEGER REFERENCES jobs(id),
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    heartbeat REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    last_error TEXT,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+"""
+
+JOB_FIELDS = ('id', 'pdbid', 'config', 'paths', 'tasks', 'depends_on', 'status',
+              'worker', 'lease_expires', 'heartbeat', 'attempts', 'max_attempts', 'last_error')
+
+
+def get_workername():
+    """Returns hostname:pid of this worker process"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class JobQueue():
+    """Job queue in a SQLite database, see module docstring."""
+
+    def __init__(self, dbpath):
+        """Opens (and creates if needed) the queue database"""
+        self.dbpath = dbpath
+        self.conn = sqlite3.connect(str(dbpath), timeout=60, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the database connection"""
+        self.conn.close()
+
+    def enqueue(self, pdbid, config, paths, tasks, depends_on=None, max_attempts=3):
+        """Adds a job. Returns the job id."""
+        cur = self.conn.execute('INSERT INTO jobs (pdbid, config, paths, tasks, depends_on, max_attempts, created) '
+                                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                (pdbid, str(config), str(paths), json.dumps(tasks), depends_on, max_attempts, time.time()))
+        return cur.lastrowid
+
+    def enqueue_stages(self, pdbid, config, paths, tasks, max_attempts=3):
+        """Adds one job per task, each depending on the previous.
+        Returns list of job ids."""
+        jobids = []
+        depends_on = None
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            for task in tasks:
+                depends_on = self.enqueue(pdbid, config, paths, [task], depends_on, max_attempts)
+                jobids.append(depends_on)
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+        return jobids
+
+    def _expire_leases(self, now):
+        """Requeues running jobs with expired leases, or fails
+        them if they are out of attempts. Call inside a transaction."""
+        self.conn.execute("UPDATE jobs SET status = 'failed', worker = NULL, finished = ?, "
+                          "last_error = 'lease expired' "
+                          "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts", (now, now))
+        self.conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, last_error = 'lease expired' "
+                          "WHERE status = 'running' AND lease_expires < ?", (now,))
+        # jobs depending on a failed job can never run
+        self.conn.execute("UPDATE jobs SET status = 'failed', finished = ?, last_error = 'dependency failed' "
+                          "WHERE status = 'queued' AND depends_on IN (SELECT id FROM jobs WHERE status = 'failed')",
+                          (now,))
+
+    def claim(self, worker, lease):
+        """Atomically claims the oldest runnable job.
+
+        :param worker: str, worker name
+        :param lease: float, seconds until the lease expires
+
+        :returns: dict of job fields, or None if no job is runnable
+        """
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._expire_leases(now)
+            row = self.conn.execute("SELECT j.id FROM jobs j WHERE j.status = 'queued' AND "
+                                    "(j.depends_on IS NULL OR EXISTS (SELECT 1 FROM jobs d "
+                                    "WHERE d.id = j.depends_on AND d.status = 'done')) "
+                                    "ORDER BY j.id LIMIT 1").fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, "
+                                  "heartbeat = ?, attempts = attempts + 1 WHERE id = ?",
+                                  (worker, now + lease, now, row[0]))
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+        return None if row is None else self.get_job(row[0])
+
+    def get_job(self, jobid):
+        """Returns dict of job fields"""
+        row = self.conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (jobid,)).fetchone()
+        job = dict(zip(JOB_FIELDS, row))
+        job['tasks'] = json.loads(job['tasks'])
+        return job
+
+    def heartbeat(self, jobid, worker, lease):
+        """Extends the lease of a running job.
+        Returns False if the worker no longer holds the lease."""
+        now = time.time()
+        cur = self.conn.execute("UPDATE jobs SET heartbeat = ?, lease_expires = ? "
+                                "WHERE id = ? AND worker = ? AND status = 'running'",
+                                (now, now + lease, jobid, worker))
+        return cur.rowcount == 1
+
+    def complete(self, jobid, worker):
+        """Marks a job done. Returns False if the lease was lost."""
+        cur = self.conn.execute("UPDATE jobs SET status = 'done', finished = ? "
+                                "WHERE id = ? AND worker = ? AND status = 'running'",
+                                (time.time(), jobid, worker))
+        return cur.rowcount == 1
+
+    def fail(self, jobid, worker, error, retry=True):
+        """Records a job failure. The job is queued again
+        if retry is True and it has attempts left."""
+        job = self.get_job(jobid)
+        status = 'queued' if retry and job['attempts'] < job['max_attempts'] else 'failed'
+        cur = self.conn.execute("UPDATE jobs SET status = ?, worker = NULL, last_error = ?, finished = ? "
+                                "WHERE id = ? AND worker = ? AND status = 'running'",
+                                (status, str(error), time.time() if status == 'failed' else None, jobid, worker))
+        return cur.rowcount == 1
+
+    def counts(self):
+        """Returns dict {status: number of jobs}"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def is_drained(self):
+        """True if no job is queued or running"""
+        counts = self.counts()
+        return not counts.get('queued') and not counts.get('running')
+
+
+class Heartbeat(threading.Thread):
+    """Background thread that extends a job's lease
+    every interval seconds until stopped."""
+
+    def __init__(self, dbpath, jobid, worker, lease, interval):
+        """Initiates the thread"""
+        super().__init__(daemon=True)
+        self.dbpath, self.jobid, self.worker = dbpath, jobid, worker
+        self.lease, self.interval = lease, interval
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        """Sends heartbeats on its own connection"""
+        queue = JobQueue(self.dbpath)
+        while not self.stopped.wait(self.interval):
+            if not queue.heartbeat(self.jobid, self.worker, self.lease):
+                self.lost = True
+                break
+        queue.close()
+
+    def stop(self):
+        """Stops the thread"""
+        self.stopped.set()
+        self.join()
+
+
+def run_workflow_job(job, redo=False, statedb=None):
+    """Runs the tasks of a job with run_workflow"""
+    from run_workflow import run_workflow
+    run_workflow(Path(job['config']), Path(job['paths']), job['tasks'], redo, statedb=statedb)
+
+
+def run_worker(dbpath, jobfunc=run_workflow_job, lease=600.0, interval=None, poll=10.0,
+               wait=False, worker=None):
+    """Claims and runs jobs until the queue is drained.
+
+    :param dbpath: pathlib.PosixPath, queue database
+    :param jobfunc: function taking a job dict; exceptions count as
+        failed attempts, SystemExit fails the job without retry
+    :param lease: float, lease length in seconds
+    :param interval: float, heartbeat interval, default lease/3
+    :param poll: float, seconds to wait when no job is runnable
+    :param wait: bool, keep polling after the queue is drained
+
+    :returns: int, number of jobs completed by this worker
+    """
+    worker = worker or get_workername()
+    interval = interval or lease / 3
+    queue = JobQueue(dbpath)
+    numdone = 0
+    while True:
+        job = queue.claim(worker, lease)
+        if job is None:
+            if queue.is_drained() and not wait:
+                break
+            time.sleep(poll)
+            continue
+        print(f"[{worker}] job {job['id']}: {job['pdbid']} {job['tasks']} (attempt {job['attempts']})")
+        heartbeat = Heartbeat(dbpath, job['id'], worker, lease, interval)
+        heartbeat.start()
+        try:
+            jobfunc(job)
+        except SystemExit as stop:
+            heartbeat.stop()
+            queue.fail(job['id'], worker, f'stopped: {stop}', retry=False)
+        except Exception as err:
+            heartbeat.stop()
+            queue.fail(job['id'], worker, repr(err))
+        else:
+            heartbeat.stop()
+            if queue.complete(job['id'], worker):
+                numdone += 1
+            else:
+                print(f"[{worker}] lost lease of job {job['id']}, result discarded")
+    queue.close()
+    return numdone
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] queuedb {enqueue,work,status} ...")
+    parser.add_argument("queuedb", help="path to SQLite queue database on shared storage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    enqueueparser = subparsers.add_parser("enqueue", help="add jobs for config files")
+    enqueueparser.add_argument("pathfile")
+    enqueueparser.add_argument("configfiles", nargs='+')
+    enqueueparser.add_argument("--tasks", nargs='+', default=['all'], help="tasks to run per entry")
+    enqueueparser.add_argument("--perstage", action='store_true', help="one job per task instead of per entry")
+    enqueueparser.add_argument("--maxattempts", type=int, default=3)
+    workparser = subparsers.add_parser("work", help="run jobs until the queue is drained")
+    workparser.add_argument("--lease", type=float, default=600.0, help="lease length in seconds")
+    workparser.add_argument("--statedb", help="SQLite state store passed to run_workflow")
+    workparser.add_argument("--wait", action='store_true', help="keep polling for new jobs")
+    subparsers.add_parser("status", help="print number of jobs per status")
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        from state_store import readin_config
+        queue = JobQueue(Path(args.queuedb))
+        for configfile in args.configfiles:
+            pdbid = readin_config(Path(configfile))['pdbid']
+            configpath = Path(configfile).resolve()
+            pathspath = Path(args.pathfile).resolve()
+            if args.perstage:
+                if 'all' in args.tasks:
+                    from run_workflow import TASKNAMES
+                    args.tasks = TASKNAMES[1:]
+                queue.enqueue_stages(pdbid, configpath, pathspath, args.tasks, args.maxattempts)
+            else:
+                queue.enqueue(pdbid, configpath, pathspath, args.tasks, max_attempts=args.maxattempts)
+        print(queue.counts())
+    elif args.command == 'work':
+        statedb = Path(args.statedb) if args.statedb else None
+        numdone = run_worker(Path(args.queuedb), lambda job: run_workflow_job(job, statedb=statedb),
+                             lease=args.lease, wait=args.wait)
+        print(f'Worker finished {numdone} jobs.')
+    elif args.command == 'status':
+        print(JobQueue(Path(args.queuedb)).counts())
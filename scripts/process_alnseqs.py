@@ -10,8 +10,9 @@ Prepares an alignment for DCA.
 
 from pathlib import Path
 
-from io_utils import does_target_exist, parse_fasta, fa_todict, writeout_fasta
-from pydca.msa_trimmer import msa_trimmer
+from io_utils import does_target_exist, parse_fasta, fa_todict, writeout_fasta, get_orgtag, \
+    readin_fasta_headers, SeqCollection
+from reduce_seq_set import get_dropped_path, readin_dropped_orgs
 
 
 def move_refseq_up(aln_path):
@@ -45,6 +46,7 @@ def trim_msa_by_refseq(aln_path, refseqpath):
 
     :param aln_path: pathlib.PosixPath
     :param refseqpath: pathlib.PosixPath"""
+    from pydca.msa_trimmer import msa_trimmer
     
     trim_outpath = Path(f"{aln_path.stem}_trimmed.fasta")
 
@@ -79,8 +81,7 @@ def get_orgdict_from_fadict(fadict):
 
     fa_orgdict = {}
     for header in fadict.keys():
-        firstpart = header.strip().split()[0]
-        orgtag = firstpart.split("_")[-1:][0]
+        orgtag = get_orgtag(header)
         fa_orgdict[orgtag] = (header, fadict[header])
     return fa_orgdict
 
@@ -93,13 +94,7 @@ def get_orgdict_from_fafile(fafilepath):
     :param fafilepath: pathlib.PosixPath
     :returns fa_orgdict: dict"""
 
-    fadict = fa_todict(fafilepath)
-    fa_orgdict = {}
-    for header in fadict.keys():
-        firstpart = header.strip().split()[0]
-        orgtag = firstpart.split("_")[-1:][0]
-        fa_orgdict[orgtag] = (header, fadict[header])
-    return fa_orgdict
+    return get_orgdict_from_fadict(fa_todict(fafilepath))
 
 
 def join_two_orgdicts(orgdict1, orgdict2):
@@ -123,14 +118,120 @@ def join_two_orgdicts(orgdict1, orgdict2):
     return dcadict
 
 
-def process_alnseqs(alnfile1_path, alnfile2_path, refseq1_path, refseq2_path, alignmentspath, redo):
+def drop_allgap_columns(seqs):
+    """Removes columns that are gaps in all of the
+    aligned seqs. Returns list of seqs."""
+    import numpy as np
+
+    if not seqs:
+        return seqs
+    msa = np.frombuffer(''.join(seqs).encode(), dtype=np.uint8).reshape(len(seqs), -1)
+    keep = (msa != ord('-')).any(axis=0)
+    return [row.tobytes().decode() for row in msa[:, keep]]
+
+
+def extract_rows(alnseqs, orgs, outpath):
+    """Writes the rows of organisms orgs of an alignment,
+    refseq first, without all-gap columns. Only these rows
+    are decoded from the collection.
+
+    :param alnseqs: io_utils.SeqCollection of the alignment
+    :param orgs: list of orgtags
+    :param outpath: pathlib.PosixPath
+
+    :returns outpath: pathlib.PosixPath
+    """
+    orgheaders = {get_orgtag(header): header for header in alnseqs}
+    headers = [orgheaders['RFSEQ']] + [orgheaders[org] for org in orgs if org != 'RFSEQ']
+    seqs = drop_allgap_columns(list(alnseqs.subset(headers).values()))
+    writeout_fasta(outpath, dict(zip(headers, seqs)), overwrite=True)
+    return outpath
+
+
+def extract_matched_rows(alnfile1_path, alnfile2_path, fastafile1_path, fastafile2_path, alignmentspath):
+    """Extracts the rows of organisms present in both
+    seq fasta files (after easel processing and reduction)
+    from two alignments, e.g. full set alignments of the
+    chains (see align_seqs.align_fullset).
+    Alignments are read into SeqCollections, of the seq fasta
+    files only the headers are read. Organisms dropped from
+    either alignment (recorded in {aln stem}.dropped, see
+    align_seqs.align_fullset) are removed from both.
+
+    :param alnfile_path: pathlib.PosixPath, 1 or 2 being either chain
+    :param fastafile_path: pathlib.PosixPath, seqs of the matched organisms
+
+    :returns: two pathlib.PosixPaths, {fastafile stem}.aln in alignmentspath
+    """
+    alnseqs1 = SeqCollection.from_fasta(alnfile1_path)
+    alnseqs2 = SeqCollection.from_fasta(alnfile2_path)
+    alnorgs1 = {get_orgtag(header) for header in alnseqs1}
+    alnorgs2 = {get_orgtag(header) for header in alnseqs2}
+    fastaorgs2 = {get_orgtag(header) for header in readin_fasta_headers(fastafile2_path)}
+    dropped = readin_dropped_orgs(get_dropped_path(alnfile1_path)) | \
+              readin_dropped_orgs(get_dropped_path(alnfile2_path))
+    orgs = [org for org in dict.fromkeys(map(get_orgtag, readin_fasta_headers(fastafile1_path)))
+            if org in fastaorgs2 and org in alnorgs1 and org in alnorgs2 and org not in dropped]
+    if dropped:
+        print(f'{len(dropped)} organisms dropped at alignment are removed from both chains.')
+    print(f'extracting {len(orgs)} matched rows...')
+    outpath1 = extract_rows(alnseqs1, orgs, alignmentspath / f'{fastafile1_path.stem}.aln')
+    outpath2 = extract_rows(alnseqs2, orgs, alignmentspath / f'{fastafile2_path.stem}.aln')
+    return outpath1, outpath2
+
+
+def writeout_joint_colmap(jointaln_path, refrow1, refrow2):
+    """Writes the column map (chain, refseq position) of a joint
+    alignment next to it, see scores_io.make_colmap.
+
+    :param refrow: str, trimmed refseq row of chain 1 or 2
+
+    :returns colmappath: pathlib.PosixPath
+    """
+    from scores_io import make_colmap, writeout_colmap, get_colmap_path
+
+    colmappath = get_colmap_path(jointaln_path)
+    writeout_colmap(make_colmap([refrow1, refrow2]), colmappath)
+    return colmappath
+
+
+def split_joint_refrow(jointaln_path, refseq1_path):
+    """Returns the trimmed refseq rows of chain 1 and 2 from the
+    refseq row of a joint alignment. Trimming by refseq keeps
+    every refseq position, so chain 1 spans len(refseq1) columns.
+
+    :param jointaln_path: pathlib.PosixPath
+    :param refseq1_path: pathlib.PosixPath
+
+    :returns: tuple of two str
+    """
+    jointrefrow = get_orgdict_from_fafile(jointaln_path)['RFSEQ'][1]
+    refseqlength = len(next(iter(fa_todict(refseq1_path).values())))
+    return jointrefrow[:refseqlength], jointrefrow[refseqlength:]
+
+
+def process_alnseqs(alnfile1_path, alnfile2_path, refseq1_path, refseq2_path, alignmentspath, redo,
+                    fastafile1_path=None, fastafile2_path=None, maxgapfrac=0.8, minentropy=0.0):
     """Prepares aligned sequences from two alignment files for 
     DCA. First matches the sequences based on organism, then 
     zips them up (joins) them into one joint alignment file.
 
+    If seq fasta files are given, only rows of organisms in both
+    of them are used (see extract_matched_rows), so alignments
+    of a chain's full hit set need not be realigned per partner.
+
+    Mostly-gap and fully conserved columns are then filtered out
+    for DCA into a separate alignment (see filter_columns.py).
+    An existing joint alignment is reused without redo; its column
+    map and filtered alignment are still made if missing or not
+    current for the thresholds.
+
     :param alnfile_path: pathlib.PosixPath, 1 or 2 being either of the fastas
     :param alignmentspath: pathlib.PosixPath
     :param redo: bool
+    :param fastafile_path: pathlib.PosixPath or None, matched seqs
+    :param maxgapfrac: float, column filter gap threshold
+    :param minentropy: float, column filter entropy threshold
 
     :returns jointalnfile_path: pathlib.PosixPath"""
 
@@ -142,8 +243,18 @@ def process_alnseqs(alnfile1_path, alnfile2_path, refseq1_path, refseq2_path, al
         raise FileNotFoundError('Check that your alignment files exist!')
     if redo == False and does_target_exist(outpath, 'file'):
         print(f'Joint alignment already exists: {outpath}')
+        from scores_io import get_colmap_path
+        if not does_target_exist(get_colmap_path(outpath), 'file'):
+            writeout_joint_colmap(outpath, *split_joint_refrow(outpath, refseq1_path))
+        from filter_columns import filter_joint_alignment
+        filter_joint_alignment(outpath, maxgapfrac, minentropy)
         return outpath
 
+    if fastafile1_path and fastafile2_path and \
+            does_target_exist(fastafile1_path, 'file') and does_target_exist(fastafile2_path, 'file'):
+        alnfile1_path, alnfile2_path = extract_matched_rows(alnfile1_path, alnfile2_path,
+                                                            fastafile1_path, fastafile2_path, alignmentspath)
+
     move_refseq_up(alnfile1_path)
     move_refseq_up(alnfile2_path)
 
@@ -163,5 +274,9 @@ def process_alnseqs(alnfile1_path, alnfile2_path, refseq1_path, refseq2_path, al
 
     writeout_fasta(outpath, jointdict, overwrite=True)
     print(f'Joint alignment written into: {outpath}')
+    writeout_joint_colmap(outpath, orgdict1['RFSEQ'][1], orgdict2['RFSEQ'][1])
+
+    from filter_columns import filter_joint_alignment
+    filter_joint_alignment(outpath, maxgapfrac, minentropy)
 
     return outpath
@@ -13,7 +13,7 @@ Returns two fasta files
 import subprocess
 from pathlib import Path
 
-from io_utils import does_target_exist, parse_fasta, fa_todict, writeout_fasta 
+from io_utils import does_target_exist, parse_fasta, fa_todict, writeout_fasta, get_orgtag
 
 
 def parse_easelerror(easelerr_filepath):
@@ -36,7 +36,7 @@ def parse_easelerror(easelerr_filepath):
         for line in e.readlines():
             if line.startswith('seq'):
                 orglist.append(line.split()[1])
-    orglist = [item.split("_")[1] for item in orglist]
+    orglist = [get_orgtag(item) for item in orglist]
     return set(orglist)
 
 
@@ -55,9 +55,7 @@ def remove_seqs_of_org(fasta_filepath, setoforgs):
 
     fadict = fa_todict(fasta_filepath)
     for key in list(fadict.keys()):
-        uniprottag = key.strip().split()[0]
-        orgtag = uniprottag.split("_")[1]
-        if orgtag in setoforgs:
+        if get_orgtag(key) in setoforgs:
             del fadict[key]
     return fadict
 
@@ -102,7 +102,7 @@ def get_orgs_from_hitlist(hitlist):
     orgdict = {}
 
     for hit in hitlist:
-        org = hit.strip().split('_')[-1]
+        org = io.get_orgtag(hit)
         if not org in orgdict:
             orgdict[org] = [hit]
         else:
@@ -150,6 +150,25 @@ def match_orgtags(orgset, *orgsets):
         return orgset.intersection(*orgsets) 
 
 
+def select_best_hits(keyfile, outpath, minhits, maxseqs):
+    """Writes a keyfile with the best hit (swissprot first) per
+    organism, for at most maxseqs organisms in phmmer order.
+    Used to align a chain's full hit set once.
+
+    :param keyfile: pathlib.PosixPath, keyfile of all hits
+    :param outpath: pathlib.PosixPath
+    :param minhits: int
+    :param maxseqs: int
+
+    :returns outpath: pathlib.PosixPath
+    """
+    hits = get_hit_list(keyfile, minhits, 'MINIMUM')
+    orgset, orgdict = get_orgs_from_hitlist(hits)
+    headers = list(select_seqheader_from_org(orgset, orgdict))
+    io.writeout_list(headers[:maxseqs], outpath)
+    return outpath
+
+
 def matched_keyfiles_exist(keyfilepaths, phmmerpath):
     """Takes in two keyfile paths. Formats filenames 
     into matched keyfiles and checks if these exist.
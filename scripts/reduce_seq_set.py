@@ -12,7 +12,7 @@ Current cutoff is set at 1600.
 """
 
 from pathlib import Path
-from io_utils import parse_fasta, fa_todict, writeout_fasta
+from io_utils import does_target_exist, parse_fasta, fa_todict, writeout_fasta, get_orgtag, SeqCollection
 
 def find_long_seqs(fastafile, cutoffval):
     """Parses a fastafile to return list
@@ -45,7 +45,7 @@ def get_orgset_to_delete(headerlist1, headerlist2):
     :param headerlist: list of fastaheaders
     :returns orgset: set of orgtags
     """
-    tags = [header.split()[0].split('_')[-1:][0] for header in headerlist1+headerlist2]
+    tags = [get_orgtag(header) for header in headerlist1+headerlist2]
     print(tags)
     return set(tags)
 
@@ -54,10 +54,69 @@ def del_orgseq_from_dict(somedict, orgset):
     """Removes seqs from dict that are from
     organisms found in the orgset"""
     for key in list(somedict.keys()):
-        if key.split()[0].split('_')[1] in orgset and key!='RFSEQ':
+        orgtag = get_orgtag(key)
+        if orgtag in orgset and orgtag != 'RFSEQ':
             del somedict[key]
     return somedict
 
+def drop_long_seqs(fastafile, cutoffval):
+    """Removes seqs of cutoffval or longer from a single
+    fasta file (no organism agreement with a partner).
+    Returns number of removed seqs."""
+    seqs = SeqCollection.from_fasta(fastafile)
+    kept = seqs.filter_by_length(maxlength=cutoffval - 1)
+    if len(kept) < len(seqs):
+        writeout_fasta(fastafile, kept, overwrite=True)
+    return len(seqs) - len(kept)
+
+def drop_longest_orgs(fastafile1, fastafile2=None, fraction=0.1):
+    """Removes the organisms with the longest seqs (longest
+    seq of the organism in either file) from both fasta files,
+    at least one organism. Refseqs are kept.
+
+    :param fastafile1: pathlib.PosixPath
+    :param fastafile2: pathlib.PosixPath or None
+    :param fraction: float, fraction of organisms to remove
+
+    :returns: list of (orgtag, length of its longest seq), longest first
+    """
+    fastafiles = [fastafile for fastafile in (fastafile1, fastafile2) if fastafile is not None]
+    collections = [SeqCollection.from_fasta(fastafile) for fastafile in fastafiles]
+    orglengths = {}
+    for seqs in collections:
+        for header in seqs:
+            orgtag = get_orgtag(header)
+            if orgtag != 'RFSEQ':
+                orglengths[orgtag] = max(orglengths.get(orgtag, 0), len(seqs[header]))
+    if not orglengths:
+        return []
+
+    numdrop = max(1, int(len(orglengths) * fraction))
+    dropped = sorted(orglengths.items(), key=lambda item: (-item[1], item[0]))[:numdrop]
+    orgset = {orgtag for orgtag, length in dropped}
+    for fastafile, seqs in zip(fastafiles, collections):
+        writeout_fasta(fastafile, seqs.filter_by_org(orgset, keep=False), overwrite=True)
+    return dropped
+
+def get_dropped_path(somepath):
+    """Returns path of the dropped organisms record of a fasta
+    or alignment file, {stem}.dropped next to it"""
+    return somepath.parent / f'{somepath.stem}.dropped'
+
+def readin_dropped_orgs(droppedpath):
+    """Returns set of orgtags in a dropped organisms record,
+    empty if there is none"""
+    if not does_target_exist(droppedpath, 'file'):
+        return set()
+    with open(droppedpath, 'r') as f:
+        return {line.split('\t')[0] for line in f if line.strip()}
+
+def writeout_dropped_orgs(dropped, droppedpath, reason):
+    """Appends dropped organisms as orgtag<TAB>length<TAB>reason lines"""
+    with open(droppedpath, 'a') as f:
+        for orgtag, length in dropped:
+            f.write(f'{orgtag}\t{length}\t{reason}\n')
+
 def reduce_seq_set(fastafile1, fastafile2, cutoffval):
     """Takes in two fasta files and a max seqlength cutoff value.
     Removes sequences that are too long, preserves organism
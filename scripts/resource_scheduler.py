@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+resource_scheduler.py
+
+Packs external tool runs (phmmer, esl-sfetch, muscle) and DCA
+calls of all workflow processes on one machine onto a core and
+memory budget.
+
+Every job reserves cores and memory (MB) before it starts and
+waits while the reservation does not fit. Reservations of all
+processes live in a json state file, guarded by an flock; entries
+of processes that died are dropped. A job larger than the whole
+budget runs once nothing else is running.
+
+Budget and state file are set in paths.txt (see run_workflow.py):
+    cores=       (default: all cores)
+    memorymb=    (default: total memory)
+    schedfile=   (default: eukdca_sched_<uid>.json in tmp dir)
+
+DCA runs in a separate process with NumPy/BLAS thread counts set
+to the reserved cores.
+"""
+
+import os
+import json
+import time
+import fcntl
+import tempfile
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+               'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+# budget and state file of this process, None for the defaults
+BUDGET = {'cores': None, 'memory_mb': None, 'schedfile': None}
+
+
+def get_total_memory_mb():
+    """Returns total memory of the machine in MB"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2**20
+
+
+def set_budget(cores=None, memory_mb=None, schedfile=None):
+    """Sets the budget and state file of this process,
+    None keeps the default.
+
+    :param cores: int
+    :param memory_mb: int
+    :param schedfile: pathlib.PosixPath
+    """
+    BUDGET.update({'cores': cores, 'memory_mb': memory_mb, 'schedfile': schedfile})
+
+
+def get_budget():
+    """Returns (cores, memory in MB) of the machine budget"""
+    cores = BUDGET['cores'] or os.cpu_count()
+    memory_mb = BUDGET['memory_mb'] or get_total_memory_mb()
+    return cores, memory_mb
+
+
+def get_schedfile():
+    """Returns path of the reservations state file"""
+    if BUDGET['schedfile']:
+        return Path(BUDGET['schedfile'])
+    return Path(tempfile.gettempdir()) / f'eukdca_sched_{os.getuid()}.json'
+
+
+def is_alive(pid):
+    """True if a process with pid exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def thread_env(cores):
+    """Returns dict of thread-count environment variables"""
+    return {var: str(cores) for var in THREAD_VARS}
+
+
+@contextlib.contextmanager
+def locked_reservations(schedfile):
+    """Yields dict of live reservations {key: [pid, cores, memory_mb]}
+    while holding the lock; changes are written back."""
+    with open(schedfile, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            reservations = json.loads(content) if content else {}
+            reservations = {key: res for key, res in reservations.items() if is_alive(res[0])}
+            yield reservations
+            f.seek(0)
+            f.truncate()
+            json.dump(reservations, f)
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def try_reserve(key, cores, memory_mb, schedfile, budget):
+    """Adds a reservation if it fits the budget.
+    Returns False if it does not fit yet."""
+    with locked_reservations(schedfile) as reservations:
+        usedcores = sum(res[1] for res in reservations.values())
+        usedmemory = sum(res[2] for res in reservations.values())
+        fits = usedcores + cores <= budget[0] and usedmemory + memory_mb <= budget[1]
+        if fits or not reservations:
+            reservations[key] = [os.getpid(), cores, memory_mb]
+            return True
+    return False
+
+
+def release(key, schedfile):
+    """Removes a reservation"""
+    with locked_reservations(schedfile) as reservations:
+        reservations.pop(key, None)
+
+
+@contextlib.contextmanager
+def reserve(cores=1, memory_mb=100, poll=0.5):
+    """Waits until cores and memory are free in the budget
+    and holds them until the with block exits.
+
+    :param cores: int, capped at the budget
+    :param memory_mb: int, estimated peak memory
+
+    :yields: int, number of reserved cores
+    """
+    budget = get_budget()
+    schedfile = get_schedfile()
+    cores = max(1, min(cores, budget[0]))
+    key = f'{os.getpid()}-{time.monotonic_ns()}'
+    while not try_reserve(key, cores, memory_mb, schedfile, budget):
+        time.sleep(poll)
+    try:
+        yield cores
+    finally:
+        release(key, schedfile)
+
+
+def run(cmdargs, cores=1, memory_mb=100, **kwargs):
+    """subprocess.run of cmdargs inside a reservation.
+    Returns the CompletedProcess."""
+    with reserve(cores, memory_mb):
+        return subprocess.run(cmdargs, **kwargs)
+
+
+def call_in_worker(func, args=(), kwargs=None, cores=1, memory_mb=100):
+    """Calls func(*args, **kwargs) in a new process with NumPy/BLAS
+    thread counts set to the reserved cores. func and its
+    arguments must be picklable; exceptions are re-raised, a
+    worker that dies raises BrokenProcessPool.
+
+    :returns: return value of func
+    """
+    with reserve(cores, memory_mb) as numcores:
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        with executor:
+            # spawned processes copy os.environ at start (in submit), before numpy is imported
+            saved = {var: os.environ.get(var) for var in THREAD_VARS}
+            os.environ.update(thread_env(numcores))
+            try:
+                future = executor.submit(func, *args, **(kwargs or {}))
+            finally:
+                for var, value in saved.items():
+                    if value is None:
+                        os.environ.pop(var)
+                    else:
+                        os.environ[var] = value
+            return future.result()
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] [pathfile]")
+    parser.add_argument("pathfile", nargs='?', help="paths.txt with the budget settings")
+    args = parser.parse_args()
+
+    if args.pathfile:
+        from run_workflow import InputConfig
+        settings = InputConfig(None, Path(args.pathfile), attrs={}).settings
+        set_budget(settings['cores'], settings['memorymb'], settings['schedfile'])
+
+    budget = get_budget()
+    with locked_reservations(get_schedfile()) as reservations:
+        print(f'Budget: {budget[0]} cores, {budget[1]} MB ({get_schedfile()})')
+        for key, (pid, cores, memory_mb) in reservations.items():
+            print(f'{key:30s} pid {pid:8d} {cores:3d} cores {memory_mb:8d} MB')
@@ -8,38 +8,86 @@ Runs pydca for a given joint alignment
 2. Then choose either plmdca or mfdca
 """
 
-import time
 import subprocess
 from pathlib import Path
 
 from io_utils import does_target_exist
-from pydca.meanfield_dca import meanfield_dca
-from pydca.sequence_backmapper import sequence_backmapper
+from scores_io import writeout_scores_binary
+from filter_columns import get_dca_alignment, remap_scores, MAX_GAP_FRACTION, MIN_COLUMN_ENTROPY
+from dca_cache import DCAStateCache
+from approx_dca import run_lowrank_mfdca
 
 
-def run_pydca_mfdca(jointaln_path, redo):
+def run_pydca_mfdca(jointaln_path, redo, pseudocount=0.5, seqid=0.8):
     """
     Spawns subprocess to run pydca mfdca.
 
     :param jointaln_path: pathlib.PosixPath
         - needs to be just the string due to pydca's code
     :param redo: bool
+    :param pseudocount: float
+    :param seqid: float, identity threshold for sequence weights
 
     :returns mfdca_FN_APC: list
     """
+    from pydca.meanfield_dca import meanfield_dca
 
-    mfdca_inst = meanfield_dca.MeanFieldDCA(str(jointaln_path),'protein', pseudocount = 0.5, seqid = 0.8)
+    mfdca_inst = meanfield_dca.MeanFieldDCA(str(jointaln_path),'protein', pseudocount = pseudocount, seqid = seqid)
 
-    start = time.perf_counter()
     mfdca_FN_APC = mfdca_inst.compute_sorted_FN_APC()
-    stop = time.perf_counter()
 
     return mfdca_FN_APC
 
 
+def run_cached_mfdca(jointaln_path, cachedir, pseudocount=0.5, seqid=0.8):
+    """
+    Runs mfdca with intermediate state (encoded msa, weights,
+    frequencies) cached in cachedir, see dca_cache.py.
+
+    :param jointaln_path: pathlib.PosixPath
+    :param cachedir: pathlib.PosixPath
+    :param pseudocount: float
+    :param seqid: float
+
+    :returns mfdca_FN_APC: list
+    """
+    statecache = DCAStateCache(jointaln_path, cachedir)
+    return statecache.compute_sorted_FN_APC(seqid, pseudocount)
+
+
+MAX_MFDCA_LENGTH = 1000 # exact mfdca matrix is (20*L)^2 doubles
+
+
+def check_dca_method(alnlength, method):
+    """Warns if exact mfdca is run on a joint alignment longer than
+    MAX_MFDCA_LENGTH; the approximate method ('lrmfdca') has to be
+    chosen explicitly."""
+    if method == 'mfdca' and alnlength > MAX_MFDCA_LENGTH:
+        print(f'WARNING: joint alignment of {alnlength} columns is longer than {MAX_MFDCA_LENGTH}, '
+              f'exact mfdca needs ~{estimate_dca_memory_mb(alnlength)} MB (approximate method: lrmfdca).')
+
+
+def estimate_dca_memory_mb(alnlength, method='mfdca'):
+    """Rough estimate of DCA peak memory in MB.
+    Exact mfdca holds a few (20*L)^2 double matrices,
+    lrmfdca the L^2 scores and chunks of couplings.
+
+    :param alnlength: int, joint alignment length
+    :param method: str, 'mfdca' or 'lrmfdca'
+
+    :returns: int
+    """
+    if method == 'lrmfdca':
+        return 200 + (3 * 8 * (32 * 20) * (20 * alnlength) + 4 * 8 * alnlength**2) // 2**20
+    return 200 + (4 * 8 * (20 * alnlength)**2) // 2**20
+
+
 def writeout_scores(dcalist, jointalnpath, outfilepath, method='mfdca'):
     """
-    Writes out dca scores in 3 column file.
+    Writes out dca scores in 3 column file. Indices are joint
+    alignment columns, as in binary scores files; chain and refseq
+    position are looked up on reading with the column map of the
+    joint alignment (scores_io.readin_scores_mapped).
 
     :param dcalist: list of tuples [((i,j),score),...]
     :param outpath: pathlib.PosixPath
@@ -50,20 +98,36 @@ def writeout_scores(dcalist, jointalnpath, outfilepath, method='mfdca'):
             outf.write(f'{scorepair[0][0]}\t{scorepair[0][1]}\t{scorepair[1]}\n')
 
 
-def run_dca(jointaln_path, outpath, redo, method='mfdca'):
+def run_dca(jointaln_path, outpath, redo, method='mfdca', outformat='dat', topk=None, cachedir=None,
+            maxgapfrac=MAX_GAP_FRACTION, minentropy=MIN_COLUMN_ENTROPY):
     """
     Runs dca method (default mfdca) on a joint alignment.
 
-    Writes out scores to a []_scores.dat file.
+    method 'lrmfdca' runs the low-rank shrinkage approximation
+    of mfdca (see approx_dca.py) for very long joint alignments.
+
+    Writes out scores to a []_scores.dat file, or to a binary
+    []_scores.bin file (see scores_io.py) if outformat is 'bin'.
+
+    DCA runs on the column-filtered alignment if there is one
+    (see filter_columns.py), scores keep joint alignment indices.
 
     :param jointaln_path: pathlib.PosixPath
     :param outpath: pathlib.PosixPath
     :param redo: bool
+    :param outformat: str, 'dat' (text) or 'bin' (binary)
+    :param topk: int or None, only used for binary output
+    :param cachedir: pathlib.PosixPath or None, cache for intermediate state
+    :param maxgapfrac, minentropy: float, column filter thresholds
 
     :returns scorefile_path: pathlib.PosixPath
     """
+    if outformat not in ('dat', 'bin'):
+        raise ValueError(f'Unknown scores output format: {outformat}')
+    if method not in ('mfdca', 'lrmfdca'):
+        raise ValueError(f'Unknown dca method: {method}')
 
-    outfilename = f'{jointaln_path.stem}_{method}_scores.dat'
+    outfilename = f'{jointaln_path.stem}_{method}_scores.{outformat}'
     outfilepath = outpath / outfilename
 
     if not does_target_exist(jointaln_path, 'file'):
@@ -72,9 +136,73 @@ def run_dca(jointaln_path, outpath, redo, method='mfdca'):
         print(f'DCA scores files: ({outfilepath}) already exists in {outfilepath.parent}')
         return outfilepath
 
-    dcascores = run_pydca_mfdca(jointaln_path, redo)
+    dcaaln_path, colidx = get_dca_alignment(jointaln_path, maxgapfrac, minentropy)
+    if method == 'lrmfdca':
+        dcascores = run_lowrank_mfdca(dcaaln_path)
+    elif cachedir is None:
+        dcascores = run_pydca_mfdca(dcaaln_path, redo)
+    else:
+        dcascores = run_cached_mfdca(dcaaln_path, cachedir)
     if not dcascores:
         raise ValueError('DCA run unsuccessful!')
-    writeout_scores(dcascores, jointaln_path, outfilepath)
+    if colidx is not None:
+        dcascores = remap_scores(dcascores, colidx)
+    if outformat == 'bin':
+        writeout_scores_binary(dcascores, outfilepath, topk)
+    else:
+        writeout_scores(dcascores, jointaln_path, outfilepath)
     print(f'DCA scores written into {outfilepath}')
     return outfilepath
+
+
+def run_dca_sweep(jointaln_path, outpath, pseudocounts, seqids, cachedir, redo,
+                  maxgapfrac=MAX_GAP_FRACTION, minentropy=MIN_COLUMN_ENTROPY):
+    """
+    Runs mfdca for every combination of pseudocount and seqid
+    on one joint alignment. Intermediate state is cached, so
+    weights and frequencies are computed once per seqid.
+
+    :param jointaln_path: pathlib.PosixPath
+    :param outpath: pathlib.PosixPath
+    :param pseudocounts: list of floats
+    :param seqids: list of floats
+    :param cachedir: pathlib.PosixPath
+    :param redo: bool
+    :param maxgapfrac, minentropy: float, column filter thresholds
+
+    :returns scorefiles: dict {(pseudocount, seqid): pathlib.PosixPath}
+    """
+    if not does_target_exist(jointaln_path, 'file'):
+        raise FileNotFoundError(f'JOINT ALN FILE MISSING: Could not find {jointaln_path}')
+
+    dcaaln_path, colidx = get_dca_alignment(jointaln_path, maxgapfrac, minentropy)
+    statecache = DCAStateCache(dcaaln_path, cachedir)
+    scorefiles = {}
+    for seqid in seqids:
+        for pseudocount in pseudocounts:
+            outfilepath = outpath / f'{jointaln_path.stem}_mfdca_pc{pseudocount}_sid{seqid}_scores.dat'
+            scorefiles[(pseudocount, seqid)] = outfilepath
+            if does_target_exist(outfilepath, 'file') and redo == False:
+                print(f'DCA scores files: ({outfilepath}) already exists in {outfilepath.parent}')
+                continue
+            dcascores = statecache.compute_sorted_FN_APC(seqid, pseudocount)
+            if colidx is not None:
+                dcascores = remap_scores(dcascores, colidx)
+            writeout_scores(dcascores, jointaln_path, outfilepath)
+            print(f'DCA scores (pseudocount={pseudocount}, seqid={seqid}) written into {outfilepath}')
+    return scorefiles
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] jointalnfile outpath cachedir --pseudocounts [pc ...] --seqids [seqid ...] --redo")
+    parser.add_argument("jointalnfile", help="path to joint alignment fasta")
+    parser.add_argument("outpath", help="dir for scores files")
+    parser.add_argument("cachedir", help="dir for cached dca state")
+    parser.add_argument("--pseudocounts", nargs='+', type=float, default=[0.5], help="pseudocounts to sweep")
+    parser.add_argument("--seqids", nargs='+', type=float, default=[0.8], help="seqid thresholds to sweep")
+    parser.add_argument("-r", "--redo", action='store_true', help="recompute existing scores files")
+    args = parser.parse_args()
+
+    run_dca_sweep(Path(args.jointalnfile), Path(args.outpath), args.pseudocounts, args.seqids, Path(args.cachedir), args.redo)
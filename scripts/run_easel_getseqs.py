@@ -8,10 +8,13 @@ Takes in a matched keyfile.
 Returns fasta file with extracted sequences.
 """
 
-import subprocess
 from pathlib import Path
 
 from io_utils import does_target_exist, easeled_seq_formatter
+from resource_scheduler import reserve
+from async_tools import run_tool, run_tool_batch
+
+EASEL_MEMORY_MB = 100
 
 def run_easel(easelpath, databasepath, fastapath, keyfilepath, redo):
     """
@@ -33,15 +36,14 @@ def run_easel(easelpath, databasepath, fastapath, keyfilepath, redo):
         print(f'Easel-fetched Fasta file: ({outpath}) already exists in {outpath.parent}')
         return outpath
 
-    f = open(outpath, 'w+')
     cmdargs = [f"{easelpath}/esl-sfetch",
                 "-f",
                f"{databasepath}",
                f"{keyfilepath}"] 
-    proc = subprocess.run(cmdargs, stdout=f)
-    f.close()
+    with reserve(1, EASEL_MEMORY_MB):
+        result = run_tool(cmdargs, stdoutpath=outpath)
 
-    if proc.returncode != 0:
+    if result.returncode != 0:
         raise ValueError('Easel extract unsuccessful!')
 
     print(f'Retrieved seqs in fasta file: {outpath}')
@@ -64,17 +66,20 @@ def writeout_seqsnotfound(listoferrmessages, keyfilepath, fastapath):
         errf.write(''.join(listoferrmessages))
 
 
-def run_easel_iterate(easelpath, databasepath, fastapath, keyfilepath, redo):
+def run_easel_iterate(easelpath, databasepath, fastapath, keyfilepath, redo, maxjobs=8):
     """Easel stops if it cannot find a sequence, no way
     to get it to continue sequence extraction.
     
     This function iterates over all seq accession ids,
-    extracting one sequence at a time
+    extracting one sequence at a time. Up to maxjobs
+    esl-sfetch runs go concurrently, sequences are
+    written in keyfile order.
 
     :param easelpath: pathlib.PosixPath
     :param databasepath: pathlib.PosixPath
     :param keyfilepath: pathlib.PosixPath
     :param redo: bool, whether to re-extract
+    :param maxjobs: int, concurrent esl-sfetch runs
     """
     filename = easeled_seq_formatter(keyfilepath)
     outpath = fastapath.joinpath(filename)
@@ -89,24 +94,21 @@ def run_easel_iterate(easelpath, databasepath, fastapath, keyfilepath, redo):
         idlist=k.readlines()
         idlist=[item.strip() for item in idlist]
 
+    if easelpath == Path():
+        eslsfetch = 'esl-sfetch'
+    else:
+        eslsfetch = f'{easelpath}/esl-sfetch'
+    cmdlist = [[eslsfetch, f'{databasepath}', f'{item}'] for item in idlist]
+
+    # esl-sfetch is I/O bound, the concurrent runs share one reserved core
+    with reserve(1, EASEL_MEMORY_MB * maxjobs):
+        results = run_tool_batch(cmdlist, outpath, maxjobs)
+
     seqsnotfound = []
-    with open(outpath, 'w+') as f:
-        for item in idlist:
-            if easelpath == Path():
-                cmd = ['esl-sfetch',
-                        f'{databasepath}',
-                        f'{item}']
-            else:
-                cmd = [f'{easelpath}/esl-sfetch', 
-                        f'{databasepath}', 
-                        f'{item}']
-            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if proc.returncode != 0:
-                error = proc.stderr.decode("utf-8")
-                print(error) 
-                seqsnotfound.append(error)
-            seq = proc.stdout.decode("utf-8")
-            f.write(seq)
+    for result in results:
+        if result.returncode != 0:
+            print(result.stderr)
+            seqsnotfound.append(result.stderr)
 
     if seqsnotfound:
         writeout_seqsnotfound(seqsnotfound, keyfilepath, fastapath)
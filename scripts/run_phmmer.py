@@ -8,15 +8,25 @@ Requirements:
 1. Phmmer installed and on system path
 2. Input of seq, db, and path to output.
 3. redo boolean flag if phmmer needs to be rerun or not
+
+With numshards > 1, the database is split once into shards
+(shard_database.py), phmmer searches the shards in parallel with
+-Z set to the number of seqs of the full database, and the hits
+of the shard logs are merged into one log sorted by E-value,
+as read by parse_accid_phmmerlog.py.
 """
 
-import time
-import subprocess
+import os
 from pathlib import Path
 
 from io_utils import does_target_exist, phmmerlog_formatter
+from resource_scheduler import reserve
+from async_tools import run_tool, run_tool_batch
+from shard_database import split_database, get_sharddir
+
+PHMMER_MEMORY_MB = 1000
 
-def run_phmmer(databasepath, seqpath, phmmerpath, redo):
+def run_phmmer(databasepath, seqpath, phmmerpath, redo, cpus=4, timeout=None, numshards=0):
     """
     Spawns subprocess to run phmmer.
 
@@ -25,19 +35,17 @@ def run_phmmer(databasepath, seqpath, phmmerpath, redo):
     --> does this also require SSI index to be made in same folder?
     :param seqpath: pathlib.PosixPath, input seqfile
     :param phmmerpath: pathlib.PosixPath
+    :param cpus: int, worker threads, capped by the scheduler budget
+    :param timeout: float or None, seconds until phmmer is killed
+    :param numshards: int, search the database in this many shards
     
     :returns: outpath or None
     """
+    if numshards > 1:
+        return run_phmmer_sharded(databasepath, seqpath, phmmerpath, redo, numshards, cpus, timeout)
+
     filename = phmmerlog_formatter(seqpath)
     outpath = phmmerpath.joinpath(filename)
-    cmdargs = ["phmmer",
-               "-o",
-               f'{outpath}',
-               "--noali",
-               "--cpu",
-               "4",
-               f'{seqpath}',
-               f'{databasepath}']
 
     if not does_target_exist(seqpath, 'file'):
         raise FileNotFoundError(f'REFSEQ FILE MISSING: Could not find {seqpath}!')
@@ -45,11 +53,166 @@ def run_phmmer(databasepath, seqpath, phmmerpath, redo):
         print(f'Phmmer logfile: ({outpath.name}) already exists in {outpath.parent}') 
         return outpath
 
-    start = time.perf_counter()
-    proc = subprocess.run(cmdargs)
-    stop = time.perf_counter()
-    if proc.returncode != 0:
+    with reserve(cpus, PHMMER_MEMORY_MB) as cores:
+        cmdargs = ["phmmer",
+                   "-o",
+                   f'{outpath}',
+                   "--noali",
+                   "--cpu",
+                   f'{cores}',
+                   f'{seqpath}',
+                   f'{databasepath}']
+        result = run_tool(cmdargs, timeout=timeout, echo=True)
+    if result.timedout:
+        raise ValueError(f'Phmmer timed out after {timeout} seconds for {seqpath}')
+    elif result.returncode != 0:
         raise ValueError(f'Phmmer run unsuccessful for {seqpath}')
-    print(f'Phmmer ran in {stop-start:0.4f} seconds')
+    print(f'Phmmer ran in {result.runtime:0.4f} seconds')
     print(f'Phmmer log stored in {outpath}')
     return outpath
+
+
+def get_shardlog_path(outpath, idx):
+    """Returns path of the phmmer log of shard idx"""
+    return outpath.with_name(f'{outpath.stem}_shard{idx:03d}.log')
+
+
+def is_log_complete(logpath):
+    """True if a phmmer log exists and ends with [ok]"""
+    if not does_target_exist(logpath, 'file'):
+        return False
+    with open(logpath, 'rb') as f:
+        f.seek(max(0, logpath.stat().st_size - 16))
+        return f.read().strip().endswith(b'[ok]')
+
+
+def read_hits(logpath):
+    """Reads the per-sequence hit table of a phmmer log.
+
+    :param logpath: pathlib.PosixPath
+
+    :returns: (header lines up to the table, list of hits
+              (included, evalue, score, line))
+    """
+    header = []
+    hits = []
+    intable = False
+    included = True
+    with open(logpath, 'r') as f:
+        for line in f:
+            if not intable:
+                header.append(line)
+                if line.startswith('Scores for complete sequences'):
+                    intable = True
+                continue
+            text = line.strip()
+            if not text:
+                break
+            if 'inclusion threshold' in text:
+                included = False
+                continue
+            fields = text.split()
+            try:
+                evalue, score = float(fields[0]), float(fields[1])
+            except (ValueError, IndexError):
+                if len(hits) == 0 and included:
+                    header.append(line) # column headers
+                continue
+            hits.append((included, evalue, score, line))
+    return header, hits
+
+
+def merge_shard_logs(shardlogs, outpath, databasepath):
+    """Merges the hit tables of shard logs into one phmmer log,
+    included hits first, each sorted by E-value and seq id as
+    in phmmer (E-values are comparable as all shards were
+    searched with the same -Z).
+    Domain annotation and pipeline statistics are not merged.
+
+    :param shardlogs: list of pathlib.PosixPath
+    :param outpath: pathlib.PosixPath, merged log
+    :param databasepath: pathlib.PosixPath, full database
+
+    :returns outpath: pathlib.PosixPath
+    """
+    header = None
+    hits = []
+    for shardlog in shardlogs:
+        shardheader, shardhits = read_hits(shardlog)
+        if header is None:
+            header = shardheader
+        hits += shardhits
+    hits.sort(key=lambda hit: (not hit[0], hit[1], -hit[2], hit[3].split()[8]))
+
+    tmppath = outpath.with_name(f'{outpath.name}.tmp')
+    with open(tmppath, 'w') as f:
+        for line in header:
+            if line.startswith('# target sequence database:'):
+                line = f'# target sequence database:        {databasepath} ({len(shardlogs)} shards)\n'
+            f.write(line)
+        threshold = True
+        for included, evalue, score, line in hits:
+            if not included and threshold:
+                f.write('  ------ inclusion threshold ------\n')
+                threshold = False
+            f.write(line)
+        if not hits:
+            f.write('\n   [No hits detected that satisfy reporting thresholds]\n')
+        f.write('\n\n//\n[ok]\n')
+    tmppath.replace(outpath)
+    return outpath
+
+
+def run_phmmer_sharded(databasepath, seqpath, phmmerpath, redo, numshards, cpus=4, timeout=None):
+    """Runs phmmer on shards of the database in parallel
+    (one thread each, at most cpus at a time) and merges
+    the shard logs. Finished shard logs are reused unless redo.
+
+    :param numshards: int, see run_phmmer for other params
+
+    :returns: outpath
+    """
+    filename = phmmerlog_formatter(seqpath)
+    outpath = phmmerpath.joinpath(filename)
+
+    if not does_target_exist(seqpath, 'file'):
+        raise FileNotFoundError(f'REFSEQ FILE MISSING: Could not find {seqpath}!')
+    elif does_target_exist(outpath, 'file') and redo == False:
+        print(f'Phmmer logfile: ({outpath.name}) already exists in {outpath.parent}') 
+        return outpath
+
+    manifest = split_database(Path(databasepath), numshards)
+    sharddir = get_sharddir(Path(databasepath))
+    shardlogs = [get_shardlog_path(outpath, idx) for idx in range(numshards)]
+
+    cmdlist = []
+    for shardname, shardlog in zip(manifest['shards'], shardlogs):
+        if redo == False and is_log_complete(shardlog):
+            continue
+        cmdlist.append(["phmmer",
+                        "-o",
+                        f'{shardlog}',
+                        "--noali",
+                        "--cpu",
+                        "1",
+                        "-Z",
+                        f'{manifest["numseqs"]}',
+                        f'{seqpath}',
+                        f'{sharddir / shardname}'])
+
+    if cmdlist:
+        numjobs = min(cpus, len(cmdlist))
+        with reserve(numjobs, PHMMER_MEMORY_MB * numjobs) as cores:
+            results = run_tool_batch(cmdlist, os.devnull, maxjobs=cores, timeout=timeout)
+        if any(result.timedout for result in results):
+            raise ValueError(f'Phmmer timed out after {timeout} seconds for {seqpath}')
+        failed = [cmdargs[-1] for cmdargs, result in zip(cmdlist, results) if result.returncode != 0]
+        if failed:
+            raise ValueError(f'Phmmer run unsuccessful for {seqpath} on shards {", ".join(failed)}')
+        print(f'Phmmer ran on {len(cmdlist)} of {numshards} shards, longest in {max(r.runtime for r in results):0.4f} seconds')
+
+    merge_shard_logs(shardlogs, outpath, databasepath)
+    for shardlog in shardlogs:
+        shardlog.unlink()
+    print(f'Phmmer log of {numshards} shards merged into {outpath}')
+    return outpath
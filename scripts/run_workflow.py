@@ -6,29 +6,60 @@ INPUT:
 
 taskname = list of tasknames to run
 redo = boolean of whether or not to rerun tasks
+metricsfile = json lines file for per-task performance metrics
+statedb = SQLite state store (see state_store.py), replaces config file updates
+
+Besides directories, paths.txt may hold workflow settings
+(key=value, see SETTINGS), e.g. the resource budget:
+
+    cores=16
+    memorymb=64000
+    schedfile=/scratch/eukdca_sched.json
+
+and stage settings:
+
+    alignmode=fullset       matched (default) or fullset, see alignseqs
+    minmeffperlength=0.2    Meff gate, see checkmeff (default 0, off)
+    phmmershards=8          database shards searched in parallel, see runphmmer (default 0, none)
+    musclememorymb=32000    muscle memory limit, see alignseqs (default: memory budget)
+    maxgapfraction=0.8      column filter of the joint alignment, see filter_columns.py
+    mincolumnentropy=0.0    (defaults 0.8 and 0.0)
+
+Stage modules (and their dependencies, e.g. pydca) are imported
+only when their task runs, see TASKMODULES.
 """
 
+import time
+IMPORTSTART = time.perf_counter()
+
 from pathlib import Path
 import sys
+import importlib
+
+from stage_metrics import (new_runid, start_stage, finish_stage, count_seqs_in_files, writeout_metrics,
+                           startup_metrics, record_stage_value, timed_call)
+
+IMPORT_S = time.perf_counter() - IMPORTSTART
 
-from find_refseq_files import *
-from io_utils import *
-from edit_refseqs import *
-from run_phmmer import *
-from parse_accid_phmmerlog import *
-from process_phmmerhits import *
-from run_easel_getseqs import *
-from process_easelseqs import *
-from align_seqs import *
-from process_alnseqs import *
-from reduce_seq_set import *
-from run_dca import *
+# settings read from paths.txt: {key: (type, default)}
+SETTINGS = {'cores': (int, None),
+            'memorymb': (int, None),
+            'schedfile': (Path, None),
+            'alignmode': (str, 'matched'),
+            'minmeffperlength': (float, 0.0),
+            'phmmershards': (int, 0),
+            'musclememorymb': (int, None),
+            'maxgapfraction': (float, 0.8),
+            'mincolumnentropy': (float, 0.0)}
+
+ALIGNMODES = ('matched', 'fullset')
 
 class InputConfig():
     """Object to store names of intermediate files.
-    Reads input from pathfile and datafile"""
+    Reads input from pathfile and datafile,
+    or from a dict of attrs (e.g. from a StateStore)"""
 
-    def __init__(self, config, paths):
+    def __init__(self, config, paths, attrs=None):
         """Initiates the class"""
 
         # input paths
@@ -41,6 +72,10 @@ class InputConfig():
         self.keyfilepath = ''
         self.alnpath = ''
         self.dcapath = ''
+        self.metricspath = ''
+
+        # workflow settings, see SETTINGS
+        self.settings = {key: default for key, (_, default) in SETTINGS.items()}
 
         self._read_paths(paths)
 
@@ -60,15 +95,20 @@ class InputConfig():
         self.jointalnfile = ''
         self.mfdcaoutfile = '' 
 
-        self._read_inputs(config)
+        if attrs is None:
+            self._read_inputs(config)
+        else:
+            self.set_inputs(attrs)
 
 
     def _read_paths(self, paths):
-        """Reads paths from paths.txt"""
+        """Reads paths and settings from paths.txt"""
         with open(paths, 'r') as p:
             for line in p.readlines():
                 path = line.strip().split('=')
-                if path[0] in self.__dict__.keys():
+                if path[0] in SETTINGS:
+                    self.settings[path[0]] = SETTINGS[path[0]][0](path[1])
+                elif path[0] in self.__dict__.keys():
                     self.__dict__[path[0]] = Path(path[1])
 
     def _read_inputs(self, config):
@@ -82,11 +122,25 @@ class InputConfig():
                     else:
                         self.__dict__[attr[0]] = Path(attr[1])
 
+    def set_inputs(self, attrs):
+        """Sets file inputs from dict of {attr: str}"""
+        for key, item in attrs.items():
+            if key in self.__dict__.keys() and not key.endswith('path') and key != 'settings':
+                if key == 'pdbid':
+                    self.__dict__[key] = item
+                else:
+                    self.__dict__[key] = Path(item)
+
+    def get_inputs(self):
+        """Returns file inputs as dict of {attr: str}"""
+        return {key: str(item) for key, item in self.__dict__.items()
+                if not key.endswith('path') and key != 'settings'}
+
     def update_config_var(self, config):
         """Updates config file with attributes"""
         with open(config, 'w+') as c:
             for key, item in self.__dict__.items():
-                if not key.endswith('path'):
+                if not key.endswith('path') and key != 'settings':
                     c.write(f'{key}={item}\n') 
 
 
@@ -97,6 +151,7 @@ def findrefseqs(icObject, redo):
     :param redo: T/F - not incorporated, function searches every time
     :returns icObject: InputConfig object with updated attributes.
     """
+    from find_refseq_files import find_refseq_files
     try:
         refseqpaths = find_refseq_files(icObject.pdbid, icObject.fastapath)
         print(f'Found these refseq files:\n{refseqpaths}')
@@ -115,6 +170,7 @@ def editrefseqs(icObj, redo):
     """Processes reference sequences by
     removing nonstandard amino acids (Xs).
     Takes and returns an InputConfigObj."""
+    from edit_refseqs import edit_refseqs
     try:
         icObj.refseq1, icObj.refseq2 = edit_refseqs(icObj.refseq1, icObj.refseq2, redo)
     except FileNotFoundError as fnotfound:
@@ -123,16 +179,20 @@ def editrefseqs(icObj, redo):
 
 
 def runphmmer(icObj, rerun): 
-    """Runs phmmer on seq.
+    """Runs phmmer on seq, over database shards
+    in parallel if the phmmershards setting is > 1.
     Takes and returns an InputConfigObj."""
+    from run_phmmer import run_phmmer
+
+    numshards = icObj.settings['phmmershards']
     try:
-        icObj.logfile1 = run_phmmer(icObj.dbpath, icObj.refseq1, icObj.phmmerpath, rerun)
+        icObj.logfile1 = run_phmmer(icObj.dbpath, icObj.refseq1, icObj.phmmerpath, rerun, numshards=numshards)
     except FileNotFoundError as e:
         print(e)
     except ValueError as valerr:
         print(valerr)
     try:
-        icObj.logfile2 = run_phmmer(icObj.dbpath, icObj.refseq2, icObj.phmmerpath, rerun)
+        icObj.logfile2 = run_phmmer(icObj.dbpath, icObj.refseq2, icObj.phmmerpath, rerun, numshards=numshards)
     except FileNotFoundError as e:
         print(e)
     except ValueError as valerr:
@@ -145,6 +205,7 @@ def parsephmmer(icObj, overwrite):
     """Parses phmmer log to keyfile.
     Takes and returns and InputConfigObj.
     Overwrite is a bool."""
+    from parse_accid_phmmerlog import parse_accid_phmmerlog
     try:
         icObj.keyfile1 = parse_accid_phmmerlog(icObj.logfile1, icObj.keyfilepath, overwrite)
     except FileNotFoundError as fnotfound:
@@ -165,6 +226,8 @@ def processphmmer(icObj, overwrite):
     """Checks total number of hits in keyfile, matches organisms.
        Returns processed keyfile"""
 
+    from process_phmmerhits import process_phmmerhits
+
     minhits = 100
     maxhits = 600
 
@@ -180,6 +243,7 @@ def processphmmer(icObj, overwrite):
 def runeasel(icObj, rerun):
     """Runs easel on a keyfile.
     Extracts sequences from a db."""
+    from run_easel_getseqs import run_easel_iterate
     try:
         icObj.eslfastafile1 = run_easel_iterate(icObj.easelpath, icObj.dbpath, icObj.fastapath, icObj.matchedkeyfile1, rerun)
     except FileNotFoundError as e:
@@ -194,6 +258,7 @@ def runeasel(icObj, rerun):
 def processeasel(icObj, redo):
     """Processes easel extracted fasta.
     Keeps only seqs with common orgs."""
+    from process_easelseqs import process_easelseqs
     easelerrfile = Path(f"{icObj.fastapath}/{icObj.pdbid}.easelerror")
     if not easelerrfile.is_file():
         print('No easel error file found. Continuting with original matched fastas')
@@ -222,6 +287,8 @@ def reduceseqset(icObj, redo):
     # TODO: doesn't use redo yet
     # TODO: reduction scheme is brute force right now, only throws error if 0 seqs are left
     
+    from reduce_seq_set import reduce_seq_set
+
     maxlength = 1600 #kind of arbitrary!
 
     try:
@@ -234,43 +301,140 @@ def reduceseqset(icObj, redo):
 
     return icObj
 
-def alignseqs(icObj, realign):
-    """Runs muscle to align sequences.
-    Takes and returns an InputConfigObj."""
+
+def checkmeff(icObj, redo):
+    """Estimates the effective number of matched seqs (Meff)
+    and stops the entry if Meff per joint length is below
+    minmeffperlength (paths.txt, 0 turns the gate off).
+    With alignmode fullset, the joined rows are not the matched
+    seqs; processalignment then gates on the joint alignment."""
+    from estimate_meff import check_meff
+
+    minmeffperlength = icObj.settings['minmeffperlength']
+    if minmeffperlength <= 0:
+        print('Meff gate off (minmeffperlength 0).')
+        return icObj
+    if icObj.settings['alignmode'] == 'fullset':
+        print('Meff gate runs on the joint alignment (alignmode fullset).')
+        return icObj
+
     try:
-        icObj.alnfile1 = run_muscle(icObj.eslfastafile1, icObj.refseq1, icObj.alnpath, realign)
+        check_meff(icObj.eslfastafile1, icObj.eslfastafile2, icObj.refseq1, icObj.refseq2, minmeffperlength)
     except FileNotFoundError as fnotfound:
         print(fnotfound)
     except ValueError as valerr:
         print(valerr)
+        sys.exit()
+
+    return icObj
+
+
+def alignseqs(icObj, realign):
+    """Runs muscle to align sequences.
+    Takes and returns an InputConfigObj.
+
+    alignmode (paths.txt) 'matched' aligns the matched seqs
+    of each chain (default). With 'fullset', each chain's full
+    hit set is aligned once (and reused for every partner);
+    processalignment then extracts the matched rows.
+
+    Muscle runs reaching the memory limit (musclememorymb in
+    paths.txt) are killed; both chains are then realigned without
+    the longest organisms (see align_seqs.align_guarded)."""
+    from align_seqs import align_guarded, align_fullset, get_muscle_memlimit_mb
+
+    muscletimeout = 12 * 3600 # seconds, hung muscle runs are killed
+    memlimit = get_muscle_memlimit_mb(icObj.settings['musclememorymb'])
+    alignmode = icObj.settings['alignmode']
+    if alignmode not in ALIGNMODES:
+        print(f'Unknown alignmode {alignmode} in paths file, use one of {ALIGNMODES}.')
+        sys.exit()
+
+    if alignmode == 'fullset':
+        for num in (1, 2):
+            try:
+                alnfile = align_fullset(getattr(icObj, f'keyfile{num}'), getattr(icObj, f'refseq{num}'),
+                                        icObj.easelpath, icObj.dbpath, icObj.fastapath, icObj.alnpath,
+                                        realign, timeout=muscletimeout, memlimit_mb=memlimit)
+                setattr(icObj, f'alnfile{num}', alnfile)
+            except FileNotFoundError as fnotfound:
+                print(fnotfound)
+            except ValueError as valerr:
+                print(valerr)
+            except MemoryError as memerr:
+                print(memerr)
+        return icObj
+
+    # both chains in one call: a drop in either is applied to, and realigns, both
     try:
-        icObj.alnfile2 = run_muscle(icObj.eslfastafile2, icObj.refseq2, icObj.alnpath, realign)
+        icObj.alnfile1, icObj.alnfile2 = align_guarded([icObj.eslfastafile1, icObj.eslfastafile2],
+                                                       [icObj.refseq1, icObj.refseq2],
+                                                       icObj.alnpath, realign, muscletimeout, memlimit)
     except FileNotFoundError as fnotfound:
         print(fnotfound)
     except ValueError as valerr:
         print(valerr)
+    except MemoryError as memerr:
+        print(memerr)
     return icObj
 
 
 def processalignment(icObj, redo):
     """Matches aligned sequences by organism.
     Joins (horizontally concatenates) matched sequences
-    to make a joint alignment file for DCA"""
+    to make a joint alignment file for DCA.
+    With alignmode fullset, the Meff gate (see checkmeff)
+    runs on the joint alignment."""
+    from process_alnseqs import process_alnseqs
+    # full-set alignments hold all organisms, the matched seqs select their rows
+    matchedfiles = (icObj.eslfastafile1, icObj.eslfastafile2) if icObj.settings['alignmode'] == 'fullset' else ()
     try:
-        icObj.jointalnfile = process_alnseqs(icObj.alnfile1, icObj.alnfile2, icObj.refseq1, icObj.refseq2, icObj.alnpath, redo)
+        icObj.jointalnfile = process_alnseqs(icObj.alnfile1, icObj.alnfile2, icObj.refseq1, icObj.refseq2, icObj.alnpath, redo,
+                                             *matchedfiles, maxgapfrac=icObj.settings['maxgapfraction'],
+                                             minentropy=icObj.settings['mincolumnentropy'])
     except FileNotFoundError as fnotfound:
         print(fnotfound)
     except ValueError as valerr:
         print(valerr)
 
+    minmeffperlength = icObj.settings['minmeffperlength']
+    if matchedfiles and minmeffperlength > 0:
+        from estimate_meff import check_joint_meff
+        try:
+            check_joint_meff(icObj.jointalnfile, minmeffperlength)
+        except FileNotFoundError as fnotfound:
+            print(fnotfound)
+        except ValueError as valerr:
+            print(valerr)
+            sys.exit()
+
     return icObj
 
 
 def rundca(icObj, redo):
     """Runs dca on a joint alignment.
-    Deposits scores into a scores.dat file."""
+    Deposits scores into a scores.dat file.
+    dcamethod 'lrmfdca' runs approximate (low-rank) mfdca
+    for joint alignments too long for exact mfdca.
+    DCA runs in a worker process with dcacores BLAS threads,
+    its runtime in the worker is recorded as dca_s."""
+
+    from run_dca import run_dca, estimate_dca_memory_mb, check_dca_method
+    from approx_dca import get_alignment_length
+    from resource_scheduler import call_in_worker
+    from filter_columns import get_dca_alignment
+
+    dcamethod = 'mfdca' # or 'lrmfdca'
+    dcacores = 4
+    thresholds = {'maxgapfrac': icObj.settings['maxgapfraction'], 'minentropy': icObj.settings['mincolumnentropy']}
+
     try:
-        icObj.mfdcaoutfile = run_dca(icObj.jointalnfile, icObj.dcapath, redo)
+        alnlength = get_alignment_length(get_dca_alignment(icObj.jointalnfile, **thresholds)[0])
+        check_dca_method(alnlength, dcamethod)
+        icObj.mfdcaoutfile, dca_s = call_in_worker(timed_call, (run_dca, icObj.jointalnfile, icObj.dcapath, redo),
+                                                   {'method': dcamethod, **thresholds},
+                                                   dcacores, estimate_dca_memory_mb(alnlength, dcamethod))
+        record_stage_value('dca_s', dca_s)
     except FileNotFoundError as fnotfound:
         print(fnotfound)
     except ValueError as valerr:
@@ -278,7 +442,7 @@ def rundca(icObj, redo):
     return icObj
 
 
-TASKNAMES = ['all', 'findrefseqs', 'editrefseqs', 'runphmmer', 'parsephmmer', 'processphmmer', 'runeasel', 'processeasel', 'reduceseqset', 'alignseqs', 'processalignment', 'rundca'] 
+TASKNAMES = ['all', 'findrefseqs', 'editrefseqs', 'runphmmer', 'parsephmmer', 'processphmmer', 'runeasel', 'processeasel', 'reduceseqset', 'checkmeff', 'alignseqs', 'processalignment', 'rundca'] 
 
 TASKS = {'findrefseqs': ('1. find refseq fasta files\n', findrefseqs),
          'editrefseqs': ('2. process refseq\n', editrefseqs),
@@ -288,37 +452,208 @@ TASKS = {'findrefseqs': ('1. find refseq fasta files\n', findrefseqs),
          'runeasel': ('6. runs easel extract to get seqs from db\n', runeasel),
          'processeasel': ('7. process easel extracted seqs based on organisms\n', processeasel),
          'reduceseqset': ('8. removes sequences that are too long from seq set\n', reduceseqset), 
-         'alignseqs': ('9. aligns sequences with muscle\n', alignseqs),
-         'processalignment': ('10. matches and joins aligned sequences\n', processalignment),
-         'rundca': ('11. runs DCA on joint aligned sequences\n', rundca)} 
+         'checkmeff': ('9. stops entry if the effective number of seqs is too low\n', checkmeff),
+         'alignseqs': ('10. aligns sequences with muscle\n', alignseqs),
+         'processalignment': ('11. matches and joins aligned sequences\n', processalignment),
+         'rundca': ('12. runs DCA on joint aligned sequences\n', rundca)} 
+
+# module of each task, imported when the task is dispatched
+TASKMODULES = {'findrefseqs': 'find_refseq_files',
+               'editrefseqs': 'edit_refseqs',
+               'runphmmer': 'run_phmmer',
+               'parsephmmer': 'parse_accid_phmmerlog',
+               'processphmmer': 'process_phmmerhits',
+               'runeasel': 'run_easel_getseqs',
+               'processeasel': 'process_easelseqs',
+               'reduceseqset': 'reduce_seq_set',
+               'checkmeff': 'estimate_meff',
+               'alignseqs': 'align_seqs',
+               'processalignment': 'process_alnseqs',
+               'rundca': 'run_dca'}
+
+# config attributes read (in) and written (out) by each task, for metrics
+TASKFILES = {'findrefseqs': ((), ('refseq1', 'refseq2')),
+             'editrefseqs': (('refseq1', 'refseq2'), ('refseq1', 'refseq2')),
+             'runphmmer': (('refseq1', 'refseq2'), ('logfile1', 'logfile2')),
+             'parsephmmer': (('logfile1', 'logfile2'), ('keyfile1', 'keyfile2')),
+             'processphmmer': (('keyfile1', 'keyfile2'), ('matchedkeyfile1', 'matchedkeyfile2')),
+             'runeasel': (('matchedkeyfile1', 'matchedkeyfile2'), ('eslfastafile1', 'eslfastafile2')),
+             'processeasel': (('eslfastafile1', 'eslfastafile2'), ('eslfastafile1', 'eslfastafile2')),
+             'reduceseqset': (('eslfastafile1', 'eslfastafile2'), ('eslfastafile1', 'eslfastafile2')),
+             'checkmeff': (('eslfastafile1', 'eslfastafile2'), ('eslfastafile1', 'eslfastafile2')),
+             'alignseqs': (('eslfastafile1', 'eslfastafile2'), ('alnfile1', 'alnfile2')),
+             'processalignment': (('alnfile1', 'alnfile2'), ('jointalnfile',)),
+             'rundca': (('jointalnfile',), ('mfdcaoutfile',))}
+
+# TASKFILES of tasks that differ with alignmode fullset
+FULLSET_TASKFILES = {'alignseqs': (('keyfile1', 'keyfile2'), ('alnfile1', 'alnfile2')),
+                     'processalignment': (('alnfile1', 'alnfile2', 'eslfastafile1', 'eslfastafile2'), ('jointalnfile',))}
+
+
+def get_task_files(icObj, taskname, direction):
+    """Returns the paths of a task's input or output files.
+
+    :param icObj: InputConfig object
+    :param taskname: str
+    :param direction: str, 'in' or 'out'
+
+    :returns: list of paths
+    """
+    taskfiles = TASKFILES
+    if icObj.settings['alignmode'] == 'fullset':
+        taskfiles = {**TASKFILES, **FULLSET_TASKFILES}
+    attrs = taskfiles[taskname][0 if direction == 'in' else 1]
+    return [icObj.__dict__[attr] for attr in attrs]
+
+
+def get_metricsfile(icObj, inputfile, runid):
+    """Returns path of the metrics file for a run: in metricspath
+    if given in the paths file, else next to inputfile
+    (config file, or paths file when using a state store)."""
+    metricsdir = icObj.metricspath if icObj.metricspath else Path(inputfile).parent
+    return metricsdir / f'{icObj.pdbid}_{runid}_metrics.jsonl'
+
 
-def run_workflow(configf, pathsf, tasknamelist, redo):
-    """Runs eukdimerdca workflow"""
+def import_task_module(taskname):
+    """Imports the module of a task.
+    Returns import time in seconds (~0 if already imported)."""
+    start = time.perf_counter()
+    importlib.import_module(TASKMODULES[taskname])
+    return round(time.perf_counter() - start, 4)
+
+
+def get_task_status(icObj, taskname):
+    """Returns 'finished' if all output files of a task exist,
+    else 'failed'."""
+    for outfile in get_task_files(icObj, taskname, 'out'):
+        if not (outfile and Path(outfile).is_file()):
+            return 'failed'
+    return 'finished'
+
+
+def run_task(icObj, taskname, redo, runid, metricsfile, store=None):
+    """Runs a single task, records its metrics (and status
+    in the StateStore, if given).
+    Takes and returns an InputConfigObj."""
+    seqs_in = count_seqs_in_files(get_task_files(icObj, taskname, 'in'))
+    import_s = import_task_module(taskname)
+    if store is not None:
+        store.start_stage(icObj.pdbid, taskname)
+    snapshot = start_stage()
+    status = None
+    reason = None
     try:
-        ic = InputConfig(configf, pathsf) 
+        icObj = TASKS[taskname][1](icObj, redo)
+    except SystemExit as stop:
+        status = 'exited'
+        if isinstance(stop.code, str):
+            reason = stop.code
+        raise
+    finally:
+        status = status or get_task_status(icObj, taskname)
+        record = {'run': runid, 'pdbid': icObj.pdbid, 'task': taskname, 'status': status}
+        if reason is not None:
+            record['reason'] = reason
+        record.update(finish_stage(snapshot))
+        record['import_s'] = import_s
+        record['seqs_in'] = seqs_in
+        record['seqs_out'] = count_seqs_in_files(get_task_files(icObj, taskname, 'out'))
+        writeout_metrics(record, metricsfile)
+        if store is not None:
+            store.finish_stage(icObj.get_inputs(), taskname, status, record)
+    return icObj
+
+
+def apply_settings(icObj):
+    """Sets process-wide settings of paths.txt (resource budget)"""
+    from resource_scheduler import set_budget
+    set_budget(icObj.settings['cores'], icObj.settings['memorymb'], icObj.settings['schedfile'])
+
+
+def load_config(configf, pathsf, store=None):
+    """Returns InputConfig object. With a StateStore, configf
+    may be a config file or a pdbid in the store. A config file
+    is imported into the store if its pdbid is not yet in there."""
+    if store is None:
+        return InputConfig(configf, pathsf)
+    from state_store import readin_config
+    if Path(configf).is_file():
+        pdbid = readin_config(Path(configf))['pdbid']
+        if not store.has_entry(pdbid):
+            store.import_config(Path(configf))
+    else:
+        pdbid = str(configf)
+    return InputConfig(None, pathsf, attrs=store.get_attrs(pdbid))
+
+
+def run_workflow(configf, pathsf, tasknamelist, redo, metricsfile=None, statedb=None, startup=None):
+    """Runs eukdimerdca workflow.
+    Per-task metrics are written to metricsfile (json lines),
+    preceded by a 'startup' record if startup metrics are given.
+    With statedb, entry state is kept in a StateStore
+    instead of rewriting the config file after every task."""
+    store = None
+    if statedb is not None:
+        from state_store import StateStore
+        store = StateStore(statedb)
+    try:
+        ic = load_config(configf, pathsf, store)
     except IOError:
         ic = None
+    if ic is not None:
+        apply_settings(ic)
 
     if 'all' in tasknamelist:
         tasknamelist = TASKNAMES[1:]
 
+    runid = new_runid()
+    if metricsfile is None:
+        metricsfile = get_metricsfile(ic, configf if store is None else pathsf, runid)
+    if startup is not None:
+        writeout_metrics({'run': runid, 'pdbid': ic.pdbid, 'task': 'startup', 'status': 'finished', **startup},
+                         metricsfile)
+
     for taskname in tasknamelist: 
         if taskname not in TASKNAMES:
             raise ValueError(f'{taskname} not a valid task. Try again.')
         print(f'--- {taskname} --- {TASKS[taskname][0]}')
-        torun = TASKS[taskname][1] 
-        ic = torun(ic, redo)
+        ic = run_task(ic, taskname, redo, runid, metricsfile, store)
         print('\n')
-        ic.update_config_var(configf)
+        if store is None:
+            ic.update_config_var(configf)
+    print(f'Task metrics written into {metricsfile}')
+    if store is not None:
+        store.close()
+
+
+def resume_unfinished(statedb, pathsf, tasknamelist, redo=False):
+    """Runs the unfinished tasks of all unfinished entries
+    in a StateStore, in task order."""
+    from state_store import StateStore
+    store = StateStore(statedb)
+    pdbids = store.unfinished(tasknamelist)
+    stagestatus = {pdbid: store.get_stage_status(pdbid) for pdbid in pdbids}
+    store.close()
+    print(f'Resuming {len(pdbids)} unfinished entries.')
+    for pdbid in pdbids:
+        todo = [task for task in tasknamelist if stagestatus[pdbid].get(task) != 'finished']
+        try:
+            run_workflow(pdbid, pathsf, todo, redo, statedb=statedb)
+        except SystemExit as stop:
+            if isinstance(stop.code, str):
+                print(stop.code)
+            print(f'{pdbid} stopped early, continuing with next entry.')
 
 if __name__=="__main__":
 
     import argparse
-    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] configfile pathfile taskname [taskname, ...] --redo")
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] configfile pathfile taskname [taskname, ...] --redo --metricsfile --statedb")
     parser.add_argument("configfile", help="path to config.txt file")
     parser.add_argument("pathfile", help="path to paths.txt file")
-    parser.add_argument("taskname", nargs = '+', help="task to run: findrefseqs, editrefseqs, runphmmer, parsephmmer, processphmmer, runeasel, processeasel, reduceseqset, alignseqs, processalignment, rundca")
+    parser.add_argument("taskname", nargs = '+', help="task to run: findrefseqs, editrefseqs, runphmmer, parsephmmer, processphmmer, runeasel, processeasel, reduceseqset, checkmeff, alignseqs, processalignment, rundca")
     parser.add_argument("-r", "--redo", help="True/False to re-parse out keyfile")
+    parser.add_argument("-m", "--metricsfile", help="json lines file for task metrics")
+    parser.add_argument("-s", "--statedb", help="SQLite state store, configfile may then be a pdbid in the store")
     args = parser.parse_args()
 
     configfile = args.configfile
@@ -336,4 +671,6 @@ if __name__=="__main__":
         tasklist = [args.taskname]
     else:
         tasklist = args.taskname
-    run_workflow(configfile, pathfile, tasklist, redoflag)
+    metricsfile = Path(args.metricsfile) if args.metricsfile else None
+    statedb = Path(args.statedb) if args.statedb else None
+    run_workflow(configfile, pathfile, tasklist, redoflag, metricsfile, statedb, startup=startup_metrics(IMPORT_S))
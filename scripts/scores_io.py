@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+scores_io.py
+
+Compact binary format for DCA scores.
+
+Text score files hold one line per scored pair, i.e. ~L^2/2 lines
+for a joint alignment of length L. The binary format stores the
+pairs as a fixed-width record array (i, j as int16, score as float32)
+behind a small header, optionally keeping only the top-K pairs:
+
+    magic    8 bytes  b'EUKDCAS1'
+    npairs   uint32   number of records in the file
+    topk     uint32   K used when writing, 0 if all pairs were kept
+    reserved uint64
+
+Records are written in order of descending score.
+"""
+
+import heapq
+import struct
+
+import numpy as np
+
+SCORES_MAGIC = b'EUKDCAS1'
+SCORES_HEADER = struct.Struct('<8sIIQ')
+SCORES_DTYPE = np.dtype([('i', '<i2'), ('j', '<i2'), ('score', '<f4')])
+MAX_SCORE_INDEX = np.iinfo(np.int16).max
+
+
+def select_top_scores(dcalist, topk=None):
+    """Selects the topk highest scoring pairs with a heap
+    instead of sorting the full list.
+
+    :param dcalist: iterable of tuples [((i,j),score),...]
+    :param topk: int or None, None keeps all pairs
+
+    :returns: list of tuples [((i,j),score),...], highest score first
+    """
+    if topk is None:
+        return sorted(dcalist, key=lambda pair: pair[1], reverse=True)
+    if topk <= 0:
+        raise ValueError(f'topk must be a positive int, got {topk}')
+    return heapq.nlargest(topk, dcalist, key=lambda pair: pair[1])
+
+
+def scores_to_array(dcalist):
+    """Converts a list of scored pairs to a record array.
+
+    :param dcalist: list of tuples [((i,j),score),...]
+
+    :returns: numpy.ndarray with SCORES_DTYPE
+    """
+    records = np.empty(len(dcalist), dtype=SCORES_DTYPE)
+    if not dcalist:
+        return records
+    idx = np.array([pair[0] for pair in dcalist], dtype=np.int64)
+    if idx.min() < 0 or idx.max() > MAX_SCORE_INDEX:
+        raise ValueError(f'Score indices must be within 0..{MAX_SCORE_INDEX} for binary output.')
+    records['i'] = idx[:, 0]
+    records['j'] = idx[:, 1]
+    records['score'] = [pair[1] for pair in dcalist]
+    return records
+
+
+def writeout_scores_binary(dcalist, outfilepath, topk=None):
+    """Writes out dca scores as a binary record array.
+
+    :param dcalist: list of tuples [((i,j),score),...]
+    :param outfilepath: pathlib.PosixPath
+    :param topk: int or None, number of top scoring pairs to keep
+
+    :returns: int, number of pairs written
+    """
+    records = scores_to_array(select_top_scores(dcalist, topk))
+    with open(outfilepath, 'wb') as outf:
+        outf.write(SCORES_HEADER.pack(SCORES_MAGIC, len(records), topk or 0, 0))
+        outf.write(records.tobytes())
+    return len(records)
+
+
+def readin_scores_header(scorefilepath):
+    """Reads the header of a binary scores file.
+
+    :param scorefilepath: pathlib.PosixPath
+
+    :returns: tuple (npairs, topk)
+    """
+    with open(scorefilepath, 'rb') as f:
+        header = f.read(SCORES_HEADER.size)
+    if len(header) != SCORES_HEADER.size:
+        raise ValueError(f'TRUNCATED FILE: {scorefilepath} has no complete scores header.')
+    magic, npairs, topk, _ = SCORES_HEADER.unpack(header)
+    if magic != SCORES_MAGIC:
+        raise ValueError(f'{scorefilepath} is not a binary scores file.')
+    return npairs, topk
+
+
+def readin_scores_binary(scorefilepath):
+    """Memory-maps the records of a binary scores file.
+    Nothing is read until the returned array is accessed.
+
+    :param scorefilepath: pathlib.PosixPath
+
+    :returns: numpy.memmap with fields 'i', 'j', 'score'
+    """
+    npairs, _ = readin_scores_header(scorefilepath)
+    if npairs == 0:
+        return np.empty(0, dtype=SCORES_DTYPE)
+    return np.memmap(scorefilepath, dtype=SCORES_DTYPE, mode='r',
+                     offset=SCORES_HEADER.size, shape=(npairs,))
+
+
+def get_top_pairs(scorefilepath, numpairs, minseparation=0):
+    """Returns the top scoring pairs from a binary scores file,
+    optionally skipping pairs closer than minseparation in sequence.
+
+    :param scorefilepath: pathlib.PosixPath
+    :param numpairs: int
+    :param minseparation: int, minimum |i-j|
+
+    :returns: numpy.ndarray with fields 'i', 'j', 'score'
+    """
+    records = readin_scores_binary(scorefilepath)
+    if minseparation:
+        sep = np.abs(records['i'].astype(np.int32) - records['j'])
+        records = records[sep >= minseparation]
+    return np.array(records[:numpairs])
+
+
+# Column map of a joint alignment: for each column, the chain (0 or 1),
+# the refseq position (0-based) and the PDB residue number (-1 if unknown).
+# Stored as {joint alignment stem}_colmap.npy next to the joint alignment.
+COLMAP_DTYPE = np.dtype([('chain', 'i1'), ('refpos', '<i4'), ('resnum', '<i4')])
+MAPPED_SCORES_DTYPE = np.dtype([('i', '<i4'), ('j', '<i4'), ('score', '<f8'),
+                                ('chain_i', 'i1'), ('refpos_i', '<i4'), ('resnum_i', '<i4'),
+                                ('chain_j', 'i1'), ('refpos_j', '<i4'), ('resnum_j', '<i4')])
+
+
+def get_colmap_path(jointaln_path):
+    """Returns path of the column map of a joint alignment"""
+    return jointaln_path.with_name(f'{jointaln_path.stem}_colmap.npy')
+
+
+def make_colmap(refrows, resnums=None):
+    """Makes the column map of a joint alignment from the
+    aligned (trimmed) refseq row of each chain.
+
+    :param refrows: list of str, refseq rows in joint order
+    :param resnums: list of numpy.ndarrays or None, PDB residue
+        number of each refseq position per chain
+
+    :returns: numpy.ndarray with COLMAP_DTYPE
+    """
+    parts = []
+    for chain, refrow in enumerate(refrows):
+        part = np.empty(len(refrow), dtype=COLMAP_DTYPE)
+        residues = np.frombuffer(refrow.encode(), dtype=np.uint8) != ord('-')
+        part['chain'] = chain
+        part['refpos'] = np.where(residues, np.cumsum(residues) - 1, -1)
+        part['resnum'] = -1
+        if resnums is not None and resnums[chain] is not None:
+            mapped = part['refpos'] >= 0
+            part['resnum'][mapped] = np.asarray(resnums[chain])[part['refpos'][mapped]]
+        parts.append(part)
+    return np.concatenate(parts) if parts else np.empty(0, dtype=COLMAP_DTYPE)
+
+
+def writeout_colmap(colmap, colmappath):
+    """Writes a column map as .npy file"""
+    np.save(colmappath, colmap, allow_pickle=False)
+
+
+def readin_colmap(colmappath):
+    """Memory-maps a column map .npy file"""
+    return np.load(colmappath, mmap_mode='r', allow_pickle=False)
+
+
+def readin_scores(scorefilepath):
+    """Reads a text (.dat) or binary (.bin) scores file.
+
+    :returns: numpy.ndarray with fields 'i', 'j', 'score', best first
+    """
+    if scorefilepath.suffix == '.bin':
+        return np.array(readin_scores_binary(scorefilepath))
+    table = np.loadtxt(scorefilepath, usecols=(0, 1, 2), ndmin=2)
+    records = np.empty(len(table), dtype=[('i', '<i4'), ('j', '<i4'), ('score', '<f8')])
+    records['i'] = table[:, 0]
+    records['j'] = table[:, 1]
+    records['score'] = table[:, 2]
+    return records
+
+
+def translate_scores(records, colmap):
+    """Translates score indices to chain, refseq position and
+    residue number with a vectorized lookup in the column map.
+
+    :param records: numpy.ndarray with fields 'i', 'j', 'score'
+    :param colmap: numpy.ndarray with COLMAP_DTYPE
+
+    :returns: numpy.ndarray with MAPPED_SCORES_DTYPE
+    """
+    mapped = np.empty(len(records), dtype=MAPPED_SCORES_DTYPE)
+    for field in ('i', 'j', 'score'):
+        mapped[field] = records[field]
+    for idx in ('i', 'j'):
+        columns = colmap[np.asarray(records[idx], dtype=np.int64)]
+        for field in ('chain', 'refpos', 'resnum'):
+            mapped[f'{field}_{idx}'] = columns[field]
+    return mapped
+
+
+def readin_scores_mapped(scorefilepath, colmappath):
+    """Reads a scores file with indices translated by a column map"""
+    return translate_scores(readin_scores(scorefilepath), readin_colmap(colmappath))
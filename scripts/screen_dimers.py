@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+screen_dimers.py
+
+All-vs-all dimer screening: runs DCA for a list of candidate
+chain pairings, doing the per-chain work once per distinct chain.
+
+Per chain (refseq file {chain}_refseq.fasta in fastapath):
+    edit refseq, phmmer, parse keyfile, pick the best hit per
+    organism, easel extraction, drop too long seqs, muscle,
+    trim by refseq -> {chain}_refseq_phmmer_best_trimmed.fasta
+
+Per pair:
+    match organisms of the two trimmed alignments, subset the
+    rows, join them -> Joint_{chain1}_{chain2}_aln.fasta, run DCA
+
+Pairs file: one pair of chains per line, e.g. '1c0f_A 1c0f_S'.
+Directories are read from a paths.txt file as in run_workflow.py.
+
+    python3 screen_dimers.py paths.txt pairs.txt [--redo] [--method lrmfdca] [--summary results.tsv]
+"""
+
+from pathlib import Path
+
+from io_utils import does_target_exist, fa_todict, writeout_fasta
+from process_alnseqs import get_orgdict_from_fafile, join_two_orgdicts, writeout_joint_colmap
+
+
+def readin_pairs(pairsfile):
+    """Reads chain pairs, skipping blank lines and # comments.
+
+    :param pairsfile: pathlib.PosixPath
+
+    :returns: list of (chain1, chain2) tuples
+    """
+    pairs = []
+    with open(pairsfile, 'r') as f:
+        for line in f:
+            fields = line.split('#')[0].split()
+            if not fields:
+                continue
+            if len(fields) != 2:
+                raise ValueError(f'Expected two chains per line in {pairsfile}: {line.strip()}')
+            pairs.append((fields[0], fields[1]))
+    return pairs
+
+
+def get_chains(pairs):
+    """Returns distinct chains of pairs in order of appearance"""
+    return list(dict.fromkeys(chain for pair in pairs for chain in pair))
+
+
+def prepare_chain(icObj, chain, redo, minhits=100, maxseqs=2000, maxlength=1600):
+    """Runs the per-chain stages for one chain.
+
+    :param icObj: InputConfig object, paths and settings are used
+    :param chain: str, e.g. '1c0f_A'
+    :param redo: bool
+
+    :returns trimmedpath: pathlib.PosixPath, refseq-trimmed alignment
+    """
+    from edit_refseqs import remove_nonstandard_aas
+    from run_phmmer import run_phmmer
+    from parse_accid_phmmerlog import parse_accid_phmmerlog
+    from align_seqs import align_fullset, get_muscle_memlimit_mb
+    from process_alnseqs import move_refseq_up, trim_msa_by_refseq, trim_list_to_fadict
+
+    refseq = icObj.fastapath / f'{chain}_refseq.fasta'
+    trimmedpath = icObj.alnpath / f'{chain}_refseq_phmmer_best_trimmed.fasta'
+    if redo == False and does_target_exist(trimmedpath, 'file'):
+        print(f'Trimmed alignment of {chain} already exists: {trimmedpath}')
+        return trimmedpath
+
+    writeout_fasta(refseq, remove_nonstandard_aas(refseq), overwrite=True)
+    logfile = run_phmmer(icObj.dbpath, refseq, icObj.phmmerpath, redo,
+                         numshards=icObj.settings['phmmershards'])
+    keyfile = parse_accid_phmmerlog(logfile, icObj.keyfilepath, redo)
+    alnfile = align_fullset(keyfile, refseq, icObj.easelpath, icObj.dbpath, icObj.fastapath, icObj.alnpath,
+                            redo, minhits, maxseqs, maxlength,
+                            memlimit_mb=get_muscle_memlimit_mb(icObj.settings['musclememorymb']))
+    move_refseq_up(alnfile)
+    trimmed = trim_list_to_fadict(trim_msa_by_refseq(alnfile, refseq))
+    writeout_fasta(trimmedpath, trimmed, overwrite=True)
+    print(f'Trimmed alignment of {chain} written into: {trimmedpath}')
+    return trimmedpath
+
+
+def join_pair(orgdict1, orgdict2, chain1, chain2, alnpath, minhits=100, maxhits=600, redo=False,
+              maxgapfrac=0.8, minentropy=0.0):
+    """Joins the rows of organisms present in both per-chain
+    alignments (first maxhits in order of chain1).
+
+    :param orgdict: dict {'ORG': ('header', 'seq'), ...} of a chain
+    :param alnpath: pathlib.PosixPath
+    :param maxgapfrac, minentropy: float, column filter thresholds
+
+    :returns jointpath: pathlib.PosixPath
+    """
+    from filter_columns import filter_joint_alignment
+
+    jointpath = alnpath / f'Joint_{chain1}_{chain2}_aln.fasta'
+    if redo == False and does_target_exist(jointpath, 'file'):
+        print(f'Joint alignment already exists: {jointpath}')
+        return jointpath
+
+    orgs = [org for org in orgdict1 if org in orgdict2 and org != 'RFSEQ']
+    if len(orgs) <= minhits:
+        raise ValueError(f'Too FEW matched organisms for {chain1} and {chain2}: {len(orgs)}')
+    orgs = ['RFSEQ'] + orgs[:maxhits]
+
+    subset1 = {org: orgdict1[org] for org in orgs}
+    subset2 = {org: orgdict2[org] for org in orgs}
+    writeout_fasta(jointpath, join_two_orgdicts(subset1, subset2), overwrite=True)
+    writeout_joint_colmap(jointpath, orgdict1['RFSEQ'][1], orgdict2['RFSEQ'][1])
+    print(f'Joint alignment of {len(orgs)} seqs written into: {jointpath}')
+    filter_joint_alignment(jointpath, maxgapfrac, minentropy)
+    return jointpath
+
+
+def run_pair_dca(jointpath, dcapath, redo, method='mfdca', dcacores=4, maxgapfrac=0.8, minentropy=0.0):
+    """Runs DCA on a joint alignment in a scheduled worker process.
+
+    :param method: str, 'mfdca' or 'lrmfdca' (approximate, for long alignments)
+    :param maxgapfrac, minentropy: float, column filter thresholds
+
+    :returns scorefile: pathlib.PosixPath
+    """
+    from run_dca import run_dca, estimate_dca_memory_mb, check_dca_method
+    from approx_dca import get_alignment_length
+    from resource_scheduler import call_in_worker
+    from filter_columns import get_dca_alignment
+
+    thresholds = {'maxgapfrac': maxgapfrac, 'minentropy': minentropy}
+    alnlength = get_alignment_length(get_dca_alignment(jointpath, **thresholds)[0])
+    check_dca_method(alnlength, method)
+    return call_in_worker(run_dca, (jointpath, dcapath, redo), {'method': method, **thresholds},
+                          dcacores, estimate_dca_memory_mb(alnlength, method))
+
+
+def screen_dimers(pathsfile, pairs, redo=False, minhits=100, maxhits=600, method='mfdca'):
+    """Runs DCA for all pairs, per-chain stages once per chain.
+    Chains or pairs that fail are reported and skipped.
+
+    :param pathsfile: pathlib.PosixPath, paths.txt
+    :param pairs: list of (chain1, chain2)
+    :param redo: bool
+    :param method: str, dca method, 'mfdca' or 'lrmfdca'
+
+    :returns results: list of dicts, one per pair
+    """
+    from run_workflow import InputConfig, apply_settings
+
+    icObj = InputConfig(None, pathsfile, attrs={})
+    apply_settings(icObj)
+    orgdicts = {}
+    chainerrors = {}
+    for chain in get_chains(pairs):
+        print(f'--- chain {chain} ---')
+        try:
+            orgdicts[chain] = get_orgdict_from_fafile(prepare_chain(icObj, chain, redo, minhits))
+        except (FileNotFoundError, ValueError, RuntimeError) as err:
+            print(err)
+            chainerrors[chain] = str(err)
+
+    results = []
+    for chain1, chain2 in pairs:
+        print(f'--- pair {chain1} {chain2} ---')
+        result = {'chain1': chain1, 'chain2': chain2, 'numseqs': None,
+                  'jointalnfile': None, 'scorefile': None, 'status': 'finished'}
+        failed = [chain for chain in (chain1, chain2) if chain in chainerrors]
+        if failed:
+            result['status'] = f'chain failed: {chainerrors[failed[0]]}'
+            results.append(result)
+            continue
+        try:
+            result['jointalnfile'] = join_pair(orgdicts[chain1], orgdicts[chain2], chain1, chain2,
+                                               icObj.alnpath, minhits, maxhits, redo,
+                                               icObj.settings['maxgapfraction'], icObj.settings['mincolumnentropy'])
+            result['numseqs'] = len(fa_todict(result['jointalnfile']))
+            result['scorefile'] = run_pair_dca(result['jointalnfile'], icObj.dcapath, redo, method,
+                                               maxgapfrac=icObj.settings['maxgapfraction'],
+                                               minentropy=icObj.settings['mincolumnentropy'])
+        except (FileNotFoundError, ValueError, RuntimeError) as err:
+            print(err)
+            result['status'] = str(err)
+        results.append(result)
+    return results
+
+
+def writeout_results(results, outpath):
+    """Writes screening results as tab-separated table"""
+    fields = ['chain1', 'chain2', 'numseqs', 'jointalnfile', 'scorefile', 'status']
+    with open(outpath, 'w') as f:
+        f.write('\t'.join(fields) + '\n')
+        for result in results:
+            f.write('\t'.join(str(result[field]) for field in fields) + '\n')
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] pathfile pairsfile [--redo] [--method METHOD] [--summary TSV]")
+    parser.add_argument("pathfile", help="path to paths.txt file")
+    parser.add_argument("pairsfile", help="file with one pair of chains (e.g. 1c0f_A 1c0f_S) per line")
+    parser.add_argument("-r", "--redo", action='store_true', help="rerun existing per-chain and per-pair steps")
+    parser.add_argument("--minhits", type=int, default=100, help="minimum hits per chain and matched seqs per pair")
+    parser.add_argument("--maxhits", type=int, default=600, help="maximum matched seqs per pair")
+    parser.add_argument("--method", choices=['mfdca', 'lrmfdca'], default='mfdca', help="dca method, lrmfdca approximates mfdca for long alignments")
+    parser.add_argument("--summary", default='screen_results.tsv', help="tab-separated results per pair")
+    args = parser.parse_args()
+
+    results = screen_dimers(Path(args.pathfile), readin_pairs(Path(args.pairsfile)), args.redo,
+                            args.minhits, args.maxhits, args.method)
+    writeout_results(results, Path(args.summary))
+    print(f'Screening results written into {args.summary}')
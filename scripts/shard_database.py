@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+shard_database.py
+
+Splits a fasta sequence database into shards of about equal
+residue count, so phmmer can search the shards in parallel
+(see run_phmmer_sharded in run_phmmer.py).
+
+The shards are written once per database into {database}.shards/
+with a manifest (shards.json) holding the number of seqs of the
+full database, which phmmer gets via -Z to keep E-values of
+shard searches those of the full database. Shards older than
+their database are rebuilt.
+
+Number of shards used by the workflow: phmmershards in paths.txt
+(default 0: no sharding, see run_workflow.py).
+
+    python3 shard_database.py database.fasta numshards [--redo]
+"""
+
+import json
+import heapq
+from pathlib import Path
+
+from io_utils import does_target_exist
+
+MANIFEST = 'shards.json'
+
+
+def get_sharddir(dbpath):
+    """Returns directory of the shards of a database"""
+    return dbpath.with_name(f'{dbpath.name}.shards')
+
+
+def readin_manifest(sharddir):
+    """Returns manifest dict {'database', 'numseqs', 'shards'} or None"""
+    manifestpath = sharddir / MANIFEST
+    if not does_target_exist(manifestpath, 'file'):
+        return None
+    with open(manifestpath, 'r') as f:
+        return json.load(f)
+
+
+def is_shardset_current(dbpath, sharddir, numshards):
+    """True if sharddir holds numshards shards not older than the database"""
+    manifest = readin_manifest(sharddir)
+    if manifest is None or len(manifest['shards']) != numshards:
+        return False
+    return (sharddir / MANIFEST).stat().st_mtime >= dbpath.stat().st_mtime
+
+
+def iter_entries(dbpath):
+    """Streams a fasta file, yields (lines, number of residues) per entry"""
+    lines = []
+    numres = 0
+    with open(dbpath, 'r') as f:
+        for line in f:
+            if line.startswith('>'):
+                if lines:
+                    yield lines, numres
+                lines = []
+                numres = 0
+            else:
+                numres += len(line.strip())
+            lines.append(line)
+    if lines:
+        yield lines, numres
+
+
+def split_database(dbpath, numshards, sharddir=None, redo=False):
+    """Splits a fasta database into numshards shards in one pass,
+    each entry going to the shard with fewest residues so far.
+
+    :param dbpath: pathlib.PosixPath, fasta database
+    :param numshards: int
+    :param sharddir: pathlib.PosixPath, default {database}.shards
+    :param redo: bool
+
+    :returns: manifest dict {'database', 'numseqs', 'shards'},
+              shards being file names in sharddir
+    """
+    if not does_target_exist(dbpath, 'file'):
+        raise FileNotFoundError(f'DATABASE MISSING: {dbpath}')
+    if numshards < 1:
+        raise ValueError(f'Number of shards must be at least 1, not {numshards}.')
+    if sharddir is None:
+        sharddir = get_sharddir(dbpath)
+    if redo == False and is_shardset_current(dbpath, sharddir, numshards):
+        print(f'{numshards} shards of {dbpath.name} already exist in {sharddir}')
+        return readin_manifest(sharddir)
+
+    sharddir.mkdir(parents=True, exist_ok=True)
+    (sharddir / MANIFEST).unlink(missing_ok=True)
+    names = [f'shard_{idx:03d}.fasta' for idx in range(numshards)]
+    files = [open(sharddir / name, 'w') for name in names]
+    sizes = [(0, idx) for idx in range(numshards)]
+    numseqs = 0
+    try:
+        for lines, numres in iter_entries(dbpath):
+            size, idx = heapq.heappop(sizes)
+            files[idx].writelines(lines)
+            heapq.heappush(sizes, (size + numres, idx))
+            numseqs += 1
+    finally:
+        for f in files:
+            f.close()
+
+    manifest = {'database': str(dbpath), 'numseqs': numseqs, 'shards': names}
+    tmppath = sharddir / f'{MANIFEST}.tmp'
+    with open(tmppath, 'w') as f:
+        json.dump(manifest, f)
+    tmppath.replace(sharddir / MANIFEST)
+    print(f'{numseqs} seqs of {dbpath.name} split into {numshards} shards in {sharddir}')
+    return manifest
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] database numshards [--redo]")
+    parser.add_argument("database", help="fasta database")
+    parser.add_argument("numshards", type=int, help="number of shards")
+    parser.add_argument("-r", "--redo", action='store_true', help="split again even if shards exist")
+    args = parser.parse_args()
+
+    split_database(Path(args.database), args.numshards, redo=args.redo)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+stage_metrics.py
+
+Records performance metrics of workflow tasks.
+
+For every task: wall time, CPU time (own and of child processes),
+peak RSS (own and of child processes), bytes read and written
+(including waited-for child processes) and numbers of sequences
+in the task's input and output files. Tasks can add their own
+values (e.g. DCA runtime) with record_stage_value.
+
+Metrics are appended as one JSON object per line to a metrics file.
+Linux-specific values (/proc) are None where unavailable.
+"""
+
+import os
+import json
+import time
+import resource
+from pathlib import Path
+
+
+STAGE_VALUES = {}
+
+
+def new_runid():
+    """Returns an id for one workflow run: timestamp + pid"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+def read_proc_io():
+    """Returns (bytes read, bytes written) of this process and
+    its waited-for children, or (None, None) without /proc."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+    except OSError:
+        return None, None
+    return int(fields['rchar']), int(fields['wchar'])
+
+
+def reset_peak_rss():
+    """Resets the peak RSS high-water mark of this process.
+    Returns False if the kernel does not allow it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def read_peak_rss_kb():
+    """Returns peak RSS of this process in kB"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def read_process_age():
+    """Returns seconds since this process started,
+    or None without /proc."""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            stat = f.read()
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+    except OSError:
+        return None
+    # field 22 (starttime), counted after the ')' closing the command name
+    starttime = int(stat.rsplit(')', 1)[1].split()[19]) / os.sysconf('SC_CLK_TCK')
+    return uptime - starttime
+
+
+def startup_metrics(import_s):
+    """Metrics of interpreter startup and module imports,
+    up to now.
+
+    :param import_s: float, seconds spent in module imports
+
+    :returns: dict of metrics
+    """
+    age = read_process_age()
+    return {'wall_s': round(age if age is not None else import_s, 4),
+            'cpu_s': round(time.process_time(), 4),
+            'child_cpu_s': 0.0,
+            'import_s': round(import_s, 4)}
+
+
+def count_seqs(filepath):
+    """Counts sequences in a workflow file: fasta records in
+    fasta/aln files, ids in keyfiles, hits in phmmer logs.
+
+    :param filepath: pathlib.PosixPath or str
+
+    :returns: int or None if file missing or of other type
+    """
+    filepath = Path(filepath)
+    if not filepath.is_file():
+        return None
+    with open(filepath, 'r') as f:
+        if filepath.suffix in ('.fasta', '.aln', '.fa'):
+            return sum(1 for line in f if line.startswith('>'))
+        elif filepath.suffix == '.keyfile':
+            return sum(1 for line in f if line.strip())
+        elif filepath.suffix == '.log':
+            hits = 0
+            for line in f:
+                text = line.strip()
+                if "inclusion threshold" in text:
+                    break
+                elif text and text[0].isnumeric():
+                    hits += 1
+            return hits
+    return None
+
+
+def count_seqs_in_files(filepaths):
+    """Sums count_seqs over files, None if none could be counted"""
+    counts = [count_seqs(filepath) for filepath in filepaths if filepath]
+    counts = [count for count in counts if count is not None]
+    return sum(counts) if counts else None
+
+
+def record_stage_value(key, value):
+    """Adds a task-specific value to the metrics of the running task"""
+    STAGE_VALUES[key] = value
+
+
+def timed_call(func, *args, **kwargs):
+    """Calls func(*args, **kwargs).
+    Returns (return value, seconds), e.g. from a worker process."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, round(time.perf_counter() - start, 4)
+
+
+def start_stage():
+    """Takes a snapshot of resource counters before a task.
+
+    :returns: dict
+    """
+    STAGE_VALUES.clear()
+    selfusage = resource.getrusage(resource.RUSAGE_SELF)
+    childusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    bytesread, byteswritten = read_proc_io()
+    return {'wall': time.perf_counter(),
+            'cpu': selfusage.ru_utime + selfusage.ru_stime,
+            'childcpu': childusage.ru_utime + childusage.ru_stime,
+            'childmaxrss': childusage.ru_maxrss,
+            'peakreset': reset_peak_rss(),
+            'read': bytesread,
+            'written': byteswritten}
+
+
+def finish_stage(snapshot):
+    """Computes metrics of a task from the snapshot taken
+    before it ran, plus the values recorded by the task.
+
+    Child peak RSS is only known as a high-water mark over all
+    children of the run, so it is None for tasks whose children
+    stayed below that mark.
+
+    :param snapshot: dict from start_stage
+
+    :returns: dict of metrics
+    """
+    selfusage = resource.getrusage(resource.RUSAGE_SELF)
+    childusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    bytesread, byteswritten = read_proc_io()
+    metrics = {'wall_s': round(time.perf_counter() - snapshot['wall'], 4),
+               'cpu_s': round(selfusage.ru_utime + selfusage.ru_stime - snapshot['cpu'], 4),
+               'child_cpu_s': round(childusage.ru_utime + childusage.ru_stime - snapshot['childcpu'], 4),
+               'peak_rss_kb': read_peak_rss_kb() if snapshot['peakreset'] else None,
+               'child_peak_rss_kb': None,
+               'bytes_read': None,
+               'bytes_written': None}
+    if childusage.ru_maxrss > snapshot['childmaxrss']:
+        metrics['child_peak_rss_kb'] = childusage.ru_maxrss
+    if bytesread is not None and snapshot['read'] is not None:
+        metrics['bytes_read'] = bytesread - snapshot['read']
+        metrics['bytes_written'] = byteswritten - snapshot['written']
+    metrics.update(STAGE_VALUES)
+    STAGE_VALUES.clear()
+    return metrics
+
+
+def writeout_metrics(record, metricsfile):
+    """Appends a metrics record as a json line.
+
+    :param record: dict
+    :param metricsfile: pathlib.PosixPath
+    """
+    with open(metricsfile, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def readin_metrics(metricsfile):
+    """Reads a json lines metrics file into a list of dicts"""
+    with open(metricsfile, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+state_store.py
+
+Stores workflow state of many PDB entries in one SQLite database,
+as an alternative to one config.txt file per entry.
+
+Per entry: the config attributes (pdbid, refseq1, ..., mfdcaoutfile).
+Per entry and task: status, start/finish timestamps and metrics.
+
+Config text files remain the import/export format:
+
+    python3 state_store.py state.db import config_1c0f.txt [...]
+    python3 state_store.py state.db export 1c0f config_1c0f.txt
+    python3 state_store.py state.db progress
+    python3 state_store.py state.db unfinished
+    python3 state_store.py state.db resume paths.txt [taskname ...]
+"""
+
+import json
+import time
+import sqlite3
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    pdbid TEXT PRIMARY KEY,
+    attrs TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    pdbid TEXT NOT NULL REFERENCES entries(pdbid),
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started REAL,
+    finished REAL,
+    metrics TEXT,
+    PRIMARY KEY (pdbid, stage)
+);
+CREATE INDEX IF NOT EXISTS stages_status ON stages(stage, status);
+"""
+
+
+def readin_config(configfile):
+    """Reads config.txt into a dict of {attr: str}, in file order.
+
+    :param configfile: pathlib.PosixPath
+
+    :returns: dict
+    """
+    attrs = {}
+    with open(configfile, 'r') as c:
+        for line in c.readlines():
+            attr = line.strip().split('=')
+            if len(attr) == 2:
+                attrs[attr[0]] = attr[1]
+    if 'pdbid' not in attrs:
+        raise ValueError(f'No pdbid in config file {configfile}')
+    return attrs
+
+
+def writeout_config(attrs, configfile):
+    """Writes dict of attrs in config.txt format"""
+    with open(configfile, 'w+') as c:
+        for key, item in attrs.items():
+            c.write(f'{key}={item}\n')
+
+
+class StateStore():
+    """Workflow state of PDB entries in a SQLite database.
+    Every update is a single transaction."""
+
+    def __init__(self, dbpath):
+        """Opens (and creates if needed) the database"""
+        self.dbpath = dbpath
+        self.conn = sqlite3.connect(str(dbpath), timeout=60)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the database connection"""
+        self.conn.close()
+
+    def has_entry(self, pdbid):
+        """Returns True if pdbid is in the store"""
+        row = self.conn.execute('SELECT 1 FROM entries WHERE pdbid = ?', (pdbid,)).fetchone()
+        return row is not None
+
+    def get_attrs(self, pdbid):
+        """Returns config attrs of an entry as dict"""
+        row = self.conn.execute('SELECT attrs FROM entries WHERE pdbid = ?', (pdbid,)).fetchone()
+        if row is None:
+            raise KeyError(f'{pdbid} not in state store {self.dbpath}')
+        return json.loads(row[0])
+
+    def save_attrs(self, attrs):
+        """Inserts or replaces the config attrs of an entry"""
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO entries (pdbid, attrs, updated) VALUES (?, ?, ?)',
+                              (attrs['pdbid'], json.dumps(attrs), time.time()))
+
+    def import_config(self, configfile):
+        """Imports a config.txt file. Returns the pdbid."""
+        attrs = readin_config(configfile)
+        self.save_attrs(attrs)
+        return attrs['pdbid']
+
+    def export_config(self, pdbid, configfile):
+        """Exports an entry to a config.txt file"""
+        writeout_config(self.get_attrs(pdbid), configfile)
+
+    def start_stage(self, pdbid, stage):
+        """Marks a stage of an entry as running"""
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO stages (pdbid, stage, status, started) '
+                              'VALUES (?, ?, ?, ?)', (pdbid, stage, 'running', time.time()))
+
+    def finish_stage(self, attrs, stage, status, metrics=None):
+        """Stores the outcome of a stage together with the
+        updated config attrs, in one transaction.
+
+        :param attrs: dict of config attrs
+        :param stage: str, task name
+        :param status: str, e.g. 'finished', 'failed'
+        :param metrics: dict or None
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO entries (pdbid, attrs, updated) VALUES (?, ?, ?)',
+                              (attrs['pdbid'], json.dumps(attrs), now))
+            self.conn.execute('UPDATE stages SET status = ?, finished = ?, metrics = ? WHERE pdbid = ? AND stage = ?',
+                              (status, now, json.dumps(metrics), attrs['pdbid'], stage))
+
+    def get_stage_status(self, pdbid):
+        """Returns dict {stage: status} of an entry"""
+        rows = self.conn.execute('SELECT stage, status FROM stages WHERE pdbid = ?', (pdbid,))
+        return dict(rows.fetchall())
+
+    def progress(self):
+        """Returns batch progress as {stage: {status: count}}"""
+        rows = self.conn.execute('SELECT stage, status, COUNT(*) FROM stages GROUP BY stage, status')
+        progress = {}
+        for stage, status, count in rows:
+            progress.setdefault(stage, {})[status] = count
+        return progress
+
+    def unfinished(self, stages):
+        """Returns pdbids of entries that have not finished
+        all of the given stages.
+
+        :param stages: list of task names
+
+        :returns: list of str
+        """
+        marks = ','.join('?' * len(stages))
+        rows = self.conn.execute(f"""SELECT e.pdbid FROM entries e
+                                     LEFT JOIN stages s ON s.pdbid = e.pdbid
+                                         AND s.status = 'finished' AND s.stage IN ({marks})
+                                     GROUP BY e.pdbid HAVING COUNT(s.stage) < ?
+                                     ORDER BY e.pdbid""", (*stages, len(stages)))
+        return [row[0] for row in rows]
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] statedb {import,export,progress,unfinished,resume} ...")
+    parser.add_argument("statedb", help="path to SQLite state database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    importparser = subparsers.add_parser("import", help="import config.txt files")
+    importparser.add_argument("configfiles", nargs='+')
+    exportparser = subparsers.add_parser("export", help="export an entry to a config.txt file")
+    exportparser.add_argument("pdbid")
+    exportparser.add_argument("configfile")
+    subparsers.add_parser("progress", help="print number of entries per stage and status")
+    unfinishedparser = subparsers.add_parser("unfinished", help="print entries with unfinished tasks")
+    unfinishedparser.add_argument("taskname", nargs='*')
+    resumeparser = subparsers.add_parser("resume", help="run unfinished tasks of all entries")
+    resumeparser.add_argument("pathfile")
+    resumeparser.add_argument("taskname", nargs='*')
+    args = parser.parse_args()
+
+    store = StateStore(Path(args.statedb))
+    if args.command == 'import':
+        for configfile in args.configfiles:
+            print(f'Imported {store.import_config(Path(configfile))}')
+    elif args.command == 'export':
+        store.export_config(args.pdbid, Path(args.configfile))
+    elif args.command == 'progress':
+        for stage, statuses in store.progress().items():
+            print(f'{stage:20s} ' + '  '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+    elif args.command == 'unfinished':
+        from run_workflow import TASKNAMES
+        print('\n'.join(store.unfinished(args.taskname or TASKNAMES[1:])))
+    elif args.command == 'resume':
+        from run_workflow import TASKNAMES, resume_unfinished
+        store.close()
+        resume_unfinished(Path(args.statedb), Path(args.pathfile), args.taskname or TASKNAMES[1:])
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+structure_benchmark.py
+
+Benchmarks dimer DCA scores against local PDB structures:
+inter-chain residue contacts are computed from a PDB or mmCIF file
+and each *_scores.dat (or .bin) file is scored as the top-K precision
+of its inter-chain pairs.
+
+Score indices are columns of the trimmed joint alignment, translated
+with its column map (scores_io.py) if the alignment dir is given, else
+taken as positions of refseq1 followed by refseq2. Column maps with
+PDB residue numbers filled in are kept in the cache directory, the
+pipeline's column maps are only read. Refseq positions
+are mapped onto the residues observed in the structure with difflib.
+Pairs with a residue not in the structure are skipped.
+
+Contacts: minimum heavy atom distance below a cutoff (default 8 A),
+found with a KD-tree (scipy.spatial.cKDTree). Contact maps are cached
+per entry and chain pair as .npz files in a cache directory.
+
+Structure files are looked up in the structure directory as
+{pdbid}.cif, {pdbid}.pdb, pdb{pdbid}.ent (optionally .gz).
+Score file names follow Joint_{pdbid}_{chain1}_{pdbid}_{chain2}_aln_*_scores.*
+
+    python3 structure_benchmark.py scoresdir refseqdir structdir [--cachedir DIR]
+        [--alndir DIR] [--workers N] [--topk 5 10 20] [--cutoff 8.0] [--out results.tsv]
+"""
+
+import os
+import re
+import gzip
+import shlex
+import difflib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from io_utils import does_target_exist, fa_todict
+from scores_io import readin_scores, translate_scores, make_colmap, get_colmap_path, readin_colmap, writeout_colmap
+
+THREE_TO_ONE = {'ALA': 'A', 'ARG': 'R', 'ASN': 'N', 'ASP': 'D', 'CYS': 'C',
+                'GLN': 'Q', 'GLU': 'E', 'GLY': 'G', 'HIS': 'H', 'ILE': 'I',
+                'LEU': 'L', 'LYS': 'K', 'MET': 'M', 'PHE': 'F', 'PRO': 'P',
+                'SER': 'S', 'THR': 'T', 'TRP': 'W', 'TYR': 'Y', 'VAL': 'V',
+                'MSE': 'M', 'SEC': 'U', 'PYL': 'O'}
+
+SCOREFILE_REGEX = re.compile(r'Joint_(\w{4})_([^_]+)_(\w{4})_([^_]+)_aln')
+STRUCTURE_FORMATS = ('{}.cif', '{}.pdb', 'pdb{}.ent')
+TOPKS = (5, 10, 20)
+
+
+def open_text(path):
+    """Opens a text file, gzipped if it ends with .gz"""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt')
+    return open(path, 'r')
+
+
+def find_structure_file(pdbid, structpath):
+    """Returns path of the structure file of pdbid in structpath"""
+    for fmt in STRUCTURE_FORMATS:
+        for name in (fmt.format(pdbid.lower()), fmt.format(pdbid.upper())):
+            for suffix in ('', '.gz'):
+                path = structpath / f'{name}{suffix}'
+                if does_target_exist(path, 'file'):
+                    return path
+    raise FileNotFoundError(f'No structure file for {pdbid} in {structpath}.')
+
+
+def read_pdb_atoms(pdbfile):
+    """Yields (chain, resnum, resname, element, x, y, z, altloc)
+    of the atoms of the first model of a PDB file."""
+    with open_text(pdbfile) as f:
+        for line in f:
+            record = line[:6]
+            if record == 'ENDMDL':
+                break
+            if record not in ('ATOM  ', 'HETATM'):
+                continue
+            element = line[76:78].strip() or line[12:14].strip().lstrip('0123456789')
+            yield (line[21], line[22:27].strip(), line[17:20].strip(), element,
+                   float(line[30:38]), float(line[38:46]), float(line[46:54]), line[16].strip())
+
+
+def read_cif_atoms(ciffile):
+    """Yields (chain, resnum, resname, element, x, y, z, altloc)
+    of the atoms of the first model of an mmCIF file (_atom_site loop,
+    author chain ids and residue numbers)."""
+    columns = []
+    model = None
+    with open_text(ciffile) as f:
+        for line in f:
+            if line.startswith('_atom_site.'):
+                columns.append(line.split('.', 1)[1].strip())
+                continue
+            if not columns:
+                continue
+            if line.startswith(('#', 'loop_', '_')):
+                if model is not None:
+                    break
+                continue
+            values = shlex.split(line) if ('"' in line or "'" in line) else line.split()
+            if len(values) != len(columns):
+                continue
+            atom = dict(zip(columns, values))
+            if model is None:
+                model = atom.get('pdbx_PDB_model_num')
+            elif atom.get('pdbx_PDB_model_num') != model:
+                break
+            icode = atom.get('pdbx_PDB_ins_code', '?')
+            resnum = atom['auth_seq_id'] + ('' if icode in ('?', '.') else icode)
+            altloc = atom.get('label_alt_id', '.')
+            yield (atom['auth_asym_id'], resnum, atom['auth_comp_id'], atom['type_symbol'],
+                   float(atom['Cartn_x']), float(atom['Cartn_y']), float(atom['Cartn_z']),
+                   '' if altloc in ('?', '.') else altloc)
+
+
+def read_structure_chains(structfile, chains):
+    """Reads heavy atoms of amino acid residues of given chains.
+
+    :param structfile: pathlib.PosixPath, PDB or mmCIF file (.gz allowed)
+    :param chains: list of chain ids
+
+    :returns: dict {chain: (coords (N,3) float array, residue index per atom
+        (N,) int array, list of residue numbers, one-letter seq)}
+    """
+    ciffile = '.cif' in structfile.suffixes
+    atoms = read_cif_atoms(structfile) if ciffile else read_pdb_atoms(structfile)
+    parsed = {chain: ([], [], [], []) for chain in chains}
+    for chain, resnum, resname, element, x, y, z, altloc in atoms:
+        if chain not in parsed or resname not in THREE_TO_ONE:
+            continue
+        if element in ('H', 'D') or altloc not in ('', 'A', '1'):
+            continue
+        coords, resindex, resnums, seq = parsed[chain]
+        if not resnums or resnums[-1] != resnum:
+            resnums.append(resnum)
+            seq.append(THREE_TO_ONE[resname])
+        coords.append((x, y, z))
+        resindex.append(len(resnums) - 1)
+    structure = {}
+    for chain, (coords, resindex, resnums, seq) in parsed.items():
+        if not resnums:
+            raise ValueError(f'No residues of chain {chain} in {structfile}.')
+        structure[chain] = (np.array(coords, dtype=np.float64).reshape(-1, 3),
+                            np.array(resindex, dtype=np.int64), resnums, ''.join(seq))
+    return structure
+
+
+def compute_contacts(coords1, resindex1, coords2, resindex2, cutoff=8.0):
+    """Returns residue pairs with a heavy atom distance below cutoff.
+
+    :param coords: numpy.ndarray (N,3), atoms of chain 1 or 2
+    :param resindex: numpy.ndarray (N,), residue index of each atom
+
+    :returns: numpy.ndarray (M,2) of int32, unique (res1, res2) pairs
+    """
+    from scipy.spatial import cKDTree
+
+    tree1 = cKDTree(coords1)
+    tree2 = cKDTree(coords2)
+    atompairs = tree1.sparse_distance_matrix(tree2, cutoff, output_type='ndarray')
+    respairs = np.stack([resindex1[atompairs['i']], resindex2[atompairs['j']]], axis=1)
+    return np.unique(respairs, axis=0).astype(np.int32).reshape(-1, 2)
+
+
+def get_contact_map(structfile, chain1, chain2, cachedir=None, cutoff=8.0):
+    """Returns inter-chain contacts of a structure, cached in cachedir.
+
+    :returns: dict with 'contacts' (M,2) residue index pairs,
+        'resnums1', 'resnums2' (residue numbers) and 'seq1', 'seq2'
+    """
+    cachefile = None
+    if cachedir is not None:
+        cachefile = cachedir / f'{structfile.name.split(".")[0]}_{chain1}_{chain2}_contacts_{cutoff:g}.npz'
+        if does_target_exist(cachefile, 'file') and cachefile.stat().st_mtime >= structfile.stat().st_mtime:
+            with np.load(cachefile) as cached:
+                return {'contacts': cached['contacts'],
+                        'resnums1': list(cached['resnums1']), 'resnums2': list(cached['resnums2']),
+                        'seq1': str(cached['seq1']), 'seq2': str(cached['seq2'])}
+
+    structure = read_structure_chains(structfile, [chain1, chain2])
+    coords1, resindex1, resnums1, seq1 = structure[chain1]
+    coords2, resindex2, resnums2, seq2 = structure[chain2]
+    contactmap = {'contacts': compute_contacts(coords1, resindex1, coords2, resindex2, cutoff),
+                  'resnums1': resnums1, 'resnums2': resnums2, 'seq1': seq1, 'seq2': seq2}
+    if cachefile is not None:
+        tmpfile = cachefile.with_name(f'{cachefile.stem}.{os.getpid()}.tmp.npz')
+        np.savez_compressed(tmpfile, contacts=contactmap['contacts'], resnums1=np.array(resnums1),
+                            resnums2=np.array(resnums2), seq1=np.array(seq1), seq2=np.array(seq2))
+        tmpfile.replace(cachefile)
+    return contactmap
+
+
+def map_seq_to_structure(refseq, structseq):
+    """Maps refseq positions onto structure residues with difflib:
+    identical stretches and same-length substituted stretches.
+
+    :returns: numpy.ndarray (len(refseq),) of residue indices, -1 if unmapped
+    """
+    mapping = np.full(len(refseq), -1, dtype=np.int64)
+    matcher = difflib.SequenceMatcher(None, refseq, structseq, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal' or (tag == 'replace' and i2 - i1 == j2 - j1):
+            mapping[i1:i2] = np.arange(j1, j2)
+    return mapping
+
+
+def parse_scorefile_name(scorefile):
+    """Returns (pdbid, chain1, chain2) from a scores file name"""
+    match = SCOREFILE_REGEX.search(scorefile.name)
+    if match is None:
+        raise ValueError(f'Cannot parse pdbid and chains from {scorefile.name}.')
+    pdbid1, chain1, pdbid2, chain2 = match.groups()
+    if pdbid1.lower() != pdbid2.lower():
+        raise ValueError(f'Chains of different entries in {scorefile.name}.')
+    return pdbid1.lower(), chain1, chain2
+
+
+def get_colmap(jointstem, alnpath, refseq1, refseq2):
+    """Returns the column map of the joint alignment and its path
+    if it is found in alnpath, else the refseq1 + refseq2 layout
+    and None."""
+    if alnpath is not None:
+        colmappath = get_colmap_path(alnpath / f'{jointstem}.fasta')
+        if does_target_exist(colmappath, 'file'):
+            return readin_colmap(colmappath), colmappath
+    return make_colmap([refseq1, refseq2]), None
+
+
+def get_filled_colmap(colmappath, cachedir, refmaps, resnums):
+    """Returns the column map at colmappath with PDB residue
+    numbers filled in. The filled map is cached in cachedir
+    (if given) and reused while it is not older than the map."""
+    cachefile = None
+    if cachedir is not None:
+        cachefile = cachedir / colmappath.name
+        if does_target_exist(cachefile, 'file') and cachefile.stat().st_mtime >= colmappath.stat().st_mtime:
+            return readin_colmap(cachefile)
+
+    colmap = fill_colmap_resnums(readin_colmap(colmappath), refmaps, resnums)
+    if cachefile is not None:
+        tmpfile = cachefile.with_name(f'{cachefile.stem}.{os.getpid()}.tmp.npy')
+        writeout_colmap(colmap, tmpfile)
+        tmpfile.replace(cachefile)
+    return colmap
+
+
+def fill_colmap_resnums(colmap, refmaps, resnums):
+    """Returns a copy of a column map with PDB residue numbers
+    (insertion codes dropped) of the mapped refseq positions.
+
+    :param colmap: numpy.ndarray, column map of the joint alignment
+    :param refmaps: list of 2 numpy.ndarrays, structure residue of each refseq position
+    :param resnums: list of 2 lists, residue numbers of the structure chains
+    """
+    colmap = np.array(colmap)
+    for chain, (refmap, chainresnums) in enumerate(zip(refmaps, resnums)):
+        numbers = np.array([int(re.match(r'-?\d+', str(resnum)).group(0)) for resnum in chainresnums] + [-1])
+        columns = (colmap['chain'] == chain) & (colmap['refpos'] >= 0) & (colmap['refpos'] < len(refmap))
+        colmap['resnum'][columns] = numbers[refmap[colmap['refpos'][columns]]]
+    return colmap
+
+
+def compute_precision(records, colmap, refmap1, refmap2, contacts, numres2, topks=TOPKS):
+    """Top-K precision of inter-chain pairs.
+
+    :param records: numpy.ndarray with fields 'i', 'j', 'score', best first
+    :param colmap: numpy.ndarray, column map of the joint alignment
+    :param refmap: numpy.ndarray, structure residue of each refseq position
+    :param contacts: numpy.ndarray (M,2) of contacting residue indices
+
+    :returns: dict {'P@K': float or None, 'numpairs': int}
+    """
+    inrange = (records['i'] < len(colmap)) & (records['j'] < len(colmap))
+    mapped = translate_scores(records[inrange], colmap)
+    inter = (mapped['chain_i'] != mapped['chain_j']) & (mapped['refpos_i'] >= 0) & (mapped['refpos_j'] >= 0)
+    mapped = mapped[inter]
+    swap = mapped['chain_i'] == 1
+    refpos1 = np.where(swap, mapped['refpos_j'], mapped['refpos_i'])
+    refpos2 = np.where(swap, mapped['refpos_i'], mapped['refpos_j'])
+    valid = (refpos1 < len(refmap1)) & (refpos2 < len(refmap2))
+    res1 = refmap1[refpos1[valid]]
+    res2 = refmap2[refpos2[valid]]
+    observed = (res1 >= 0) & (res2 >= 0)
+    res1, res2 = res1[observed], res2[observed]
+
+    contactkeys = contacts[:, 0].astype(np.int64) * numres2 + contacts[:, 1]
+    hits = np.isin(res1 * numres2 + res2, contactkeys)
+    result = {'numpairs': int(len(res1))}
+    for topk in topks:
+        result[f'P@{topk}'] = float(hits[:topk].mean()) if len(hits) >= topk else None
+    return result
+
+
+def benchmark_scorefile(scorefile, refseqpath, structpath, cachedir=None, topks=TOPKS, cutoff=8.0, alnpath=None):
+    """Scores one DCA scores file against its structure.
+    Score indices are translated with the column map of the joint
+    alignment if alnpath (dir of joint alignments) is given; its
+    PDB residue numbers are filled in and cached in cachedir.
+
+    :returns: dict of results, 'status' is 'finished' or the error
+    """
+    result = {'scorefile': scorefile.name, 'pdbid': None, 'chain1': None, 'chain2': None, 'status': 'finished'}
+    try:
+        pdbid, chain1, chain2 = parse_scorefile_name(scorefile)
+        result.update({'pdbid': pdbid, 'chain1': chain1, 'chain2': chain2})
+        refseq1 = next(iter(fa_todict(refseqpath / f'{pdbid}_{chain1}_refseq.fasta').values()))
+        refseq2 = next(iter(fa_todict(refseqpath / f'{pdbid}_{chain2}_refseq.fasta').values()))
+        contactmap = get_contact_map(find_structure_file(pdbid, structpath), chain1, chain2, cachedir, cutoff)
+        refmap1 = map_seq_to_structure(refseq1, contactmap['seq1'])
+        refmap2 = map_seq_to_structure(refseq2, contactmap['seq2'])
+        colmap, colmappath = get_colmap(SCOREFILE_REGEX.search(scorefile.name).group(0), alnpath, refseq1, refseq2)
+        if colmappath is not None and (colmap['resnum'] < 0).all():
+            colmap = get_filled_colmap(colmappath, cachedir, [refmap1, refmap2],
+                                       [contactmap['resnums1'], contactmap['resnums2']])
+        result['numcontacts'] = int(len(contactmap['contacts']))
+        result.update(compute_precision(readin_scores(scorefile), colmap, refmap1, refmap2,
+                                        contactmap['contacts'], len(contactmap['resnums2']), topks))
+    except (FileNotFoundError, ValueError, KeyError) as err:
+        result['status'] = str(err)
+    return result
+
+
+def benchmark_scorefiles(scorefiles, refseqpath, structpath, cachedir=None, topks=TOPKS, cutoff=8.0, workers=None,
+                         alnpath=None):
+    """Scores many scores files on a process pool.
+
+    :returns: list of result dicts, in order of scorefiles
+    """
+    if cachedir is not None:
+        cachedir.mkdir(parents=True, exist_ok=True)
+    numfiles = len(scorefiles)
+    args = ([refseqpath] * numfiles, [structpath] * numfiles, [cachedir] * numfiles,
+            [topks] * numfiles, [cutoff] * numfiles, [alnpath] * numfiles)
+    if workers == 1:
+        return list(map(benchmark_scorefile, scorefiles, *args))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(benchmark_scorefile, scorefiles, *args, chunksize=8))
+
+
+def writeout_results(results, outpath, topks=TOPKS):
+    """Writes benchmark results as tab-separated table"""
+    fields = ['scorefile', 'pdbid', 'chain1', 'chain2', 'numcontacts', 'numpairs'] + \
+             [f'P@{topk}' for topk in topks] + ['status']
+    with open(outpath, 'w') as f:
+        f.write('\t'.join(fields) + '\n')
+        for result in results:
+            f.write('\t'.join(str(result.get(field)) for field in fields) + '\n')
+
+
+if __name__=="__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(usage="python3 %(prog)s [-h] scoresdir refseqdir structdir [--cachedir DIR] [--alndir DIR] [--workers N] [--topk K ...] [--cutoff A] [--out TSV]")
+    parser.add_argument("scoresdir", help="dir with *_scores.dat or *_scores.bin files")
+    parser.add_argument("refseqdir", help="dir with {pdbid}_{chain}_refseq.fasta files")
+    parser.add_argument("structdir", help="dir with PDB/mmCIF files")
+    parser.add_argument("--cachedir", help="dir for cached contact maps")
+    parser.add_argument("--alndir", help="dir of joint alignments and their column maps")
+    parser.add_argument("--workers", type=int, help="number of processes (default: all cores)")
+    parser.add_argument("--topk", type=int, nargs='+', default=list(TOPKS), help="K of top-K precision")
+    parser.add_argument("--cutoff", type=float, default=8.0, help="heavy atom contact distance in A")
+    parser.add_argument("--out", default='benchmark_results.tsv', help="tab-separated results per scores file")
+    args = parser.parse_args()
+
+    scorefiles = sorted(Path(args.scoresdir).glob('Joint_*_scores.*'))
+    cachedir = Path(args.cachedir) if args.cachedir else None
+    results = benchmark_scorefiles(scorefiles, Path(args.refseqdir), Path(args.structdir), cachedir,
+                                   tuple(args.topk), args.cutoff, args.workers,
+                                   Path(args.alndir) if args.alndir else None)
+    writeout_results(results, Path(args.out), tuple(args.topk))
+    print(f'Benchmark of {len(results)} scores files written into {args.out}')
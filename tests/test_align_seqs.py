@@ -2,6 +2,7 @@
 """
 Tests for align_seqs.py
 """
+import os
 import sys
 from pathlib import Path
 import pytest
@@ -9,6 +10,8 @@ import pytest
 sys.path.append("../scripts")
 
 from align_seqs import *
+from io_utils import fa_todict
+from resource_scheduler import BUDGET
 
 def test_add_refseq():
     pass  # how to test i/o streams?
@@ -34,3 +37,55 @@ def test_run_muscle_aln_exists():
     res = Path('../testdata/1c0f_A_refseq_phmmer_matched.aln')
     assert(run_muscle(fafilepath, refseqpath, phmmerpath, False)==res)
 
+
+def make_fake_muscle(tmp_path, monkeypatch, killed='True'):
+    # fake muscle: needs 200 MB for more than 3 seqs if killed (a condition on infile), else copies its input
+    fakebin = tmp_path / 'bin'
+    fakebin.mkdir()
+    (fakebin / 'muscle').write_text(f'#!{sys.executable}\n'
+        'import sys, time, shutil\n'
+        'infile, outfile = sys.argv[2], sys.argv[4]\n'
+        f'if open(infile).read().count(">") > 3 and {killed}:\n'
+        '    x = bytearray(200 * 2**20); time.sleep(10)\n'
+        'shutil.copy(infile, outfile)\n')
+    (fakebin / 'muscle').chmod(0o755)
+    monkeypatch.setenv('PATH', f'{fakebin}:{os.environ["PATH"]}')
+    monkeypatch.setitem(BUDGET, 'schedfile', tmp_path / 'sched.json')
+
+def test_align_guarded_memlimit(tmp_path, monkeypatch):
+    make_fake_muscle(tmp_path, monkeypatch)
+    fastafile = tmp_path / 'x1.fasta'
+    refseqfile = tmp_path / 'ref.fasta'
+    fastafile.write_text('>a_HUMAN\nAAAAAA\n>b_MOUSE\nCC\n>c_YEAST\nDDD\n>d_RAT\nEEEE\n')
+    refseqfile.write_text('>ref\nAAA\n')
+    alnfile, = align_guarded([fastafile], [refseqfile], tmp_path, False, memlimit_mb=100, dropfraction=0.25)
+    assert(alnfile == tmp_path / 'x1_reduced.aln')
+    assert([header.split()[0] for header in fa_todict(alnfile)] == ['b_MOUSE', 'c_YEAST', 'rfseq|ref|_RFSEQ'])
+    assert(len(fa_todict(fastafile)) == 4)
+    assert((tmp_path / 'x1.dropped').read_text().split('\n')[:2] == ['HUMAN\t6\tmuscle memory limit 100 MB',
+                                                                   'RAT\t4\tmuscle memory limit 100 MB'])
+    fastafile.write_text('>a_HUMAN\nAAAAAA\n>b_MOUSE\nCC\n>c_YEAST\nDDD\n')
+    with pytest.raises(MemoryError):
+        align_guarded([fastafile], [refseqfile], tmp_path, True, memlimit_mb=100, maxretries=0)
+
+def test_align_guarded_memlimit_partner(tmp_path, monkeypatch):
+    # chain 1 aligns, chain 2 hits the limit afterwards
+    make_fake_muscle(tmp_path, monkeypatch, killed='"x2" in infile')
+    fastafiles = [tmp_path / 'x1.fasta', tmp_path / 'x2.fasta']
+    refseqfile = tmp_path / 'ref.fasta'
+    fastafiles[0].write_text('>a_HUMAN\nAAAAAA\n>b_MOUSE\nCC\n>c_YEAST\nD\n>d_RAT\nE\n')
+    fastafiles[1].write_text('>e_HUMAN\nA\n>f_MOUSE\nCA\n>g_YEAST\nDDD\n>h_RAT\nEEEEEEEE\n')
+    refseqfile.write_text('>ref\nAAA\n')
+    alnfiles = align_guarded(fastafiles, [refseqfile] * 2, tmp_path, False, memlimit_mb=100, dropfraction=0.25)
+    assert(alnfiles == [tmp_path / 'x1_reduced.aln', tmp_path / 'x2_reduced.aln'])
+    orgs = [[header.split()[0].split('_')[-1] for header in fa_todict(alnfile)] for alnfile in alnfiles]
+    assert(orgs[0] == orgs[1] == ['MOUSE', 'YEAST', 'RFSEQ'])
+    assert([len(fa_todict(fastafile)) for fastafile in fastafiles] == [4, 4])
+    for fastafile in fastafiles:
+        assert([line.split('\t')[0] for line in fastafile.with_suffix('.dropped').read_text().splitlines()] == ['RAT', 'HUMAN'])
+    assert(align_guarded(fastafiles, [refseqfile] * 2, tmp_path, False, memlimit_mb=100) == alnfiles)
+
+def test_get_muscle_memlimit_mb(monkeypatch):
+    monkeypatch.setitem(BUDGET, 'memory_mb', 64000)
+    assert(get_muscle_memlimit_mb() == 64000)
+    assert(get_muscle_memlimit_mb(32000) == 32000)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for approx_dca.py
+"""
+import sys
+from pathlib import Path
+import pytest
+import numpy as np
+
+sys.path.append("../scripts")
+
+from approx_dca import *
+from dca_cache import onehot_nogap
+
+def random_msa(numseqs=40, seqlen=6, seed=1):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, NUM_STATES, size=(numseqs, seqlen)).astype(np.int8)
+
+def test_get_alignment_length():
+    alnpath = Path('../testdata/Joint_1c0f_A_1c0f_S_aln.fasta')
+    firstseq = next(iter(fa_todict(alnpath).values()))
+    assert(get_alignment_length(alnpath) == len(firstseq))
+
+def test_lowrank_factors_match_dense_inverse():
+    msa = random_msa()
+    weights = np.ones(msa.shape[0])
+    shrinkage = 0.4
+    dinv, vmat, mmat = lowrank_factors(msa, weights, shrinkage)
+
+    onehot = onehot_nogap(msa)
+    fi = onehot.mean(axis=0)
+    xc = onehot - fi
+    dense = np.diag(1.0 / dinv) + (1.0 - shrinkage) * xc.T @ xc / msa.shape[0]
+    woodbury = np.diag(dinv) - vmat @ mmat @ vmat.T
+    assert(np.allclose(woodbury, np.linalg.inv(dense)))
+
+def test_lowrank_factors_valerr():
+    with pytest.raises(ValueError):
+        lowrank_factors(random_msa(), np.ones(40), 1.0)
+
+def test_lowrank_fn_apc_chunks():
+    msa = random_msa(seqlen=9)
+    weights = np.ones(msa.shape[0])
+    assert(np.allclose(lowrank_fn_apc(msa, weights, chunksize=2),
+                       lowrank_fn_apc(msa, weights, chunksize=32)))
+
+def test_top_pair_agreement():
+    list1 = [((0, 1), 3.0), ((2, 3), 2.0), ((4, 5), 1.0)]
+    list2 = [((2, 3), 5.0), ((0, 4), 2.0), ((0, 1), 1.0)]
+    assert(top_pair_agreement(list1, list2, 2) == 0.5)
+    assert(top_pair_agreement(list1, list2, 3) == pytest.approx(2 / 3))
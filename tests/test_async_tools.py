@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for async_tools.py
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from async_tools import *
+
+def test_run_tool_stdoutpath(tmp_path):
+    result = run_tool(['sh', '-c', 'echo out; echo err >&2'], stdoutpath=tmp_path / 'out.txt')
+    assert(result.returncode == 0 and not result.timedout)
+    assert(result.stdout is None)
+    assert(result.stderr == 'err\n')
+    assert((tmp_path / 'out.txt').read_text() == 'out\n')
+
+def test_run_tool_capture():
+    result = run_tool(['sh', '-c', 'echo out; exit 3'], capture=True)
+    assert(result.returncode == 3)
+    assert(result.stdout == b'out\n')
+
+def test_run_tool_timeout():
+    result = run_tool(['sleep', '10'], timeout=0.2)
+    assert(result.timedout)
+    assert(result.runtime < 5)
+
+def test_run_tool_missing():
+    with pytest.raises(FileNotFoundError):
+        run_tool(['/nonexistent/esl-sfetch'])
+
+def test_run_tool_batch_order(tmp_path):
+    cmdlist = [['sh', '-c', f'sleep 0.{3 - n}; echo {n}; [ {n} != 1 ] || echo missing >&2 && [ {n} != 1 ]']
+               for n in range(4)]
+    results = run_tool_batch(cmdlist, tmp_path / 'out.txt', maxjobs=4)
+    assert((tmp_path / 'out.txt').read_text() == '0\n1\n2\n3\n')
+    assert([result.returncode != 0 for result in results] == [False, True, False, False])
+    assert(results[1].stderr == 'missing\n')
+
+def test_run_tool_batch_window(tmp_path):
+    logpath = tmp_path / 'log.txt'
+    cmdlist = [['sh', '-c', f'echo s{n} >> {logpath}; sleep 0.{4 - n}; echo {n}; echo e{n} >> {logpath}']
+               for n in range(4)]
+    run_tool_batch(cmdlist, tmp_path / 'out.txt', maxjobs=2)
+    log = logpath.read_text().split()
+    assert((tmp_path / 'out.txt').read_text() == '0\n1\n2\n3\n')
+    assert(log.index('s2') > log.index('e0') and log.index('s3') > log.index('e1'))
+
+def test_run_tool_memlimit():
+    cmdargs = [sys.executable, '-c', 'import time; x = bytearray(200 * 2**20); time.sleep(10)']
+    result = run_tool(cmdargs, memlimit_mb=100)
+    assert(result.memkilled and result.returncode != 0)
+    assert(result.peakrss_mb >= 100)
+    assert(result.runtime < 5)
+    result = run_tool(['sh', '-c', 'sleep 0.3'], memlimit_mb=100)
+    assert(not result.memkilled and result.returncode == 0)
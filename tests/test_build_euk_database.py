@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for build_euk_database.py
+"""
+import sys
+import json
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from build_euk_database import *
+from io_utils import fa_todict
+
+SPECLIST = """Code  Taxon    N=Official (scientific) name
+_____ _ _______  ____________________________________________________________
+HUMAN E    9606: N=Homo sapiens
+                 C=Human
+ECOLI B     562: N=Escherichia coli
+YEAST E  559292: N=Saccharomyces cerevisiae (strain ATCC 204508 / S288c)
+HV1H2 V   11706: N=Human immunodeficiency virus type 1 group M subtype B
+"""
+
+SOURCE = """>sp|P00001|A_HUMAN Protein A OS=Homo sapiens OX=9606 GN=A
+MKVL
+AAGG
+>sp|P00002|B_ECOLI Protein B OS=Escherichia coli OX=562
+MKKK
+>tr|Q00003|Q00003_YEAST Protein C
+MSSS
+>tr|Q00004|Q00004_9EUKA Protein D OS=Unknown OX=9606
+MTTT
+>tr|Q00005|Q00005_HV1H2 Protein E
+MVVV
+"""
+
+def test_readin_speclist(tmp_path):
+    speclist = tmp_path / 'speclist.txt'
+    speclist.write_text(SPECLIST)
+    orgtags, taxids = readin_speclist(speclist)
+    assert(orgtags == {'HUMAN', 'YEAST'})
+    assert(taxids == {'9606', '559292'})
+
+def test_is_eukaryotic():
+    orgtags, taxids = {'HUMAN'}, {'9606'}
+    assert(is_eukaryotic('sp|P1|A_ECOLI OX=9606', orgtags, taxids))
+    assert(not is_eukaryotic('sp|P1|A_HUMAN OX=562', orgtags, taxids))
+    assert(is_eukaryotic('sp|P1|A_HUMAN desc', orgtags, taxids))
+    assert(is_eukaryotic('sp|P1|A_HUMAN OX=562', orgtags, set()))
+
+def test_filter_database(tmp_path):
+    speclist = tmp_path / 'speclist.txt'
+    speclist.write_text(SPECLIST)
+    source = tmp_path / 'source.fasta'
+    source.write_text(SOURCE)
+    orgtags, taxids = readin_speclist(speclist)
+    kept, dropped = filter_database(source, tmp_path / 'euk.fasta', orgtags, taxids)
+    assert((kept, dropped) == (3, 2))
+    eukdb = fa_todict(tmp_path / 'euk.fasta')
+    assert([header.split()[0] for header in eukdb] == ['sp|P00001|A_HUMAN', 'tr|Q00003|Q00003_YEAST', 'tr|Q00004|Q00004_9EUKA'])
+    assert(list(eukdb.values())[0] == 'MKVLAAGG')
+    with pytest.raises(ValueError):
+        filter_database(source, tmp_path / 'euk.fasta', set(), set())
+
+def test_build_euk_database(tmp_path):
+    source = tmp_path / 'source.fasta'
+    source.write_text(SOURCE)
+    easelpath = Path('../benchmarks/fakebin').resolve()
+    outpath = build_euk_database(source, tmp_path / 'euk.fasta', easelpath, {'HUMAN'}, set())
+    with open(tmp_path / 'euk.fasta.ssi', 'r') as f:
+        assert(list(json.load(f)) == ['sp|P00001|A_HUMAN'])
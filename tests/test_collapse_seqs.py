@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Tests for collapse_seqs.py
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from collapse_seqs import *
+from io_utils import fa_todict
+
+def test_collapse_and_expand(tmp_path):
+    fastafile = tmp_path / 'x.fasta'
+    fastafile.write_text('>tr|A|A_HUMAN\nMKV\n>tr|B|B_MOUSE\nMKV\n>tr|C|C_RAT\nMK\n'
+                         '>tr|D|D_PANTR\nMKV\n>rfseq|x|_RFSEQ ref\nMKV\n')
+    uniquepath, dupmappath = get_collapsed_paths(fastafile)
+    assert(uniquepath == tmp_path / 'x_unique.fasta')
+    assert(collapse_duplicates(fastafile, uniquepath, dupmappath) == 2)
+    assert(fa_todict(uniquepath) == {'tr|A|A_HUMAN': 'MKV', 'tr|C|C_RAT': 'MK'})
+    assert(readin_dupmap(dupmappath) == {'tr|A|A_HUMAN': ['tr|B|B_MOUSE', 'tr|D|D_PANTR']})
+
+    alnfile = tmp_path / 'x_unique.aln'
+    alnfile.write_text('>rfseq|x|_RFSEQ ref\nMKV\n>tr|C|C_RAT\nMK-\n>tr|A|A_HUMAN\nMKV\n')
+    expanded = fa_todict(expand_alignment(alnfile, dupmappath, tmp_path / 'x.aln'))
+    assert(list(expanded) == ['rfseq|x|_RFSEQ ref', 'tr|C|C_RAT', 'tr|A|A_HUMAN', 'tr|B|B_MOUSE', 'tr|D|D_PANTR'])
+    assert(expanded['tr|D|D_PANTR'] == 'MKV')
+
+def test_collapse_fnotfound(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        collapse_duplicates(tmp_path / 'x.fasta', tmp_path / 'y.fasta', tmp_path / 'x.dupmap')
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for dca_cache.py
+"""
+import sys
+import random
+from pathlib import Path
+import pytest
+import numpy as np
+
+sys.path.append("../scripts")
+
+from dca_cache import *
+
+def write_coupled_aln(alnpath, numseqs=200, seqlen=12, seed=3):
+    """Random alignment in which columns 2 and 9 covary"""
+    rng = random.Random(seed)
+    pairs = [('A', 'K'), ('D', 'R'), ('L', 'V'), ('W', 'G')]
+    with open(alnpath, 'w') as f:
+        for n in range(numseqs):
+            seq = [rng.choice('ACDEFGHIKLMNPQRSTVWY-') for _ in range(seqlen)]
+            seq[2], seq[9] = rng.choice(pairs)
+            f.write(f'>tr|SEQ{n}|SEQ{n}_ORG{n}\n{"".join(seq)}\n')
+
+def test_encode_alignment():
+    msa = encode_alignment(['AC-', 'YXw'])
+    assert(msa.tolist() == [[0, 1, GAP_STATE], [19, GAP_STATE, 18]])
+
+def test_encode_alignment_valerr():
+    with pytest.raises(ValueError):
+        encode_alignment(['AC', 'A'])
+
+def test_compute_weights():
+    msa = encode_alignment(['AAAAA', 'AAAAC', 'CCCCC'])
+    weights = compute_weights(msa, 0.8)
+    assert(weights.tolist() == [1.0, 1.0, 1.0])
+    weights = compute_weights(msa, 0.7)
+    assert(weights.tolist() == [0.5, 0.5, 1.0])
+
+def test_remove_duplicate_seqs():
+    msa = encode_alignment(['AAAAC', 'CCCCC', 'AAAAC', 'AAAAA'])
+    assert(remove_duplicate_seqs(msa).tolist() == encode_alignment(['AAAAC', 'CCCCC', 'AAAAA']).tolist())
+
+def test_zero_sum_frobenius_norms():
+    blocks = np.random.default_rng(1).random((1, NUM_STATES - 1, 1, NUM_STATES - 1))
+    shifted = blocks[0, :, 0, :] - blocks[0, :, 0, :].mean(axis=1, keepdims=True) \
+              - blocks[0, :, 0, :].mean(axis=0, keepdims=True) + blocks.mean()
+    assert(np.isclose(zero_sum_frobenius_norms(blocks)[0, 0], np.sqrt(np.square(shifted).sum())))
+
+def test_statecache_fi_missing(tmp_path):
+    alnpath = tmp_path / 'Joint_test_aln.fasta'
+    write_coupled_aln(alnpath)
+    statecache = DCAStateCache(alnpath, tmp_path / 'cache')
+    fi, fij = statecache.get_frequencies(0.8)
+    (statecache.cachedir / 'fi_sid0.8.npy').unlink()
+    refi, refij = DCAStateCache(alnpath, tmp_path / 'cache').get_frequencies(0.8)
+    assert(np.allclose(refi, fi) and np.allclose(refij, fij))
+
+def test_apc_correct_symmetric():
+    fn = np.random.default_rng(0).random((6, 6))
+    fn = fn + fn.T
+    res = apc_correct(fn)
+    assert(np.allclose(res, res.T))
+
+def test_statecache_top_pair(tmp_path):
+    alnpath = tmp_path / 'Joint_test_aln.fasta'
+    write_coupled_aln(alnpath)
+    statecache = DCAStateCache(alnpath, tmp_path / 'cache')
+    res = statecache.compute_sorted_FN_APC(0.8, 0.5)
+    assert(res[0][0] == (2, 9))
+    assert(len(res) == 12 * 11 // 2)
+
+def test_statecache_reuses_state(tmp_path):
+    alnpath = tmp_path / 'Joint_test_aln.fasta'
+    write_coupled_aln(alnpath)
+    cachedir = tmp_path / 'cache'
+    first = DCAStateCache(alnpath, cachedir).get_fn_apc(0.8, 0.5)
+    statecache = DCAStateCache(alnpath, cachedir)
+    cached = sorted(path.name for path in statecache.cachedir.iterdir())
+    assert(cached == ['fi_sid0.8.npy', 'fij_sid0.8.npy', 'fnapc_sid0.8_pc0.5.npy',
+                      'msa.npy', 'weights_sid0.8.npy'])
+    assert(np.array_equal(statecache.get_fn_apc(0.8, 0.5), first))
+    statecache.get_fn_apc(0.8, 0.3)
+    assert((statecache.cachedir / 'fnapc_sid0.8_pc0.3.npy').is_file())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for estimate_meff.py
+"""
+import random
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from estimate_meff import *
+
+AAS = 'ACDEFGHIKLMNPQRSTVWY'
+
+def mutate(seq, identity, rng):
+    return ''.join(aa if rng.random() < identity else rng.choice(AAS.replace(aa, '')) for aa in seq)
+
+def test_compute_meff():
+    rng = random.Random(1)
+    seqs = [''.join(rng.choice(AAS) for _ in range(300)) for _ in range(5)]
+    assert(compute_meff(seqs) == pytest.approx(5))
+    close = [mutate(seqs[0], 0.95, rng) for _ in range(4)]
+    assert(compute_meff(seqs + close) == pytest.approx(5))
+    distant = [mutate(seqs[0], 0.5, rng) for _ in range(4)]
+    assert(compute_meff(seqs + distant) == pytest.approx(9))
+    assert(compute_meff([]) == 0.0)
+
+def test_check_meff(tmp_path):
+    rng = random.Random(2)
+    fastafile1 = tmp_path / 'a.fasta'
+    fastafile2 = tmp_path / 'b.fasta'
+    refseq = tmp_path / 'refseq.fasta'
+    refseq.write_text('>rfseq|x|_RFSEQ\n' + 'A' * 50 + '\n')
+    seq = ''.join(rng.choice(AAS) for _ in range(50))
+    fastafile1.write_text(''.join(f'>tr|{i}|{i}_ORG{i}\n{seq}\n' for i in range(10)))
+    fastafile2.write_text(''.join(f'>tr|{i}|{i}_ORG{i}\n{seq}\n' for i in range(10)))
+    meff, meffperlength = check_meff(fastafile1, fastafile2, refseq, refseq, 0.001)
+    assert(meff == pytest.approx(1))
+    assert(meffperlength == pytest.approx(0.01))
+    with pytest.raises(ValueError):
+        check_meff(fastafile1, fastafile2, refseq, refseq, 0.2)
+
+def test_check_joint_meff(tmp_path):
+    rng = random.Random(3)
+    jointaln = tmp_path / 'Joint_a_b_aln.fasta'
+    seqs = [''.join(rng.choice(AAS) for _ in range(100)) for _ in range(5)]
+    rows = [f'>rfseq|a|_RFSEQ||rfseq|b|_RFSEQ\n{seqs[0]}\n']
+    rows += [f'>tr|{i}|{i}_ORG{i}||tr|{i}|{i}_ORG{i}\n{seq}\n' for i, seq in enumerate(seqs * 2)]
+    jointaln.write_text(''.join(rows))
+    assert(len(get_joint_aln_seqs(jointaln)) == 10)
+    meff, meffperlength = check_joint_meff(jointaln, 0.01)
+    assert(meff == pytest.approx(5))
+    assert(meffperlength == pytest.approx(0.05))
+    with pytest.raises(ValueError):
+        check_joint_meff(jointaln, 0.1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for filter_columns.py
+"""
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.append("../scripts")
+
+from filter_columns import *
+from io_utils import fa_todict
+from run_dca import run_dca
+from scores_io import readin_scores
+
+
+def write_jointaln(jointaln_path, numseqs=40, seed=0):
+    # columns 0 and 5 fully conserved, column 3 mostly gaps
+    rng = np.random.default_rng(seed)
+    residues = np.frombuffer(b'ACDEFGHIKLMNPQRSTVWY', dtype=np.uint8)
+    msa = rng.choice(residues, size=(numseqs, 8))
+    msa[:, 0] = ord('M')
+    msa[:, 5] = ord('W')
+    msa[2:, 3] = ord('-')
+    with open(jointaln_path, 'w') as f:
+        for idx, row in enumerate(msa):
+            f.write(f'>seq{idx}_ORG{idx}\n{row.tobytes().decode()}\n')
+
+def test_compute_column_stats():
+    msa = alignment_to_array(['AC-', 'AD-', 'Ac-', 'AE.'])
+    gapfrac, entropy = compute_column_stats(msa)
+    assert(np.allclose(gapfrac, [0, 0, 1]))
+    assert(np.allclose(entropy, [0, -(0.5 * np.log(0.5) + 2 * 0.25 * np.log(0.25)), 0]))
+    assert(list(select_columns(msa)) == [1])
+    assert(list(select_columns(msa, maxgapfrac=1.0, minentropy=-1)) == [0, 1, 2])
+    with pytest.raises(ValueError):
+        alignment_to_array(['AC', 'A'])
+
+def test_filter_joint_alignment(tmp_path):
+    jointaln_path = tmp_path / 'Joint_1abc_A_1abc_B_aln.fasta'
+    write_jointaln(jointaln_path)
+    filteredpath = filter_joint_alignment(jointaln_path, 0.8, 0.0)
+    assert(is_filter_current(jointaln_path, 0.8, 0.0))
+    dcaaln_path, colidx = get_dca_alignment(jointaln_path)
+    assert(dcaaln_path == filteredpath)
+    assert(list(colidx) == [1, 2, 4, 6, 7])
+    joint = fa_todict(jointaln_path)
+    filtered = fa_todict(filteredpath)
+    assert(list(filtered) == list(joint))
+    assert(all(filtered[header] == ''.join(joint[header][col] for col in colidx) for header in joint))
+    assert(remap_scores([((0, 2), 0.5), ((3, 4), 0.1)], colidx) == [((1, 4), 0.5), ((6, 7), 0.1)])
+
+def test_get_dca_alignment_refilter(tmp_path):
+    jointaln_path = tmp_path / 'Joint_1abc_A_1abc_B_aln.fasta'
+    write_jointaln(jointaln_path)
+    dcaaln_path, colidx = get_dca_alignment(jointaln_path)
+    assert(dcaaln_path == get_filtered_paths(jointaln_path)[0] and list(colidx) == [1, 2, 4, 6, 7])
+    assert(not is_filter_current(jointaln_path, 1.0, 0.0))
+    assert(list(get_dca_alignment(jointaln_path, 1.0, 0.0)[1]) == [1, 2, 3, 4, 6, 7])
+    assert(is_filter_current(jointaln_path, 1.0, 0.0))
+    get_filtered_paths(jointaln_path)[0].unlink()
+    assert(list(get_dca_alignment(jointaln_path, 1.0, 0.0)[1]) == [1, 2, 3, 4, 6, 7])
+
+def test_run_dca_filtered(tmp_path):
+    jointaln_path = tmp_path / 'Joint_1abc_A_1abc_B_aln.fasta'
+    write_jointaln(jointaln_path)
+    filter_joint_alignment(jointaln_path, 0.8, 0.0)
+    scorefile = run_dca(jointaln_path, tmp_path, True, method='lrmfdca')
+    assert(scorefile.name == 'Joint_1abc_A_1abc_B_aln_lrmfdca_scores.dat')
+    records = readin_scores(scorefile)
+    assert(len(records) == 10)
+    assert(set(records['i']) | set(records['j']) == {1, 2, 4, 6, 7})
+
+def test_filter_joint_alignment_nocolumns(tmp_path):
+    jointaln_path = tmp_path / 'Joint_1abc_A_1abc_B_aln.fasta'
+    jointaln_path.write_text('>a_ORGA\nAC\n>b_ORGB\nAC\n')
+    assert(filter_joint_alignment(jointaln_path) is None)
+    assert(get_dca_alignment(jointaln_path) == (jointaln_path, None))
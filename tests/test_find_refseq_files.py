@@ -3,6 +3,7 @@
 Tests for find_refseq_files.py
 """
 
+import os
 import pytest
 import sys
 
@@ -47,3 +48,16 @@ def test_find_refseq_files_nofileserror():
     with pytest.raises(FileNotFoundError):
         find_refseq_files(one, dirpath)
         find_refseq_files(two, dirpath)
+
+def test_refseq_index(tmp_path):
+    for name in ('2abc_B_refseq.fasta', '2abc_A_refseq.fasta', '3xyz_A_refseq.fasta', '2abc_A_refseq.fasta.bak'):
+        (tmp_path / name).write_text('>x\nAC\n')
+    indexfile = tmp_path.parent / f'{tmp_path.name}_index.json'
+    index = RefseqIndex(tmp_path, indexfile)
+    assert(index.get('2abc') == [tmp_path / '2abc_A_refseq.fasta', tmp_path / '2abc_B_refseq.fasta'])
+    assert(index.get('9zzz') == [])
+    assert(RefseqIndex(tmp_path, indexfile).refseqs == index.refseqs)
+    (tmp_path / '9zzz_A_refseq.fasta').write_text('>x\nAC\n')
+    os.utime(tmp_path, ns=(0, index.mtime_ns + 1))
+    assert(not index.is_current())
+    assert(RefseqIndex(tmp_path, indexfile).get('9zzz') == [tmp_path / '9zzz_A_refseq.fasta'])
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for ingest_refseqs.py
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from ingest_refseqs import *
+from io_utils import fa_todict
+
+SEQRES = ('>1c0f_A mol:protein length:6  ACTIN\nMDGXED\nVQ\n'
+          '>1c0f_S mol:protein length:4  GELSOLIN\nMVVE\n'
+          '>1abc_A mol:protein length:3  OTHER\nMKV\n'
+          '>2xyz_B mol:na length:3  DNA\nACG\n'
+          '>2xyz_C mol:protein length:3  PROT\nMKL\n')
+
+@pytest.fixture
+def seqres(tmp_path):
+    seqresfile = tmp_path / 'pdb_seqres.txt'
+    seqresfile.write_text(SEQRES)
+    chainsfile = tmp_path / 'chains.txt'
+    chainsfile.write_text('1C0F\n# comment\n2xyz_B\n2xyz_C\n3aaa_A\n')
+    return seqresfile, chainsfile
+
+def test_readin_chains(seqres):
+    assert(readin_chains(seqres[1]) == {'1c0f': None, '2xyz': {'B', 'C'}, '3aaa': {'A'}})
+
+def test_ingest_refseq_files(seqres, tmp_path):
+    requested = readin_chains(seqres[1])
+    written = ingest_refseq_files(seqres[0], requested, tmp_path)
+    assert(sorted(written) == ['1c0f_A', '1c0f_S', '2xyz_C'])
+    assert(fa_todict(written['1c0f_A']) == {'1c0f_A mol:protein length:6  ACTIN': 'MDGEDVQ'})
+    assert(report_missing(requested, written) == ['2xyz_B', '3aaa'])
+
+def test_ingest_refseq_store(seqres, tmp_path):
+    storepath = tmp_path / 'refseqs.fasta'
+    index = ingest_refseq_store(seqres[0], readin_chains(seqres[1]), storepath)
+    assert(list(index) == ['1c0f_A', '1c0f_S', '2xyz_C'])
+    refseqpath = extract_refseq(storepath, '1c0f_S', tmp_path)
+    assert(refseqpath == tmp_path / '1c0f_S_refseq.fasta')
+    assert(fa_todict(refseqpath) == {'1c0f_S mol:protein length:4  GELSOLIN': 'MVVE'})
+    with pytest.raises(FileNotFoundError):
+        extract_refseq(storepath, '1abc_A', tmp_path)
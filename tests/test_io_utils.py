@@ -75,3 +75,34 @@ def test_does_target_exist():
     dirpath2=Path('../blabla')
     assert(does_target_exist(filepath1, 'else')==True)
     assert(does_target_exist(dirpath2, 'else')==False)
+
+def test_get_orgtag():
+    assert(get_orgtag('sp|P69905|HBA_HUMAN Hemoglobin subunit alpha') == 'HUMAN')
+    assert(get_orgtag('tr|A0A1|A0A1_MOUSE\n') == 'MOUSE')
+    assert(get_orgtag('rfseq|1c0f_A_refseq|_RFSEQ XP_636088.1') == 'RFSEQ')
+
+def test_seqcollection():
+    fafilepath = Path('../testdata/1111_A_refseq_phmmer_matched.fasta')
+    seqs = SeqCollection.from_fasta(fafilepath)
+    assert(seqs.to_dict() == fa_todict(fafilepath))
+    assert(len(seqs) == 3 and 'sp|_TOXCA BLA BLA' in seqs)
+    assert(seqs['sp|_TOXCA BLA BLA'] == 'def')
+    assert(bytes(seqs.get_bytes('sp|_TOXCA BLA BLA')) == b'def')
+
+def test_seqcollection_from_fasta_stream(tmp_path):
+    fafilepath = tmp_path / 'x.fasta'
+    fafilepath.write_text('>a x\nMK\nV \n\n>b\n>c\nAC\n>a x\nWY\n')
+    seqs = SeqCollection.from_fasta(fafilepath)
+    assert(seqs.to_dict() == fa_todict(fafilepath) == {'a x': 'WY', 'b': '', 'c': 'AC'})
+    items = seqs.items()
+    assert(not isinstance(items, list) and next(items) == ('a x', 'WY'))
+    assert(readin_fasta_headers(fafilepath) == ['a x', 'b', 'c', 'a x'])
+
+def test_seqcollection_filter():
+    seqs = SeqCollection.from_dict({'tr|A|A_HUMAN': 'MKV', 'tr|B|B_MOUSE': 'MK', 'tr|C|C_HUMAN': 'M'})
+    humans = seqs.filter_by_org({'HUMAN'})
+    assert(humans.to_dict() == {'tr|A|A_HUMAN': 'MKV', 'tr|C|C_HUMAN': 'M'})
+    assert(humans.buffer is seqs.buffer)
+    assert(seqs.filter_by_org({'HUMAN'}, keep=False).keys() == ['tr|B|B_MOUSE'])
+    assert(seqs.filter_by_length(2, 2).keys() == ['tr|B|B_MOUSE'])
+    assert(seqs.filter_by_length(maxlength=0).to_dict() == {})
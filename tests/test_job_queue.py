@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for job_queue.py
+"""
+import os
+import sys
+import time
+import multiprocessing
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from job_queue import *
+
+def record_job(job):
+    with open(Path(job['config']).parent / 'done.txt', 'a') as f:
+        f.write(f"{job['id']} {os.getpid()}\n")
+    time.sleep(0.01)
+
+def drain(dbpath):
+    run_worker(dbpath, record_job, lease=5.0, poll=0.05)
+
+def test_claim_complete(tmp_path):
+    queue = JobQueue(tmp_path / 'queue.db')
+    jobid = queue.enqueue('1c0f', tmp_path / 'config_1c0f.txt', tmp_path / 'paths.txt', ['all'])
+    job = queue.claim('w1', 60)
+    assert(job['id'] == jobid)
+    assert(job['tasks'] == ['all'])
+    assert(job['attempts'] == 1)
+    assert(queue.claim('w2', 60) is None)
+    assert(not queue.complete(jobid, 'w2'))
+    assert(queue.complete(jobid, 'w1'))
+    assert(queue.counts() == {'done': 1})
+
+def test_expired_lease(tmp_path):
+    queue = JobQueue(tmp_path / 'queue.db')
+    jobid = queue.enqueue('1c0f', 'config', 'paths', ['all'], max_attempts=2)
+    queue.claim('w1', -1)
+    job = queue.claim('w2', 60)
+    assert(job['id'] == jobid and job['worker'] == 'w2' and job['attempts'] == 2)
+    assert(not queue.heartbeat(jobid, 'w1', 60))
+    assert(queue.heartbeat(jobid, 'w2', -1))
+    assert(queue.claim('w3', 60) is None)
+    assert(queue.get_job(jobid)['status'] == 'failed')
+
+def test_fail_retry(tmp_path):
+    queue = JobQueue(tmp_path / 'queue.db')
+    jobid = queue.enqueue('1c0f', 'config', 'paths', ['all'], max_attempts=2)
+    queue.fail(queue.claim('w1', 60)['id'], 'w1', 'error 1')
+    assert(queue.get_job(jobid)['status'] == 'queued')
+    queue.fail(queue.claim('w1', 60)['id'], 'w1', 'error 2')
+    job = queue.get_job(jobid)
+    assert(job['status'] == 'failed' and job['last_error'] == 'error 2')
+
+def test_enqueue_stages(tmp_path):
+    queue = JobQueue(tmp_path / 'queue.db')
+    jobids = queue.enqueue_stages('1c0f', 'config', 'paths', ['findrefseqs', 'editrefseqs', 'runphmmer'])
+    job = queue.claim('w1', 60)
+    assert(job['id'] == jobids[0])
+    assert(queue.claim('w2', 60) is None)
+    queue.complete(job['id'], 'w1')
+    job = queue.claim('w2', 60)
+    assert(job['tasks'] == ['editrefseqs'])
+    queue.fail(job['id'], 'w2', 'stopped', retry=False)
+    assert(queue.claim('w1', 60) is None)
+    assert(queue.counts() == {'done': 1, 'failed': 2})
+
+def test_multiple_workers(tmp_path):
+    dbpath = tmp_path / 'queue.db'
+    queue = JobQueue(dbpath)
+    for n in range(40):
+        queue.enqueue(f'{n:04d}', tmp_path / f'config_{n:04d}.txt', tmp_path / 'paths.txt', ['all'])
+    queue.close()
+    workers = [multiprocessing.Process(target=drain, args=(dbpath,)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with open(tmp_path / 'done.txt') as f:
+        jobids = [int(line.split()[0]) for line in f]
+    assert(sorted(jobids) == list(range(1, 41)))
+    assert(JobQueue(dbpath).counts() == {'done': 40})
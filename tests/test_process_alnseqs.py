@@ -9,6 +9,7 @@ import pytest
 sys.path.append("../scripts")
 
 from process_alnseqs import *
+import numpy as np
 
 
 def test_get_orgdict_from_fafile():
@@ -49,4 +50,44 @@ def test_process_alnseqs_noredo():
     alnfilepath1 = Path('../testdata/1c0f_A_refseq_phmmer_matched.aln')
     alnfilepath2 = Path('../testdata/1c0f_S_refseq_phmmer_matched.aln')
     res = Path('../testdata/Joint_1c0f_A_1c0f_S_aln.fasta')
-    assert(process_alnseqs(alnfilepath1, alnfilepath2, Path('../testdata'), False)==res) 
+    assert(process_alnseqs(alnfilepath1, alnfilepath2, Path('../testdata'), False)==res)
+
+def test_extract_rows(tmp_path):
+    alnseqs = SeqCollection.from_dict({'tr|_HUMAN': 'a-c-',
+                                       'rfseq|_RFSEQ': 'a--e',
+                                       'tr|_MOUSE': '-b--'})
+    outpath = extract_rows(alnseqs, ['HUMAN'], tmp_path / 'x.aln')
+    assert(fa_todict(outpath) == {'rfseq|_RFSEQ': 'a-e', 'tr|_HUMAN': 'ac-'})
+
+def test_extract_matched_rows_dropped(tmp_path):
+    (tmp_path / 'a.aln').write_text('>rfseq|_RFSEQ\nAC\n>tr|_HUMAN\nA-\n>tr|_MOUSE\n-C\n')
+    (tmp_path / 'b.aln').write_text('>rfseq|_RFSEQ\nDE\n>tr|_HUMAN\nD-\n>tr|_MOUSE\nDE\n')
+    (tmp_path / 'a.dropped').write_text('MOUSE\t8\tmuscle memory limit 100 MB\n')
+    (tmp_path / 'a.fasta').write_text('>tr|_HUMAN\nA\n>tr|_MOUSE\nC\n')
+    (tmp_path / 'b.fasta').write_text('>tr|_HUMAN\nD\n>tr|_MOUSE\nDE\n')
+    (tmp_path / 'out').mkdir()
+    outpath1, outpath2 = extract_matched_rows(tmp_path / 'a.aln', tmp_path / 'b.aln',
+                                              tmp_path / 'a.fasta', tmp_path / 'b.fasta', tmp_path / 'out')
+    assert(list(fa_todict(outpath1)) == ['rfseq|_RFSEQ', 'tr|_HUMAN'])
+    assert(list(fa_todict(outpath2)) == ['rfseq|_RFSEQ', 'tr|_HUMAN'])
+
+def test_process_alnseqs_existing_joint(tmp_path):
+    # joint alignment made before column maps and filtering
+    for name in ('1abc_A_refseq_phmmer_matched.aln', '1abc_B_refseq_phmmer_matched.aln'):
+        (tmp_path / name).write_text('>rfseq|x|_RFSEQ\nAC\n')
+    refseq1 = tmp_path / '1abc_A_refseq.fasta'
+    refseq1.write_text('>a\nACD\n')
+    jointaln = tmp_path / 'Joint_1abc_A_1abc_B_aln.fasta'
+    jointaln.write_text('>rfseq|x|_RFSEQ||rfseq|y|_RFSEQ\nACDEF\n>a_HUMAN||b_HUMAN\nAC-EF\n>a_MOUSE||b_MOUSE\nGCDEW\n')
+    res = process_alnseqs(tmp_path / '1abc_A_refseq_phmmer_matched.aln', tmp_path / '1abc_B_refseq_phmmer_matched.aln',
+                          refseq1, tmp_path / '1abc_B_refseq.fasta', tmp_path, False)
+    assert(res == jointaln)
+    colmap = np.load(tmp_path / 'Joint_1abc_A_1abc_B_aln_colmap.npy')
+    assert(colmap['chain'].tolist() == [0, 0, 0, 1, 1])
+    assert(fa_todict(tmp_path / 'Joint_1abc_A_1abc_B_aln_filtered.fasta')['a_MOUSE||b_MOUSE'] == 'GW')
+
+def test_writeout_joint_colmap(tmp_path):
+    colmappath = writeout_joint_colmap(tmp_path / 'Joint_a_b_aln.fasta', 'A-C', 'DE')
+    colmap = np.load(colmappath)
+    assert(colmap['chain'].tolist() == [0, 0, 0, 1, 1])
+    assert(colmap['refpos'].tolist() == [0, -1, 1, 0, 1])
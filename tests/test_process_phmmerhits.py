@@ -109,3 +109,11 @@ def test_process_phmmerhits():
     reskey1, reskey2 = process_phmmerhits(phmmerdir, pdbid, minhits, maxhits)
     assert(reskey1 == keylist1)
     assert(reskey2 == keylist2)
+
+def test_select_best_hits(tmp_path):
+    keyfile = tmp_path / 'x.keyfile'
+    keyfile.write_text('tr|A1|A1_ORGA\nsp|B1|B1_ORGA\ntr|C1|C1_ORGB\ntr|D1|D1_ORGC')
+    select_best_hits(keyfile, tmp_path / 'x_best.keyfile', 2, 2)
+    assert((tmp_path / 'x_best.keyfile').read_text() == 'sp|B1|B1_ORGA\ntr|C1|C1_ORGB')
+    with pytest.raises(ValueError):
+        select_best_hits(keyfile, tmp_path / 'x_best.keyfile', 5, 2)
@@ -9,6 +9,7 @@ import pytest
 sys.path.append("../scripts")
 
 from reduce_seq_set import *
+from io_utils import fa_todict
 
 def test_find_long_seqs():
     testfilepath = Path('../testdata/testremove3.fasta')
@@ -26,3 +27,23 @@ def test_reduce_seq_set_orgset_total():
 
 def test_orgsets_match():
     pass
+
+def test_drop_long_seqs(tmp_path):
+    fastafile = tmp_path / 'x.fasta'
+    fastafile.write_text('>a\nAAAA\n>b\nAA\n')
+    assert(drop_long_seqs(fastafile, 3) == 1)
+    assert(fa_todict(fastafile) == {'b': 'AA'})
+
+def test_drop_longest_orgs(tmp_path):
+    fastafile1 = tmp_path / 'x1.fasta'
+    fastafile2 = tmp_path / 'x2.fasta'
+    fastafile1.write_text('>a_HUMAN\nAAAAAA\n>b_MOUSE\nAA\n>c_YEAST\nAAA\n>rfseq|x|_RFSEQ\nAAAAAAAAAA\n')
+    fastafile2.write_text('>d_HUMAN\nA\n>e_MOUSE\nAAAAAAAA\n>f_YEAST\nAA\n')
+    dropped = drop_longest_orgs(fastafile1, fastafile2, fraction=0.5)
+    assert(dropped == [('MOUSE', 8)])
+    assert(list(fa_todict(fastafile1)) == ['a_HUMAN', 'c_YEAST', 'rfseq|x|_RFSEQ'])
+    assert(list(fa_todict(fastafile2)) == ['d_HUMAN', 'f_YEAST'])
+    writeout_dropped_orgs(dropped, get_dropped_path(fastafile1), 'test')
+    assert((tmp_path / 'x1.dropped').read_text() == 'MOUSE\t8\ttest\n')
+    assert(readin_dropped_orgs(tmp_path / 'x1.dropped') == {'MOUSE'})
+    assert(readin_dropped_orgs(tmp_path / 'x2.dropped') == set())
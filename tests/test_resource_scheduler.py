@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for resource_scheduler.py
+"""
+import os
+import sys
+import subprocess
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from resource_scheduler import *
+
+@pytest.fixture
+def budget(tmp_path, monkeypatch):
+    monkeypatch.setattr('resource_scheduler.BUDGET', dict(BUDGET))
+    set_budget(4, 1000, tmp_path / 'sched.json')
+    return tmp_path / 'sched.json'
+
+def test_get_budget(budget):
+    assert(get_budget() == (4, 1000))
+    assert(get_schedfile() == budget)
+
+def test_try_reserve(budget):
+    assert(try_reserve('a', 3, 500, budget, (4, 1000)))
+    assert(not try_reserve('b', 2, 100, budget, (4, 1000)))
+    assert(not try_reserve('b', 1, 600, budget, (4, 1000)))
+    assert(try_reserve('b', 1, 500, budget, (4, 1000)))
+    release('a', budget)
+    assert(try_reserve('c', 3, 100, budget, (4, 1000)))
+
+def test_oversized_job_runs_alone(budget):
+    assert(try_reserve('a', 8, 5000, budget, (4, 1000)))
+    assert(not try_reserve('b', 1, 1, budget, (4, 1000)))
+
+def test_dead_pid_dropped(budget):
+    proc = subprocess.Popen(['true'])
+    proc.wait()
+    with open(budget, 'w') as f:
+        json.dump({'dead': [proc.pid, 4, 1000]}, f)
+    assert(try_reserve('a', 4, 1000, budget, (4, 1000)))
+
+def test_reserve(budget):
+    with reserve(16, 100) as cores:
+        assert(cores == 4)
+        with locked_reservations(budget) as reservations:
+            assert(len(reservations) == 1)
+    with locked_reservations(budget) as reservations:
+        assert(reservations == {})
+
+def test_run(budget):
+    proc = run(['echo', 'hi'], cores=1, memory_mb=10, capture_output=True)
+    assert(proc.stdout == b'hi\n')
+
+def test_call_in_worker(budget):
+    assert(call_in_worker(os.getenv, ('OMP_NUM_THREADS',), cores=2) == '2')
+    assert(call_in_worker(os.getenv, ('OPENBLAS_NUM_THREADS',), cores=8) == '4')
+    with pytest.raises(FileNotFoundError):
+        call_in_worker(os.stat, ('../testdata/doesnotexist',))
+
+def test_call_in_worker_broken(budget):
+    from concurrent.futures.process import BrokenProcessPool
+    with pytest.raises(BrokenProcessPool):
+        call_in_worker(os._exit, (1,))
@@ -22,3 +22,12 @@ def test_run_dca_scores_file_exists():
     dcascoresfilepath = Path('../testdata/Joint_4ged_B_4ged_A_aln_mfdca_scores.dat')
     res = run_dca(dcascoresfilepath, Path('../testdata'), False)
     assert(res == dcascoresfilepath)
+
+def test_writeout_scores_mapped_on_read(tmp_path):
+    from scores_io import make_colmap, writeout_colmap, get_colmap_path, readin_scores_mapped
+    jointaln = tmp_path / 'Joint_a_b_aln.fasta'
+    writeout_colmap(make_colmap(['ACD', 'EF']), get_colmap_path(jointaln))
+    scorefile = tmp_path / 'scores.dat'
+    writeout_scores([((1, 3), 2.5), ((0, 2), 1.0)], jointaln, scorefile)
+    assert(scorefile.read_text() == '1\t3\t2.5\n0\t2\t1.0\n')
+    assert(readin_scores_mapped(scorefile, get_colmap_path(jointaln))['chain_j'].tolist() == [1, 0])
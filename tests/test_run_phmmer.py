@@ -2,6 +2,7 @@
 """
 Tests for run_phmmer.py
 """
+import os
 import sys
 from pathlib import Path
 import pytest
@@ -9,6 +10,9 @@ import pytest
 sys.path.append("../scripts")
 
 from run_phmmer import *
+from parse_accid_phmmerlog import get_accidlist
+from io_utils import fa_todict
+from resource_scheduler import BUDGET
 
 
 def test_phmmerlog_formatter():
@@ -41,3 +45,48 @@ def test_run_phmmer_no_redo():
     correctoutpath = Path('../testdata/1c0f_A_refseq_phmmer.log')
     res = run_phmmer(dbpath, seqpath, phmmerpath, redo)
     assert(res == correctoutpath)
+
+def write_shardlog(logpath, hits):
+    lines = ['# phmmer :: search a protein sequence against a protein database',
+             f'# target sequence database:        {logpath.stem}.fasta',
+             'Query:       1d0d_A  [L=60]',
+             'Scores for complete sequences (score includes all domains):',
+             '   --- full sequence ---   --- best 1 domain ---    -#dom-',
+             '    E-value  score  bias    E-value  score  bias    exp  N  Sequence   Description',
+             '    ------- ------ -----    ------- ------ -----   ---- --  --------   -----------']
+    for evalue, score, name in hits:
+        if evalue > 0.01 and 'inclusion' not in lines[-1] and lines[-1].split()[0] != '-------':
+            lines.append('  ------ inclusion threshold ------')
+        lines.append(f'    {evalue:7.2g} {score:6.1f}   0.0    {evalue:7.2g} {score:6.1f}   0.0    1.0  1  {name}  desc')
+    lines += ['', 'Domain annotation for each sequence:', '  1 ! 45.3 0.1 1 60 1 60 1 60 .. 0.99', '', '//', '[ok]']
+    logpath.write_text('\n'.join(lines) + '\n')
+
+def test_merge_shard_logs(tmp_path):
+    shardlogs = [tmp_path / 'shard0.log', tmp_path / 'shard1.log']
+    write_shardlog(shardlogs[0], [(1e-30, 100.0, 'A_HUMAN'), (1e-5, 20.0, 'C_MOUSE'), (0.5, 10.0, 'E_YEAST')])
+    write_shardlog(shardlogs[1], [(1e-20, 80.0, 'B_HUMAN'), (0.1, 12.0, 'D_MOUSE')])
+    assert(is_log_complete(shardlogs[0]))
+    outpath = merge_shard_logs(shardlogs, tmp_path / 'merged.log', Path('db.fasta'))
+    assert(get_accidlist(outpath) == ['A_HUMAN', 'B_HUMAN', 'C_MOUSE'])
+    header, hits = read_hits(outpath)
+    assert([hit[3].split()[8] for hit in hits] == ['A_HUMAN', 'B_HUMAN', 'C_MOUSE', 'D_MOUSE', 'E_YEAST'])
+    assert([hit[0] for hit in hits] == [True, True, True, False, False])
+    assert('db.fasta (2 shards)' in header[1])
+
+def test_run_phmmer_sharded(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', f'{Path("../benchmarks/fakebin").resolve()}:{os.environ["PATH"]}')
+    monkeypatch.setitem(BUDGET, 'schedfile', tmp_path / 'sched.json')
+    seqpath = Path('../testdata/1c0f_A_refseq.fasta')
+    refseq = next(iter(fa_todict(seqpath).values()))
+    dbpath = tmp_path / 'db.fasta'
+    with open(dbpath, 'w') as f:
+        for idx in range(40):
+            cut = (idx * 7) % (len(refseq) - 50)
+            f.write(f'>tr|Q{idx:05d}|Q{idx:05d}_ORG{idx % 5}\n{refseq[cut:] if idx % 2 else "W" * idx + refseq[:cut + 20]}\n')
+    (tmp_path / 'full').mkdir()
+    (tmp_path / 'sharded').mkdir()
+    fulllog = run_phmmer(dbpath, seqpath, tmp_path / 'full', True)
+    shardlog = run_phmmer(dbpath, seqpath, tmp_path / 'sharded', True, cpus=2, numshards=3)
+    assert(len(list((tmp_path / 'sharded').iterdir())) == 1)
+    assert(get_accidlist(shardlog) == get_accidlist(fulllog))
+    assert(read_hits(shardlog)[1] == read_hits(fulllog)[1])
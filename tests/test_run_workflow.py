@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for run_workflow.py
+"""
+import sys
+import subprocess
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from run_workflow import *
+
+def test_lazy_imports():
+    cmd = [sys.executable, '-c', 'import sys; sys.path.append("../scripts"); import run_workflow; '
+           'print(" ".join(m for m in ("numpy", "pydca", "ordered_set") if m in sys.modules))']
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    assert(proc.stdout.strip() == '')
+
+def test_read_settings(tmp_path):
+    pathsfile = tmp_path / 'paths.txt'
+    pathsfile.write_text(f'dbpath={tmp_path}/db.fasta\ncores=2\nschedfile={tmp_path}/sched.json\nphmmershards=4\n')
+    ic = InputConfig(None, pathsfile, attrs={})
+    assert(ic.dbpath == tmp_path / 'db.fasta')
+    assert(ic.settings['cores'] == 2 and ic.settings['memorymb'] is None)
+    assert(ic.settings['phmmershards'] == 4)
+    assert(ic.settings['maxgapfraction'] == 0.8 and ic.settings['musclememorymb'] is None)
+    assert(ic.settings['schedfile'] == tmp_path / 'sched.json')
+    assert('settings' not in ic.get_inputs())
+
+def test_get_task_files_alignmode(tmp_path):
+    pathsfile = tmp_path / 'paths.txt'
+    pathsfile.write_text('alnpath=/alignments\n')
+    ic = InputConfig(None, pathsfile, attrs={'keyfile1': 'a.keyfile', 'eslfastafile1': 'a.fasta'})
+    assert(ic.settings['alignmode'] == 'matched')
+    assert(Path('a.fasta') in get_task_files(ic, 'alignseqs', 'in'))
+    pathsfile.write_text('alnpath=/alignments\nalignmode=fullset\n')
+    ic = InputConfig(None, pathsfile, attrs={'keyfile1': 'a.keyfile', 'eslfastafile1': 'a.fasta'})
+    assert(Path('a.keyfile') in get_task_files(ic, 'alignseqs', 'in'))
+    assert(Path('a.fasta') in get_task_files(ic, 'processalignment', 'in'))
+
+def test_import_task_module():
+    assert(set(TASKMODULES) == set(TASKNAMES[1:]))
+    assert(import_task_module('parsephmmer') >= 0.0)
+    assert('parse_accid_phmmerlog' in sys.modules)
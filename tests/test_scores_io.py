@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for scores_io.py
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from scores_io import *
+
+DCALIST = [((0, 5), 0.5), ((1, 7), 2.5), ((2, 3), -0.1), ((4, 9), 1.25)]
+
+def test_select_top_scores():
+    res = select_top_scores(DCALIST, 2)
+    assert(res == [((1, 7), 2.5), ((4, 9), 1.25)])
+
+def test_select_top_scores_all():
+    res = select_top_scores(DCALIST)
+    assert([pair[0] for pair in res] == [(1, 7), (4, 9), (0, 5), (2, 3)])
+
+def test_select_top_scores_valerr():
+    with pytest.raises(ValueError):
+        select_top_scores(DCALIST, 0)
+
+def test_scores_to_array_valerr():
+    with pytest.raises(ValueError):
+        scores_to_array([((0, 40000), 1.0)])
+
+def test_writeout_readin_scores_binary(tmp_path):
+    outfilepath = tmp_path / 'Joint_test_mfdca_scores.bin'
+    assert(writeout_scores_binary(DCALIST, outfilepath, topk=3) == 3)
+    assert(readin_scores_header(outfilepath) == (3, 3))
+    records = readin_scores_binary(outfilepath)
+    assert(list(records['i']) == [1, 4, 0])
+    assert(list(records['j']) == [7, 9, 5])
+    assert(records['score'][0] == pytest.approx(2.5))
+
+def test_get_top_pairs_minseparation(tmp_path):
+    outfilepath = tmp_path / 'Joint_test_mfdca_scores.bin'
+    writeout_scores_binary(DCALIST, outfilepath)
+    res = get_top_pairs(outfilepath, 2, minseparation=5)
+    assert(list(res['i']) == [1, 4])
+
+def test_readin_scores_header_valerr():
+    with pytest.raises(ValueError):
+        readin_scores_header(Path('../testdata/Joint_4ged_B_4ged_A_aln_mfdca_scores.dat'))
+
+def test_make_colmap():
+    colmap = make_colmap(['AC-D', 'E-F'])
+    assert(colmap['chain'].tolist() == [0, 0, 0, 0, 1, 1, 1])
+    assert(colmap['refpos'].tolist() == [0, 1, -1, 2, 0, -1, 1])
+    assert(colmap['resnum'].tolist() == [-1] * 7)
+    colmap = make_colmap(['AC', 'E'], [np.array([10, 11]), None])
+    assert(colmap['resnum'].tolist() == [10, 11, -1])
+
+def test_readin_scores_mapped(tmp_path):
+    jointaln = tmp_path / 'Joint_a_b_aln.fasta'
+    colmappath = get_colmap_path(jointaln)
+    assert(colmappath == tmp_path / 'Joint_a_b_aln_colmap.npy')
+    writeout_colmap(make_colmap(['ACD', 'EF']), colmappath)
+    scorefile = tmp_path / 'scores.dat'
+    scorefile.write_text('1\t3\t2.5\n0\t2\t1.0\n')
+    mapped = readin_scores_mapped(scorefile, colmappath)
+    assert(mapped['chain_j'].tolist() == [1, 0])
+    assert(mapped['refpos_j'].tolist() == [0, 2])
+    assert(mapped['score'].tolist() == [2.5, 1.0])
+    binfile = tmp_path / 'scores.bin'
+    writeout_scores_binary([((1, 3), 2.5), ((0, 4), 1.0)], binfile)
+    assert(readin_scores_mapped(binfile, colmappath)['refpos_j'].tolist() == [0, 1])
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests for screen_dimers.py
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from screen_dimers import *
+
+def make_orgdict(orgs, seq):
+    orgdict = {'RFSEQ': (f'rfseq|x|_RFSEQ ref', seq)}
+    for org in orgs:
+        orgdict[org] = (f'tr|A{org}|A{org}_{org} protein', seq)
+    return orgdict
+
+def test_readin_pairs(tmp_path):
+    pairsfile = tmp_path / 'pairs.txt'
+    pairsfile.write_text('1c0f_A 1c0f_S\n\n# comment\n1c0f_A 2abc_B # trailing\n')
+    pairs = readin_pairs(pairsfile)
+    assert(pairs == [('1c0f_A', '1c0f_S'), ('1c0f_A', '2abc_B')])
+    assert(get_chains(pairs) == ['1c0f_A', '1c0f_S', '2abc_B'])
+
+def test_readin_pairs_malformed(tmp_path):
+    pairsfile = tmp_path / 'pairs.txt'
+    pairsfile.write_text('1c0f_A\n')
+    with pytest.raises(ValueError):
+        readin_pairs(pairsfile)
+
+def test_join_pair(tmp_path):
+    orgdict1 = make_orgdict(['ORGA', 'ORGB', 'ORGC', 'ORGD'], 'AC')
+    orgdict2 = make_orgdict(['ORGD', 'ORGC', 'ORGA', 'ORGE'], 'DE')
+    jointpath = join_pair(orgdict1, orgdict2, '1c0f_A', '1c0f_S', tmp_path, minhits=2, maxhits=2)
+    assert(jointpath == tmp_path / 'Joint_1c0f_A_1c0f_S_aln.fasta')
+    joint = fa_todict(jointpath)
+    assert(list(joint) == ['rfseq|x|_RFSEQ ref||rfseq|x|_RFSEQ ref',
+                           'tr|AORGA|AORGA_ORGA protein||tr|AORGA|AORGA_ORGA protein',
+                           'tr|AORGC|AORGC_ORGC protein||tr|AORGC|AORGC_ORGC protein'])
+    assert(set(joint.values()) == {'ACDE'})
+
+def test_join_pair_too_few(tmp_path):
+    orgdict1 = make_orgdict(['ORGA', 'ORGB'], 'AC')
+    orgdict2 = make_orgdict(['ORGB', 'ORGC'], 'DE')
+    with pytest.raises(ValueError):
+        join_pair(orgdict1, orgdict2, '1c0f_A', '1c0f_S', tmp_path, minhits=1)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for shard_database.py
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from shard_database import *
+from io_utils import fa_todict
+
+
+def write_db(dbpath):
+    seqs = {f'sp|P{idx:05d}|TEST{idx}_HUMAN': 'ACDEFGHIKL' * (idx + 1) for idx in range(10)}
+    with open(dbpath, 'w') as f:
+        for header, seq in seqs.items():
+            f.write(f'>{header} desc\n{seq[:30]}\n{seq[30:]}\n' if len(seq) > 30 else f'>{header} desc\n{seq}\n')
+    return seqs
+
+def test_split_database(tmp_path):
+    dbpath = tmp_path / 'db.fasta'
+    seqs = write_db(dbpath)
+    manifest = split_database(dbpath, 3)
+    sharddir = get_sharddir(dbpath)
+    assert(manifest['numseqs'] == 10 and len(manifest['shards']) == 3)
+    merged = {}
+    sizes = []
+    for name in manifest['shards']:
+        shard = fa_todict(sharddir / name)
+        sizes.append(sum(len(seq) for seq in shard.values()))
+        merged.update({header.split()[0]: seq for header, seq in shard.items()})
+    assert(merged == seqs)
+    assert(max(sizes) - min(sizes) <= 100)
+    assert(is_shardset_current(dbpath, sharddir, 3))
+    assert(not is_shardset_current(dbpath, sharddir, 4))
+
+def test_split_database_invalid(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        split_database(tmp_path / 'missing.fasta', 2)
+    dbpath = tmp_path / 'db.fasta'
+    write_db(dbpath)
+    with pytest.raises(ValueError):
+        split_database(dbpath, 0)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for stage_metrics.py
+"""
+import sys
+import subprocess
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from stage_metrics import *
+
+def test_count_seqs_fasta():
+    assert(count_seqs(Path('../testdata/1111_A_refseq_phmmer_matched.fasta')) == 3)
+
+def test_count_seqs_keyfile():
+    assert(count_seqs(Path('../testdata/1111_A_refseq_phmmer_matched.keyfile')) == 2)
+
+def test_count_seqs_missing():
+    assert(count_seqs(Path('../testdata/xxxx_A_refseq.fasta')) is None)
+    assert(count_seqs(Path('.')) is None)
+
+def test_count_seqs_in_files():
+    files = [Path('../testdata/1111_A_refseq_phmmer_matched.fasta'),
+             Path('../testdata/1111_S_refseq_phmmer_matched.fasta'),
+             '']
+    assert(count_seqs_in_files(files) == 6)
+    assert(count_seqs_in_files([Path('../testdata/xxxx_A_refseq.fasta')]) is None)
+
+def test_finish_stage():
+    snapshot = start_stage()
+    subprocess.run([sys.executable, '-c', 'x = bytearray(50_000_000)'])
+    metrics = finish_stage(snapshot)
+    assert(metrics['wall_s'] > 0)
+    assert(metrics['child_cpu_s'] >= 0)
+    assert(set(metrics) == {'wall_s', 'cpu_s', 'child_cpu_s', 'peak_rss_kb',
+                            'child_peak_rss_kb', 'bytes_read', 'bytes_written'})
+
+def test_record_stage_value():
+    snapshot = start_stage()
+    result, seconds = timed_call(sum, [1, 2])
+    record_stage_value('sum_s', seconds)
+    metrics = finish_stage(snapshot)
+    assert(result == 3)
+    assert(metrics['sum_s'] == seconds)
+    assert('sum_s' not in finish_stage(start_stage()))
+
+def test_writeout_readin_metrics(tmp_path):
+    metricsfile = tmp_path / 'metrics.jsonl'
+    writeout_metrics({'task': 'runphmmer', 'wall_s': 1.5}, metricsfile)
+    writeout_metrics({'task': 'rundca', 'wall_s': 2.0}, metricsfile)
+    assert(readin_metrics(metricsfile) == [{'task': 'runphmmer', 'wall_s': 1.5},
+                                           {'task': 'rundca', 'wall_s': 2.0}])
+
+def test_startup_metrics():
+    metrics = startup_metrics(0.01)
+    assert(metrics['import_s'] == 0.01)
+    assert(metrics['wall_s'] >= 0.0)
+    assert(metrics['cpu_s'] > 0.0)
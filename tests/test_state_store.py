@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for state_store.py
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append("../scripts")
+
+from state_store import *
+
+def test_readin_config():
+    attrs = readin_config(Path('../testdata/config.txt'))
+    assert(attrs['pdbid'] == '1c0f')
+    assert(attrs['refseq1'] == '.')
+    assert(len(attrs) == 15)
+
+def test_import_export_config(tmp_path):
+    store = StateStore(tmp_path / 'state.db')
+    assert(store.import_config(Path('../testdata/config_1c0f.txt')) == '1c0f')
+    assert(store.has_entry('1c0f'))
+    store.export_config('1c0f', tmp_path / 'config_1c0f.txt')
+    with open('../testdata/config_1c0f.txt') as orig, open(tmp_path / 'config_1c0f.txt') as exported:
+        assert(orig.read() == exported.read())
+
+def test_get_attrs_keyerror(tmp_path):
+    store = StateStore(tmp_path / 'state.db')
+    with pytest.raises(KeyError):
+        store.get_attrs('xxxx')
+
+def test_finish_stage(tmp_path):
+    store = StateStore(tmp_path / 'state.db')
+    store.import_config(Path('../testdata/config_1c0f.txt'))
+    store.start_stage('1c0f', 'findrefseqs')
+    assert(store.get_stage_status('1c0f') == {'findrefseqs': 'running'})
+    attrs = store.get_attrs('1c0f')
+    attrs['refseq1'] = '../testdata/1c0f_A_refseq.fasta'
+    store.finish_stage(attrs, 'findrefseqs', 'finished', {'wall_s': 0.1})
+    assert(store.get_stage_status('1c0f') == {'findrefseqs': 'finished'})
+    assert(store.get_attrs('1c0f')['refseq1'] == '../testdata/1c0f_A_refseq.fasta')
+
+def test_progress_unfinished(tmp_path):
+    store = StateStore(tmp_path / 'state.db')
+    for configfile in ('config_1c0f.txt', 'config_1234.txt'):
+        store.import_config(Path('../testdata') / configfile)
+    for pdbid in ('1c0f', '1234'):
+        store.start_stage(pdbid, 'findrefseqs')
+        store.finish_stage(store.get_attrs(pdbid), 'findrefseqs', 'finished')
+    store.start_stage('1c0f', 'editrefseqs')
+    store.finish_stage(store.get_attrs('1c0f'), 'editrefseqs', 'finished')
+    store.start_stage('1234', 'editrefseqs')
+    store.finish_stage(store.get_attrs('1234'), 'editrefseqs', 'failed')
+    assert(store.progress() == {'findrefseqs': {'finished': 2},
+                                'editrefseqs': {'finished': 1, 'failed': 1}})
+    assert(store.unfinished(['findrefseqs', 'editrefseqs']) == ['1234'])
+    assert(store.unfinished(['findrefseqs']) == [])
+    assert(store.unfinished(['runphmmer']) == ['1234', '1c0f'])
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for structure_benchmark.py
+"""
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.append("../scripts")
+
+from structure_benchmark import *
+
+# chain A: MET 1, GLY 2, LYS 3 along x; chain B: ALA 10, TRP 11 near GLY 2 and far
+ATOMS = [('A', 1, 'MET', 0.0), ('A', 2, 'GLY', 4.0), ('A', 3, 'LYS', 8.0),
+         ('B', 10, 'ALA', 4.0), ('B', 11, 'TRP', 40.0)]
+
+def pdb_line(serial, chain, resnum, resname, x, y, element='C', name=' CA '):
+    return (f'ATOM  {serial:5d} {name} {resname} {chain}{resnum:4d}    '
+            f'{x:8.3f}{y:8.3f}{0.0:8.3f}  1.00  0.00          {element:>2s}\n')
+
+@pytest.fixture
+def structdir(tmp_path):
+    lines = [pdb_line(idx + 1, chain, resnum, resname, x, 0.0 if chain == 'A' else 5.0)
+             for idx, (chain, resnum, resname, x) in enumerate(ATOMS)]
+    lines.append(pdb_line(9, 'A', 3, 'LYS', 8.0, 4.0, 'H', ' H  '))
+    (tmp_path / '9xyz.pdb').write_text(''.join(lines) + 'END\n')
+    cif = ['data_9XYZ\n', 'loop_\n'] + [f'_atom_site.{col}\n' for col in
+           ('group_PDB', 'id', 'type_symbol', 'label_alt_id', 'auth_comp_id', 'auth_asym_id',
+            'auth_seq_id', 'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y', 'Cartn_z', 'pdbx_PDB_model_num')]
+    cif += [f'ATOM {idx + 1} C . {resname} {chain} {resnum} ? {x} {0.0 if chain == "A" else 5.0} 0.0 1\n'
+            for idx, (chain, resnum, resname, x) in enumerate(ATOMS)]
+    (tmp_path / '8xyz.cif').write_text(''.join(cif) + '#\n')
+    return tmp_path
+
+def test_read_structure_chains(structdir):
+    for pdbid in ('9xyz', '8xyz'):
+        structure = read_structure_chains(find_structure_file(pdbid, structdir), ['A', 'B'])
+        assert(structure['A'][2] == ['1', '2', '3'] and structure['A'][3] == 'MGK')
+        assert(structure['B'][3] == 'AW')
+        assert(structure['A'][0].shape == (3, 3))
+
+def test_get_contact_map(structdir):
+    contactmap = get_contact_map(structdir / '9xyz.pdb', 'A', 'B', structdir, cutoff=6.0)
+    assert(contactmap['contacts'].tolist() == [[1, 0]])
+    assert((structdir / '9xyz_A_B_contacts_6.npz').is_file())
+    cached = get_contact_map(structdir / '9xyz.pdb', 'A', 'B', structdir, cutoff=6.0)
+    assert(cached['contacts'].tolist() == contactmap['contacts'].tolist())
+    assert(cached['seq2'] == 'AW')
+
+def test_map_seq_to_structure():
+    assert(map_seq_to_structure('XMGKY', 'MGK').tolist() == [-1, 0, 1, 2, -1])
+    assert(map_seq_to_structure('MAK', 'MGK').tolist() == [0, 1, 2])
+
+def test_benchmark_scorefile(structdir):
+    (structdir / '9xyz_A_refseq.fasta').write_text('>a\nMGK\n')
+    (structdir / '9xyz_B_refseq.fasta').write_text('>b\nAW\n')
+    scorefile = structdir / 'Joint_9xyz_A_9xyz_B_aln_mfdca_scores.dat'
+    scorefile.write_text('0\t1\t9.0\n1\t3\t8.0\n0\t4\t7.0\n2\t3\t6.0\n')
+    result = benchmark_scorefile(scorefile, structdir, structdir, topks=(1, 2, 5), cutoff=6.0)
+    assert(result['status'] == 'finished')
+    assert(result['numpairs'] == 3)
+    assert(result['P@1'] == 1.0 and result['P@2'] == 0.5 and result['P@5'] is None)
+    missing = benchmark_scorefile(structdir / 'Joint_7abc_A_7abc_B_aln_mfdca_scores.dat', structdir, structdir)
+    assert(missing['status'] != 'finished')
+
+def test_benchmark_scorefile_colmap(structdir):
+    (structdir / '9xyz_A_refseq.fasta').write_text('>a\nMGK\n')
+    (structdir / '9xyz_B_refseq.fasta').write_text('>b\nAW\n')
+    colmappath = structdir / 'Joint_9xyz_A_9xyz_B_aln_colmap.npy'
+    writeout_colmap(make_colmap(['M-GK', 'AW']), colmappath)
+    scorefile = structdir / 'Joint_9xyz_A_9xyz_B_aln_mfdca_scores.dat'
+    scorefile.write_text('1\t4\t9.0\n2\t4\t8.0\n')
+    cachedir = structdir / 'cache'
+    cachedir.mkdir()
+    result = benchmark_scorefile(scorefile, structdir, structdir, cachedir, topks=(1, 2), cutoff=6.0,
+                                 alnpath=structdir)
+    assert(result['numpairs'] == 1 and result['P@1'] == 1.0)
+    assert(readin_colmap(colmappath)['resnum'].tolist() == [-1] * 6)
+    assert(readin_colmap(cachedir / colmappath.name)['resnum'].tolist() == [1, -1, 2, 3, 10, 11])